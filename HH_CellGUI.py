@@ -1,6 +1,76 @@
 from HH_Cell_Model_Classes import *
+from HH_Cell_Worker import Background_worker
+from HH_Cell_Batch import ANODE_COLUMNS
+import HH_Cell_Graph as graph
+import HH_Cell_Heatmap as heatmap
 import tkinter as tk
 from tkinter import ttk
+
+
+class Calculator:
+    """
+    Model results for snapshots of the GUI inputs, run on the worker thread. The model objects live as long as the
+    worker and take every snapshot through update_attributes, so with HH_Cell_Graph enabled a recalculation only
+    evaluates the derived quantities whose inputs changed.
+    """
+    def __init__(self):
+        self.bath, self.anode, self.cell, self.anode_assembly = Bath(), Anode(), Cell_input(), Anode_assembly()
+
+    def update(self, inputs):
+        # Copy a snapshot of the GUI inputs into the model objects
+        self.bath.update_attributes(**inputs['bath'])
+        anode = dict(inputs['anode'])
+        self.anode.update_attributes(*(anode.pop(name) for name in
+                                       ('length_new', 'width_new', 'height', 'depth_immers', 'n_anodes')))
+        # The spent dimensions, spacings, age and baking temperature are not taken by update_attributes
+        for name, value in anode.items():
+            setattr(self.anode, name, value)
+        for name, value in inputs['cell'].items():
+            setattr(self.cell, name, value)
+
+    def __call__(self, inputs, token):
+        """
+        :param inputs: dict of 'bath', 'anode' and 'cell' to dicts of attribute values
+        :return: dict of result name to value, or to the exception raised while calculating it
+        """
+        self.update(inputs)
+        bath, anode, cell, anode_assembly = self.bath, self.anode, self.cell, self.anode_assembly
+        results = {}
+
+        def step(name, function, *args):
+            token.check()
+            try:
+                results[name] = function(*args)
+            except Exception as e:
+                results[name] = e
+            return results[name]
+
+        current, ACD, n_anodes = cell.current, cell.ACD, anode.n_anodes
+        T_bath_K = bath.bath_temp_K
+        length, width = anode.length_new, anode.width_new
+        step('resistivity', bath.bath_resistivity)
+        step('Equil_potential', bath.Equil_potential)
+        step('bath_ratio', bath.bath_ratio)
+        rx_current_limit = step('rx_current_limit', bath.rx_limited_current_density)
+        step('surface_overvolt', anode.surface_overvoltage, current, n_anodes, ACD, T_bath_K, rx_current_limit)
+        step('bath_eff_area', anode.bath_eff_area, ACD)
+        step('current_intensity', anode.current_intensity, current, n_anodes, ACD)
+        step('critical_current_intensity', anode.concentration_limit_current_density, n_anodes, length, width,
+             T_bath_K, bath.w_Al2O3)
+        step('anode_assy_v_drop', anode_assembly.voltage_drop, current)
+        step('conc_overvolt', anode.concentration_overvolt, current, n_anodes, ACD, length, width, T_bath_K,
+             bath.w_Al2O3)
+        return results
+
+
+def render_heatmap(inputs, token):
+    # Operating window at the GUI chemistry, current and anode geometry, with the GUI ACD and w_Al2O3 marked
+    bath = dict(inputs['bath'])
+    anode = {name: value for name, value in inputs['anode'].items() if name in ANODE_COLUMNS}
+    return heatmap.render(ACD=inputs['cell']['ACD'], w_Al2O3=bath.pop('w_Al2O3'),
+                          current=inputs['cell']['current'], **bath, **anode)
+
+
 class CellGUI:
     def __init__(self, root):
         self.root = root
@@ -12,12 +82,54 @@ class CellGUI:
         self.anode_assembly = Anode_assembly()
         self.cell = Cell_input()
 
+        # Tk variables mirroring the model attributes, the model objects themselves hold plain values
+        self.bath_vars = self.bind_vars(self.bath, ['w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF',
+                                                    'bath_temp_K'])
+        self.anode_vars = self.bind_vars(self.anode, ['length_new', 'length_spent', 'width_new', 'width_spent',
+                                                      'height', 'depth_immers', 'age', 'n_anodes', 'S_1', 'S_2',
+                                                      'S_3', 'S_4', 'bake_temp'], int_names=['n_anodes'])
+        self.cell_vars = self.bind_vars(self.cell, ['current', 'ACD'], int_names=['current'])
+
         # Load and display the image
         self.image_path = "C:/Users/n11675250/OneDrive - Queensland University of Technology/Aluminium Cell/E/hhprg/cellschema/images/left_riser_gesamt1.png"
         self.load_image()
 
         self.create_widgets()
 
+        # Model evaluation runs off the Tk thread, only the latest request is calculated
+        self.worker = Background_worker(self.root, Calculator(), self.show_results, self.show_error)
+        self.heatmap_worker = Background_worker(self.root, render_heatmap, self.show_heatmap)
+        for tk_vars in (self.bath_vars, self.anode_vars, self.cell_vars):
+            for var in tk_vars.values():
+                var.trace_add('write', self.update_heatmap)
+        self.update_heatmap()
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        self.worker.close()
+        self.heatmap_worker.close()
+        self.root.destroy()
+
+    def bind_vars(self, model, names, int_names=()):
+        # Create a Tk variable for each model attribute, initialised with the model's value
+        tk_vars = {}
+        for name in names:
+            var_type = tk.IntVar if name in int_names else tk.DoubleVar
+            tk_vars[name] = var_type(master=self.root, value=getattr(model, name))
+        return tk_vars
+
+    def read_inputs(self):
+        # Snapshot of the widget values as plain numbers, Tk variables may only be read on the Tk thread
+        return {group: {name: var.get() for name, var in tk_vars.items()} for group, tk_vars in
+                (('bath', self.bath_vars), ('anode', self.anode_vars), ('cell', self.cell_vars))}
+
+    def push_inputs(self, inputs=None):
+        # Copy the widget values, or a snapshot of them, into the model objects
+        inputs = self.read_inputs() if inputs is None else inputs
+        for model, group in ((self.bath, 'bath'), (self.anode, 'anode'), (self.cell, 'cell')):
+            for name, value in inputs[group].items():
+                setattr(model, name, value)
+
     def load_image(self):
         try:
             self.image = tk.PhotoImage(file=self.image_path)
@@ -33,8 +145,8 @@ class CellGUI:
 
         attributes_labels = ['w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF', 'Bath Temperature (K)']
         attributes_vars = [
-            self.bath.w_Al2O3, self.bath.w_AlF3, self.bath.w_CaF2,
-            self.bath.w_MgF2, self.bath.w_KF, self.bath.w_LiF, self.bath.bath_temp_K
+            self.bath_vars['w_Al2O3'], self.bath_vars['w_AlF3'], self.bath_vars['w_CaF2'],
+            self.bath_vars['w_MgF2'], self.bath_vars['w_KF'], self.bath_vars['w_LiF'], self.bath_vars['bath_temp_K']
         ]
         slider_ranges = [(0, 11), (0, 11), (0, 11), (0, 11), (0, 11), (0, 11), (1050, 1400)]
 
@@ -79,39 +191,39 @@ class CellGUI:
         anode_frame.grid(row=0, column=6, padx=5, pady=10, sticky="nw")
 
         ttk.Label(anode_frame, text="Length new", width=12).grid(row=0, column=0, padx=5, pady=5)
-        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.length_new, width=5)
+        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['length_new'], width=5)
         length_new_entry.grid(row=0, column=1, padx=1, pady=1)
 
         ttk.Label(anode_frame, text="Length spent", width=12).grid(row=1, column=0, padx=5, pady=5)
-        length_old_entry = ttk.Entry(anode_frame, textvariable=self.anode.length_spent, width=5)
+        length_old_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['length_spent'], width=5)
         length_old_entry.grid(row=1, column=1, padx=1, pady=1)
 
         ttk.Label(anode_frame, text="Width new", width=12).grid(row=2, column=0, padx=5, pady=5)
-        width_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.width_new, width=5)
+        width_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['width_new'], width=5)
         width_new_entry.grid(row=2, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="Width spent", width=12).grid(row=3, column=0, padx=5, pady=5)
-        width_old_entry = ttk.Entry(anode_frame, textvariable=self.anode.width_spent, width=5)
+        width_old_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['width_spent'], width=5)
         width_old_entry.grid(row=3, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="Height", width=6).grid(row=4, column=0, padx=5, pady=5)
-        height_entry = ttk.Entry(anode_frame, textvariable=self.anode.height, width=5)
+        height_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['height'], width=5)
         height_entry.grid(row=4, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="Age", width=6).grid(row=5, column=0, padx=5, pady=5)
-        age_entry = ttk.Entry(anode_frame, textvariable=self.anode.age, width=5)
+        age_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['age'], width=5)
         age_entry.grid(row=5, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="n anodes", width=6).grid(row=6, column=0, padx=5, pady=5)
-        n_anodes_entry = ttk.Entry(anode_frame, textvariable=self.anode.n_anodes, width=5)
+        n_anodes_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['n_anodes'], width=5)
         n_anodes_entry.grid(row=6, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="Depth subm", width=6).grid(row=7, column=0, padx=5, pady=5)
-        depth_imm_entry = ttk.Entry(anode_frame, textvariable=self.anode.depth_immers, width=5)
+        depth_imm_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['depth_immers'], width=5)
         depth_imm_entry.grid(row=7, column=1, padx=5, pady=5)
 
         ttk.Label(anode_frame, text="bake temp", width=6).grid(row=8, column=0, padx=5, pady=5)
-        bake_temp_entry = ttk.Entry(anode_frame, textvariable=self.anode.bake_temp, width=5)
+        bake_temp_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['bake_temp'], width=5)
         bake_temp_entry.grid(row=8, column=1, padx=5, pady=5)
 
         # Anode spacing input GUI
@@ -120,19 +232,19 @@ class CellGUI:
         anode_frame.grid(row=0, column=7, padx=5, pady=10, sticky="nw")
 
         ttk.Label(anode_frame, text="S_1", width=12).grid(row=0, column=0, padx=5, pady=5)
-        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.S_1, width=5)
+        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['S_1'], width=5)
         length_new_entry.grid(row=0, column=1, padx=1, pady=1)
 
         ttk.Label(anode_frame, text="S_2", width=12).grid(row=1, column=0, padx=5, pady=5)
-        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.S_2, width=5)
+        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['S_2'], width=5)
         length_new_entry.grid(row=1, column=1, padx=1, pady=1)
 
         ttk.Label(anode_frame, text="S_3", width=12).grid(row=2, column=0, padx=5, pady=5)
-        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.S_3, width=5)
+        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['S_3'], width=5)
         length_new_entry.grid(row=2, column=1, padx=1, pady=1)
 
         ttk.Label(anode_frame, text="S_4", width=12).grid(row=3, column=0, padx=5, pady=5)
-        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode.S_4, width=5)
+        length_new_entry = ttk.Entry(anode_frame, textvariable=self.anode_vars['S_4'], width=5)
         length_new_entry.grid(row=3, column=1, padx=1, pady=1)
 
 
@@ -162,14 +274,17 @@ class CellGUI:
         cell_frame.grid(row=1, column=0, padx=5, pady=10, sticky="nw")
 
         ttk.Label(cell_frame, text="Current", width=10).grid(row=0, column=0, padx=5, pady=5)
-        cell_current_entry = ttk.Entry(cell_frame, textvariable=self.cell.current, width=6)
+        cell_current_entry = ttk.Entry(cell_frame, textvariable=self.cell_vars['current'], width=6)
         cell_current_entry.grid(row=0, column=1, padx=1, pady=1)
 
         ttk.Label(cell_frame, text="ACD", width=10).grid(row=1, column=0, padx=5, pady=5)
-        ACD_entry = ttk.Entry(cell_frame, textvariable=self.cell.ACD, width=6)
+        ACD_entry = ttk.Entry(cell_frame, textvariable=self.cell_vars['ACD'], width=6)
         ACD_entry.grid(row=1, column=1, padx=1, pady=1)
 
-        ttk.Button(self.root, text="Calculate", command=self.update_results).grid(row=5, column=0, columnspan=3, padx=10, pady=10)
+        ttk.Button(self.root, text="Calculate", command=self.update_results).grid(row=5, column=0, padx=10, pady=10)
+        ttk.Button(self.root, text="Cancel", command=self.cancel_results).grid(row=5, column=1, padx=10, pady=10)
+        self.status_label = ttk.Label(self.root, text="")
+        self.status_label.grid(row=5, column=2, padx=10, pady=10)
 
         # Components of cell voltage
 
@@ -185,104 +300,112 @@ class CellGUI:
         self.volt_table_conc_overvolt_gui = ttk.Label(volt_table, text="Conc overvolt:     V")
         self.volt_table_conc_overvolt_gui.grid(row=2, column=0, padx=5, pady=5, sticky="nw")
 
-    def on_slider_release(self, event):
-        # Update the bath attributes with the new values from the sliders
-        self.bath.update_attributes(
-            self.bath.w_Al2O3.get(),
-            self.bath.w_AlF3.get(),
-            self.bath.w_CaF2.get(),
-            self.bath.w_MgF2.get(),
-            self.bath.w_KF.get(),
-            self.bath.w_LiF.get(),
-            self.bath.bath_temp_K.get()
-        )
-
-    def update_results(self):
-        # Rest of the code remains unchanged
-        try:
-            self.anode.update_attributes(
-                self.anode.length_new.get(),
-                self.anode.width_new.get(),
-                self.anode.height.get(),
-                self.anode.depth_immers.get(),
-                self.anode.n_anodes.get()
-            )
-        except:
-            print("error updating anode")
-
+        self.create_heatmap()
+
+    def create_heatmap(self):
+        heatmap_frame = ttk.LabelFrame(self.root, text="Operating window (ACD x Al2O3)")
+        heatmap_frame.grid(row=1, column=7, columnspan=2, rowspan=4, padx=5, pady=5, sticky="nw")
+
+        self.voltage_map_gui = ttk.Label(heatmap_frame)
+        self.voltage_map_gui.grid(row=0, column=0, padx=5, pady=5)
+        self.margin_map_gui = ttk.Label(heatmap_frame)
+        self.margin_map_gui.grid(row=0, column=1, padx=5, pady=5)
+        self.voltage_map_range_gui = ttk.Label(heatmap_frame, text="Cell voltage:     V")
+        self.voltage_map_range_gui.grid(row=1, column=0, padx=5, pady=5, sticky="nw")
+        self.margin_map_range_gui = ttk.Label(heatmap_frame, text="Anode effect margin:     A/cm2")
+        self.margin_map_range_gui.grid(row=1, column=1, padx=5, pady=5, sticky="nw")
+        ttk.Label(heatmap_frame, text=f"ACD {heatmap.ACD_RANGE[0]}-{heatmap.ACD_RANGE[1]} cm left to right, "
+                                      f"Al2O3 {heatmap.ALUMINA_RANGE[1]}-{heatmap.ALUMINA_RANGE[0]} wt% top to bottom"
+                  ).grid(row=2, column=0, columnspan=2, padx=5, pady=5, sticky="nw")
+
+    def update_heatmap(self, *args):
+        # Re-render the operating window whenever an input changes, only the latest inputs are rendered
         try:
-            resistivity = self.bath.bath_resistivity()
-            self.resistivity_label.config(text=f"Bath Resistivity: {resistivity:.4f}")
-        except Exception as e:
-            print(f"Error calculating bath resistivity: {e}")
-            self.resistivity_label.config(text="error")
+            inputs = self.read_inputs()
+        except tk.TclError:
+            return # Entry being edited does not hold a number yet
+        self.heatmap_worker.submit(inputs)
+
+    def show_heatmap(self, inputs, window):
+        # PhotoImage needs the Tk thread, keep references so the images are not garbage collected
+        self.voltage_map = tk.PhotoImage(data=window['voltage_image'], format='PPM')
+        self.margin_map = tk.PhotoImage(data=window['margin_image'], format='PPM')
+        self.voltage_map_gui.config(image=self.voltage_map)
+        self.margin_map_gui.config(image=self.margin_map)
+        self.voltage_map_range_gui.config(text="Cell voltage: {:.2f} - {:.2f} V".format(*window['voltage_range']))
+        self.margin_map_range_gui.config(
+            text="Anode effect margin: {:.2f} - {:.2f} A/cm2 (red: anode effect)".format(*window['margin_range']))
 
-        try:
-            Equil_potential = self.bath.Equil_potential()
-            self.Equil_potential_label.config(text=f"Equil_potential: {Equil_potential:.4f}")
-            self.volt_table_field_Eq_pot_gui.config(text=f"Equil_potential: {Equil_potential:.4f}")
-        except Exception as e:
-            print(f"Error calculating Equil_potential: {e}")
-            self.Equil_potential_label.config(text="error")
-
-        try:
-            bath_ratio = self.bath.bath_ratio()
-            self.bath_ratio_label.config(text=f"bath_ratio: {bath_ratio:.4f}")
-        except Exception as e:
-            print(f"Error calculating bath_ratio: {e}")
-            self.bath_ratio_label.config(text="error")
-
-        try:
-            n_anodes = self.anode.n_anodes.get()
-            ACD = self.cell.ACD.get()
-            current = self.cell.current.get()
-            T_bath_K=self.bath.bath_temp_K.get()
-            rx_current_limit = self.bath.rx_limited_current_density()
-            surface_overvolt = self.anode.surface_overvoltage(current, n_anodes, ACD,T_bath_K, rx_current_limit)
-            self.rx_current_limit_label.config(text=f"rx limit: {rx_current_limit:.4f}")
-            self.volt_table_surf_overvolt_gui.config(text=f"Surface overvolt: {surface_overvolt:.4f}")
-            self.surface_overvolt_field_gui.config(text=f"Surf overvolt: {surface_overvolt:.2f} V")
-        except Exception as e:
-            print(f"Error calculating rx current limit: {e}")
-            self.rx_current_limit_label.config(text="error")
+    def on_slider_release(self, event):
+        # Recalculate with the new slider values, releases in quick succession only calculate the last one
+        self.update_results()
 
+    def update_results(self):
         try:
-
-            n_anodes = self.anode.n_anodes.get()
-            ACD = self.cell.ACD.get()
-            bot_anode_surface = self.anode.bath_eff_area(ACD)
-            self.bath_eff_area_field_gui.config(text=f"Bath eff area: {bot_anode_surface:.2f} cm2")
-            current = self.cell.current.get()
-            T_b_K = self.bath.bath_temp_K.get()
-            length = self.anode.length_new.get()
-            width = self.anode.width_new.get()
-            w_Al2O3 = self.bath.w_Al2O3.get()
-            current_intensity = self.anode.current_intensity(current, n_anodes, ACD)
-            critical_current_intensity = self.anode.concentration_limit_current_density(n_anodes, length, width, T_b_K, w_Al2O3)
-            anode_assy_v_drop = self.anode_assembly.voltage_drop(current)
-            print(anode_assy_v_drop)
-            #surface_overvolt = self.anode.surface_overvoltage(current, n_anodes, ACD)
-            conc_overvolt = self.anode.concentration_overvolt(current, n_anodes, ACD, length, width, T_b_K, w_Al2O3)
-            self.current_density_field_gui.config(text=f"Current density: {current_intensity:.2f} A/cm2")
-            #self.surface_overvolt_field_gui.config(text=f"Surf overvolt: {surface_overvolt:.2f} V")
-            self.concentration_overvolt_field_gui.config(text=f"Conc overvolt: {conc_overvolt:.2f} V")
-            self.critical_current_density_field_gui.config(text=f"Critical current density: {critical_current_intensity:.2f} A/cm2")
-            #self.volt_table_field_Eq_pot_gui.config(text=f"Equil_potential: {Equil_potential:.4f}")
-            #self.volt_table_surf_overvolt_gui.config(text=f"Surface overvolt: {surface_overvolt:.4f}")
-            self.volt_table_conc_overvolt_gui.config(text=f"Conc overvolt: {conc_overvolt:.4f}")
+            inputs = self.read_inputs()
         except Exception as e:
-            print(f"Error calculating anode attributes: {e}")
+            print(f"error updating model inputs: {e}")
+            return
+        self.status_label.config(text="Calculating...")
+        self.worker.submit(inputs)
+
+    def cancel_results(self):
+        self.worker.cancel()
+        self.status_label.config(text="Cancelled")
+
+    def show_error(self, inputs, error):
+        print(f"Error in calculation: {error}")
+        self.status_label.config(text="error")
+
+    def show_results(self, inputs, results):
+        # Runs on the Tk thread with the results of the latest request
+        self.push_inputs(inputs)
+        self.status_label.config(text="")
+
+        def show(name, fields, message):
+            value = results[name]
+            if isinstance(value, Exception):
+                print(f"{message}: {value}")
+                for field, _ in fields[:1]:
+                    field.config(text="error")
+                return False
+            for field, text in fields:
+                field.config(text=text.format(value))
+            return True
+
+        show('resistivity', [(self.resistivity_label, "Bath Resistivity: {:.4f}")],
+             "Error calculating bath resistivity")
+        show('Equil_potential', [(self.Equil_potential_label, "Equil_potential: {:.4f}"),
+                                 (self.volt_table_field_Eq_pot_gui, "Equil_potential: {:.4f}")],
+             "Error calculating Equil_potential")
+        show('bath_ratio', [(self.bath_ratio_label, "bath_ratio: {:.4f}")], "Error calculating bath_ratio")
+        if show('rx_current_limit', [(self.rx_current_limit_label, "rx limit: {:.4f}")],
+                "Error calculating rx current limit"):
+            show('surface_overvolt', [(self.volt_table_surf_overvolt_gui, "Surface overvolt: {:.4f}"),
+                                      (self.surface_overvolt_field_gui, "Surf overvolt: {:.2f} V")],
+                 "Error calculating rx current limit")
+        anode_results = ('bath_eff_area', 'current_intensity', 'critical_current_intensity', 'anode_assy_v_drop',
+                         'conc_overvolt')
+        failed = [name for name in anode_results if isinstance(results[name], Exception)]
+        if failed:
+            print(f"Error calculating anode attributes: {results[failed[0]]}")
             self.bath_eff_area_field_gui.config(text="error")
-            #self.current_intensity_label.config(text="error")
-        try:
-            print(f"Resistance table anode assembly:")
-            print(self.anode_assembly.resistance)
-        except:
-            print("Error anode assy")
+        else:
+            self.bath_eff_area_field_gui.config(text=f"Bath eff area: {results['bath_eff_area']:.2f} cm2")
+            print(results['anode_assy_v_drop'])
+            self.current_density_field_gui.config(text=f"Current density: {results['current_intensity']:.2f} A/cm2")
+            self.concentration_overvolt_field_gui.config(text=f"Conc overvolt: {results['conc_overvolt']:.2f} V")
+            self.critical_current_density_field_gui.config(
+                text=f"Critical current density: {results['critical_current_intensity']:.2f} A/cm2")
+            self.volt_table_conc_overvolt_gui.config(text=f"Conc overvolt: {results['conc_overvolt']:.4f}")
+        print(f"Resistance table anode assembly:")
+        print(self.anode_assembly.resistance)
 
 if __name__ == "__main__":
     root = tk.Tk()
     print(f"Faraday: {F}")
+    # Redraws ask for the same derived quantities with mostly unchanged inputs
+    graph.enable()
 
     cell_gui = CellGUI(root)
     root.mainloop()
@@ -0,0 +1,145 @@
+"""
+Anode consumption and anode setting over the life of the anodes of a line of cells.
+Every anode burns carbon at the Faraday rate of the current it carries, C + 2 O = CO2 uses 4 electrons per carbon
+atom, plus an excess for air and CO2 burning. The carbon comes off the immersed surface: the bottom recedes and
+the immersed sides recede at side_ratio times the bottom rate, so height, length and width shrink together. The
+anodes of a cell are replaced on a staggered schedule, anodes_per_setting at a time every cycle / n_sets, in an
+order that sets neighbouring anodes far apart in time. A new anode is cold and picks up its share of the cell
+current over pickup_time, the rest of the cell current is shared by the other anodes in proportion to their
+effective bath area.
+
+All anodes of all pots are stepped together as arrays of shape (n_pots, n_anodes). The simulation starts one
+cycle before time 0 with new anodes, so by time 0 every anode has been set once and the line is in its steady
+rotation. Dimensions follow Anode: length, width and height in mm, ACD, immersion depth and spacings in cm.
+The consumption and density defaults are illustrative, replace them with plant figures.
+"""
+import math
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import F, Anode, Cell_input
+
+M_C = 12.011 # Molar mass of carbon g/mol
+DAY = 86400.0 # s
+
+
+def carbon_consumption(anode_current, excess_consumption=0.15):
+    # Carbon consumed by an anode in kg/s for its current in kA, the Faraday rate plus the excess
+    return (1 + excess_consumption) * anode_current * 1000 / (4 * F) * M_C / 1000
+
+
+def setting_order(n_anodes, anodes_per_setting=2):
+    """
+    Slot of every anode in the setting cycle. Anodes are set in groups of anodes_per_setting neighbours, and
+    consecutive slots go to groups about half a cell apart.
+    :return: int array (n_anodes,) of slots, 0 to n_sets - 1
+    """
+    n_sets = -(-n_anodes // anodes_per_setting)
+    stride = max(n_sets // 2, 1)
+    while math.gcd(stride, n_sets) != 1:
+        stride += 1
+    group = np.arange(n_anodes) // anodes_per_setting
+    return group * pow(stride, -1, n_sets) % n_sets
+
+
+def simulate_anodes(duration=30 * DAY, current=None, n_pots=1, n_anodes=None, dt=3600.0, record_every=6,
+                    cycle=30 * DAY, anodes_per_setting=2, order=None, pot_phase=None, pickup_time=DAY / 2,
+                    excess_consumption=0.15, density=1.55, side_ratio=0.15, ACD=None, length_new=None,
+                    width_new=None, height=None, depth_immers=None, S_1=None, S_2=None, S_3=None, S_4=None):
+    """
+    Simulate the geometry and current of every anode of n_pots cells.
+    :param duration: simulated time after the warm-up cycle [s]
+    :param current: cell current [kA], scalar or shape (n_pots,), defaults to Cell_input()
+    :param n_anodes: anodes per cell, the same for all pots, defaults to Anode()
+    :param dt: time step [s]
+    :param record_every: keep every record_every-th step in the returned trajectories
+    :param cycle: anode life, every anode is replaced once per cycle [s]
+    :param anodes_per_setting: anodes replaced together at each setting
+    :param order: slot of every anode in the cycle, shape (n_anodes,), defaults to setting_order
+    :param pot_phase: offset of each pot's schedule as a fraction of the setting interval, shape (n_pots,),
+                      defaults to pots evenly staggered
+    :param pickup_time: time constant of the current pick-up of a new anode [s]
+    :param excess_consumption: carbon burnt beyond the Faraday rate, as a fraction of it
+    :param density: apparent density of the baked anode [g/cm3]
+    :param side_ratio: recession rate of the immersed sides relative to the bottom
+    :param ACD, length_new, width_new, height, depth_immers, S_1, S_2, S_3, S_4: cell and new anode geometry,
+           scalars or shape (n_pots,), defaulting to Cell_input() and Anode()
+    :return: dict with time (n_records,), the recorded trajectories (n_records, n_pots, n_anodes) of age [s],
+             height, length, width [mm], anode_current [kA], bath_eff_area [cm2] and current_intensity [A/cm2],
+             mean_bath_eff_area (n_records, n_pots), the cell average that HH_Cell_Batch uses, and per anode
+             (n_pots, n_anodes) setting_time, the first setting at or after time 0 [s], and butt_height, the
+             height at the last replacement [mm], 0 for an anode that burnt through
+    """
+    anode, cell = Anode(), Cell_input()
+    n_anodes = anode.n_anodes if n_anodes is None else int(n_anodes)
+    values = {'current': current, 'ACD': ACD, 'length_new': length_new, 'width_new': width_new, 'height': height,
+              'depth_immers': depth_immers, 'S_1': S_1, 'S_2': S_2, 'S_3': S_3, 'S_4': S_4}
+    defaults = {'current': cell.current, 'ACD': cell.ACD}
+    inputs = {name: np.asarray(defaults[name] if name in defaults else getattr(anode, name), dtype=float)
+              if value is None else np.asarray(value, dtype=float) for name, value in values.items()}
+    n_pots = np.broadcast_shapes((n_pots,), *(value.shape for value in inputs.values()))[0]
+    # Pot parameters as (n_pots, 1) columns against the anode axis
+    cell_current, ACD, length_new, width_new, height_new, depth_immers, S_1, S_2, S_3, S_4 = (
+        np.broadcast_to(inputs[name], (n_pots,))[:, None] for name in values)
+
+    order = setting_order(n_anodes, anodes_per_setting) if order is None else np.asarray(order)
+    n_sets = int(order.max()) + 1
+    interval = cycle / n_sets
+    pot_phase = np.arange(n_pots) / n_pots if pot_phase is None else np.broadcast_to(pot_phase, (n_pots,))
+    setting_time = ((order[None, :] + pot_phase[:, None]) * interval) % cycle
+
+    shape = (n_pots, n_anodes)
+    height = np.broadcast_to(height_new, shape).copy()
+    length = np.broadcast_to(length_new, shape).copy()
+    width = np.broadcast_to(width_new, shape).copy()
+    butt_height = np.full(shape, np.nan)
+    depth_mm = depth_immers * 10
+    mm3_per_kg = 1e6 / density # density g/cm3 = kg/dm3, 1e6 mm3 per dm3
+
+    n_warmup = int(round(cycle / dt))
+    n_steps = int(round(duration / dt))
+    record_steps = np.arange(0, n_steps, record_every)
+    names = ('age', 'height', 'length', 'width', 'anode_current', 'bath_eff_area', 'current_intensity')
+    records = {name: np.empty((len(record_steps),) + shape) for name in names}
+    records['mean_bath_eff_area'] = np.empty((len(record_steps), n_pots))
+    age = np.full(shape, np.inf)
+
+    for step in range(-n_warmup, n_steps):
+        time = step * dt
+        new_age = (time - setting_time) % cycle
+        replaced = new_age < age
+        if step > -n_warmup and replaced.any():
+            butt_height[replaced] = height[replaced]
+            height[replaced] = np.broadcast_to(height_new, shape)[replaced]
+            length[replaced] = np.broadcast_to(length_new, shape)[replaced]
+            width[replaced] = np.broadcast_to(width_new, shape)[replaced]
+        age = new_age
+
+        area = batch.bath_eff_area(ACD, length, length, width, width, depth_immers, S_1, S_2, S_3, S_4)
+        # Pick-up at the middle of the step, so an anode set at this step already carries a little current
+        with np.errstate(divide='ignore'):
+            share = area * -np.expm1(-(age + dt / 2) / pickup_time)
+        anode_current = cell_current * share / share.sum(axis=1, keepdims=True)
+
+        if step >= 0 and step % record_every == 0:
+            index = step // record_every
+            for name, value in (('age', age), ('height', height), ('length', length), ('width', width),
+                                ('anode_current', anode_current), ('bath_eff_area', area),
+                                ('current_intensity', anode_current * 1000 / area)):
+                records[name][index] = value
+            records['mean_bath_eff_area'][index] = area.mean(axis=1)
+
+        # Carbon volume burnt this step, taken from the bottom and the immersed sides
+        volume = carbon_consumption(anode_current, excess_consumption) * dt * mm3_per_kg
+        # An anode that burns through (height 0) before it is replaced stops being consumed
+        recession = np.minimum(volume / (length * width + 2 * side_ratio * (length + width) * depth_mm), height)
+        height -= recession
+        length -= 2 * side_ratio * recession
+        width -= 2 * side_ratio * recession
+
+    results = {'time': record_steps * dt}
+    results.update(records)
+    results['setting_time'] = setting_time
+    results['butt_height'] = butt_height
+    return results
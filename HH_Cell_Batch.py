@@ -0,0 +1,350 @@
+"""
+Vectorized versions of the HH_Cell_Model_Classes equations.
+Every function takes scalars or NumPy arrays (broadcast against each other) and evaluates the
+same equation as the matching model method in a single pass. Points where the scalar method
+raises a math domain error (e.g. a supersaturated bath in Equil_potential) come back as NaN.
+"""
+import numpy as np
+
+from HH_Cell_Model_Classes import F, HIVES_CONDUCTIVITY, R, Anode, Anode_assembly, _fanning_geometry, _fanning_spacing
+
+BATH_COLUMNS = ('w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF', 'bath_temp_K')
+ANODE_COLUMNS = ('length_new', 'length_spent', 'width_new', 'width_spent', 'depth_immers', 'n_anodes',
+                 'S_1', 'S_2', 'S_3', 'S_4', 'bake_temp')
+BREAKDOWN_COLUMNS = ('current', 'ACD') + BATH_COLUMNS + ANODE_COLUMNS + ('assembly_resistance', 'thk_bubble')
+JACOBIAN_INPUTS = ('w_Al2O3', 'w_AlF3', 'bath_temp_K', 'ACD', 'current')
+VOLTAGE_COMPONENTS = ('Equil_potential', 'surface_overvoltage', 'concentration_overvolt', 'bath_voltage_drop',
+                      'anode_assembly_drop')
+
+
+def _columns(table, names, overrides):
+    # Pull the named columns out of a column table (dict, DataFrame, structured array), keyword
+    # arguments take precedence over the table
+    values = []
+    for name in names:
+        if name in overrides and overrides[name] is not None:
+            value = overrides[name]
+        elif table is not None:
+            value = table[name]
+        else:
+            raise TypeError(f"missing input column '{name}'")
+        values.append(np.asarray(value, dtype=float))
+    return values
+
+
+def _table_names(table):
+    names = getattr(table, 'dtype', None)
+    if names is not None and names.names is not None:
+        return names.names
+    return table.keys()
+
+
+def bath_conductivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
+    """
+    Cryolite bath electrical conductivity as function of temperature and chemical composition, assuming only
+    species are Al2O3, AlF3, CaF2, MgF2, KF, LiF, each species input in wt%, temperature in K.
+    Using electrical conductivity empirical equation from https://doi.org/10.1007/BF02915051
+    :return: bath conductivity in 1/ohm
+    """
+    c = HIVES_CONDUCTIVITY
+    return np.exp(c['constant'] + c['w_Al2O3'] * w_Al2O3 + c['w_AlF3'] * w_AlF3 + c['w_CaF2'] * w_CaF2 +
+                  c['w_MgF2'] * w_MgF2 + c['w_KF'] * w_KF + c['w_LiF'] * w_LiF + c['inverse_T'] / bath_temp_K)
+
+
+def bath_resistivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
+    return 1 / bath_conductivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K)
+
+
+def Al2O3_solub_A_factor(w_AlF3, w_CaF2, w_MgF2, w_LiF):
+    return 11.9 - 0.062 * w_AlF3 - 0.0031 * (w_AlF3 ** 2) - 0.5 * w_LiF - 0.2 * w_CaF2 - 0.3 * w_MgF2 + (
+            42 * w_LiF * w_AlF3) / (2000 + w_AlF3 * w_LiF)
+
+
+def Al2O3_solub_B_factor(w_AlF3, w_LiF):
+    return 4.8 - 0.048 * w_AlF3 + (2.2 * (w_LiF ** 1.5)) / (10 + w_LiF + 0.001 * w_AlF3)
+
+
+def Al2O3_sat(w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K):
+    return Al2O3_solub_A_factor(w_AlF3, w_CaF2, w_MgF2, w_LiF) * (
+            (bath_temp_K - 273.15) / 1000) ** Al2O3_solub_B_factor(w_AlF3, w_LiF)
+
+
+def Al2O3_rel_sat(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K):
+    return w_Al2O3 / Al2O3_sat(w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K)
+
+
+def Equil_potential(bath_temp_K, Al2O3_rel_sat):
+    """
+    Equilibrium potential using equation (5) from https://doi.org/10.1007/978-3-319-48156-2_21
+    Takes the relative saturation rather than the composition so callers can reuse it.
+    :return: Equilibium potential in volts, NaN where Al2O3_rel_sat > 1
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 1.897 - 0.00056 * bath_temp_K + (8.314 * bath_temp_K) / (12 * 96485) * np.power(
+            np.log(1 / Al2O3_rel_sat), 2.77)
+
+
+def bath_ratio(w_Al2O3, w_AlF3, w_CaF2):
+    """
+    NaF/AlF3 weight ratio, see Bath.bath_ratio for the derivation.
+    Equation for bath ratio derived from https://doi.org/10.1007/978-3-319-48156-2_118
+    """
+    return (1.5 * (100 - w_CaF2 - w_Al2O3 - w_AlF3)) / ((100 - w_CaF2 - w_Al2O3) + (1.5 * w_AlF3))
+
+
+def rx_limited_current_density(w_Al2O3, w_LiF, bath_ratio):
+    """
+    From paper titled 'Haupin, W. Interpreting the components of cell voltage'
+    Eq. 25
+    https://doi.org/10.1007/978-3-319-48156-2_21
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.exp(0.56 * np.log(w_Al2O3 + w_LiF / 4) + 0.276 * (bath_ratio * 2 - 1.5) - 5.849)
+
+
+def bath_properties(table=None, w_Al2O3=None, w_AlF3=None, w_CaF2=None, w_MgF2=None, w_KF=None, w_LiF=None,
+                    bath_temp_K=None):
+    """
+    Evaluate every derived Bath property for arrays of compositions and temperatures in one pass.
+    Inputs can be given as a column table (anything indexable by column name: dict, pandas DataFrame,
+    NumPy structured array) and/or as keyword arrays, which override the table columns.
+    :return: dict of arrays: bath_conductivity, bath_resistivity, Al2O3_sat, Al2O3_rel_sat, Equil_potential,
+             bath_ratio, rx_limited_current_density
+    """
+    w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K = _columns(table, BATH_COLUMNS, {
+        'w_Al2O3': w_Al2O3, 'w_AlF3': w_AlF3, 'w_CaF2': w_CaF2, 'w_MgF2': w_MgF2, 'w_KF': w_KF,
+        'w_LiF': w_LiF, 'bath_temp_K': bath_temp_K})
+
+    conductivity = bath_conductivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K)
+    sat = Al2O3_sat(w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K)
+    rel_sat = w_Al2O3 / sat
+    ratio = bath_ratio(w_Al2O3, w_AlF3, w_CaF2)
+    return {
+        'bath_conductivity': conductivity,
+        'bath_resistivity': 1 / conductivity,
+        'Al2O3_sat': sat,
+        'Al2O3_rel_sat': rel_sat,
+        'Equil_potential': Equil_potential(bath_temp_K, rel_sat),
+        'bath_ratio': ratio,
+        'rx_limited_current_density': rx_limited_current_density(w_Al2O3, w_LiF, ratio),
+    }
+
+
+def fanning_factor(ACD, S_i, length_avg, width_avg, depth_immers):
+    """
+    Haupin fanning factor, see Anode.fanning_factor. Lengths in cm.
+    From paper titled 'Haupin, W. Interpreting the components of cell voltage'
+    Eq. 34
+    https://doi.org/10.1007/978-3-319-48156-2_21
+    """
+    return _fanning_spacing(ACD, S_i) * _fanning_geometry(length_avg, width_avg, depth_immers)
+
+
+def bath_eff_area(ACD, length_new, length_spent, width_new, width_spent, depth_immers, S_1, S_2, S_3, S_4):
+    """
+    Effective bath area under one anode including the fanning of current around its sides.
+    Anode dimensions in mm, ACD, immersion depth and spacings in cm.
+    The geometry term of the fanning factor is evaluated once and shared by the four sides.
+    :return: effective area in cm2
+    """
+    length_avg = (length_new + length_spent) / 2 * .1
+    width_avg = (width_new + width_spent) / 2 * .1
+    geometry = _fanning_geometry(length_avg, width_avg, depth_immers)
+    return (length_avg + _fanning_spacing(ACD, S_1) * geometry + _fanning_spacing(ACD, S_2) * geometry) * (
+            width_avg + _fanning_spacing(ACD, S_3) * geometry + _fanning_spacing(ACD, S_4) * geometry)
+
+
+def current_intensity(current, n_anodes, bath_eff_area):
+    # Anode current density in A/cm2 from the cell current in kA
+    return (current * 1000) / bath_eff_area / n_anodes
+
+
+def surface_overvoltage(current_intensity, rx_limited_current_density, bath_temp_K, bake_temp):
+    """
+    This equation is valid only for current densities higher than 0.01 A/cm2
+    From paper titled 'Haupin, W. Interpreting the components of cell voltage'
+    Eq. 26
+    https://doi.org/10.1007/978-3-319-48156-2_21
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return 1.142e-5 * np.log(bake_temp + 273.15) * bath_temp_K * np.log(
+            current_intensity / rx_limited_current_density)
+
+
+def concentration_limit_current_density(n_anodes, length, width, bath_temp_K, w_Al2O3):
+    """
+    Alternate equation from GRJOTHEIM, Kai; WELCH, Barry J. Aluminium Smelter Technology--a Pure and Applied Approach.
+    Aluminium-Verlag, P. O. Box 1207, Konigsallee 30, D 4000 Dusseldorf 1, FRG, 1988., 1988.
+    Chapter 5, Equation 13.
+    """
+    return _concentration_limit_scale(n_anodes, length, width, bath_temp_K) * (-0.4 + np.sqrt(w_Al2O3))
+
+
+def _concentration_limit_scale(n_anodes, length, width, bath_temp_K):
+    # Part of the concentration limited current density that does not depend on the alumina concentration
+    A_n = length * .1 * width * .1
+    return (5.5 + 0.018 * (bath_temp_K - 1323)) * (A_n * n_anodes) ** -0.1
+
+
+def concentration_overvolt(current_intensity, concentration_limit_current_density, bath_temp_K):
+    # NaN where the anode is past the concentration limit (i_c <= i_a), the scalar method raises there
+    i_c = concentration_limit_current_density
+    with np.errstate(invalid='ignore', divide='ignore'):
+        overvolt = ((R * bath_temp_K) / (2 * F)) * np.log(i_c / (i_c - current_intensity))
+    # A negative i_c (w_Al2O3 below 0.16 %) makes the ratio positive again
+    return np.where(i_c > current_intensity, overvolt, np.nan)
+
+
+def bath_voltage_drop(current_intensity, bath_conductivity, ACD, thk_bubble):
+    # Ohmic drop across the bath, U_bath in Component_cell_volt.py
+    return (current_intensity / bath_conductivity) * (ACD - thk_bubble)
+
+
+def anode_assembly_voltage_drop(current, assembly_resistance):
+    # Drop across the anode assembly for the total assembly resistance in ohm, current in kA
+    return assembly_resistance * (current * 1000)
+
+
+def _expand(value, shape):
+    # Writable C-contiguous array of the full broadcast shape
+    if np.shape(value) == shape and value.flags['C_CONTIGUOUS'] and value.flags['WRITEABLE']:
+        return value
+    return np.array(np.broadcast_to(value, shape), order='C')
+
+
+def _anode_defaults():
+    anode = Anode()
+    defaults = {name: getattr(anode, name) for name in ANODE_COLUMNS}
+    defaults['assembly_resistance'] = sum(Anode_assembly().resistance.values())
+    defaults['thk_bubble'] = 1.0
+    return defaults
+
+
+def cell_voltage_breakdown(table=None, **inputs):
+    """
+    Evaluate the complete cell voltage breakdown for any number of cells and timestamps in one pass.
+    Every input broadcasts against the others, e.g. current and ACD of shape (n_cells, n_times) with anode
+    geometry of shape (n_cells, 1). Inputs come from a column table and/or keyword arrays (keywords win):
+    current [kA], ACD [cm], the BATH_COLUMNS, and optionally the ANODE_COLUMNS, assembly_resistance [ohm]
+    and thk_bubble [cm], which default to the values of Anode(), Anode_assembly() and Component_cell_volt.py.
+    :return: dict of C-contiguous arrays of the broadcast shape, one per voltage component plus the intermediate
+             quantities they are built from
+    """
+    columns, shape = _breakdown_inputs(table, inputs)
+    results = _breakdown(**columns)
+    return {name: _expand(value, shape) for name, value in results.items()}
+
+
+def _breakdown_inputs(table, inputs):
+    # Resolve the breakdown inputs with their defaults, returns the columns by name and the broadcast shape
+    unknown = set(inputs) - set(BREAKDOWN_COLUMNS)
+    if unknown:
+        raise TypeError(f"unknown inputs: {', '.join(sorted(unknown))}")
+    defaults = _anode_defaults()
+    for name, value in defaults.items():
+        if inputs.get(name) is None and (table is None or name not in _table_names(table)):
+            inputs[name] = value
+    columns = dict(zip(BREAKDOWN_COLUMNS, _columns(table, BREAKDOWN_COLUMNS, inputs)))
+    return columns, np.broadcast_shapes(*(column.shape for column in columns.values()))
+
+
+def _breakdown(current, ACD, w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K, length_new, length_spent,
+               width_new, width_spent, depth_immers, n_anodes, S_1, S_2, S_3, S_4, bake_temp, assembly_resistance,
+               thk_bubble):
+    bath = bath_properties(w_Al2O3=w_Al2O3, w_AlF3=w_AlF3, w_CaF2=w_CaF2, w_MgF2=w_MgF2, w_KF=w_KF, w_LiF=w_LiF,
+                           bath_temp_K=bath_temp_K)
+    area = bath_eff_area(ACD, length_new, length_spent, width_new, width_spent, depth_immers, S_1, S_2, S_3, S_4)
+    i_a = current_intensity(current, n_anodes, area)
+    i_c = concentration_limit_current_density(n_anodes, length_new, width_new, bath_temp_K, w_Al2O3)
+    results = {
+        'bath_conductivity': bath['bath_conductivity'],
+        'rx_limited_current_density': bath['rx_limited_current_density'],
+        'bath_eff_area': area,
+        'current_intensity': i_a,
+        'concentration_limit_current_density': i_c,
+        'Equil_potential': bath['Equil_potential'],
+        'surface_overvoltage': surface_overvoltage(i_a, bath['rx_limited_current_density'], bath_temp_K, bake_temp),
+        'concentration_overvolt': concentration_overvolt(i_a, i_c, bath_temp_K),
+        'bath_voltage_drop': bath_voltage_drop(i_a, bath['bath_conductivity'], ACD, thk_bubble),
+        'anode_assembly_drop': anode_assembly_voltage_drop(current, assembly_resistance),
+    }
+    results['cell_voltage'] = sum(results[name] for name in VOLTAGE_COMPONENTS)
+    return results
+
+
+def cell_voltage_jacobian(table=None, **inputs):
+    """
+    Analytic derivatives of every voltage component with respect to JACOBIAN_INPUTS (w_Al2O3, w_AlF3,
+    bath_temp_K, ACD, current) for all operating points in one pass. Takes the same inputs as
+    cell_voltage_breakdown and reuses its intermediate quantities, so the cost is about two forward evaluations.
+    :return: (values, jacobian) where values is the cell_voltage_breakdown dict and jacobian maps each entry of
+             VOLTAGE_COMPONENTS and cell_voltage to an array of shape (*broadcast shape, 5) in V per input unit
+    """
+    columns, shape = _breakdown_inputs(table, inputs)
+    values = _breakdown(**columns)
+    a, f, L, T = columns['w_Al2O3'], columns['w_AlF3'], columns['w_LiF'], columns['bath_temp_K']
+    ACD, current, n_anodes = columns['ACD'], columns['current'], columns['n_anodes']
+    i_a, i_c = values['current_intensity'], values['concentration_limit_current_density']
+    zero = np.zeros(shape)
+
+    # Equilibrium potential through u = ln(1 / Al2O3_rel_sat) = ln(Al2O3_sat) - ln(w_Al2O3)
+    A = Al2O3_solub_A_factor(f, columns['w_CaF2'], columns['w_MgF2'], L)
+    B = Al2O3_solub_B_factor(f, L)
+    dA_df = -0.062 - 0.0062 * f + 84000 * L / (2000 + f * L) ** 2
+    dB_df = -0.048 - 0.0022 * L ** 1.5 / (10 + L + 0.001 * f) ** 2
+    log_theta = np.log((T - 273.15) / 1000)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        u = np.log(A / a) + B * log_theta
+        k = 8.314 / (12 * 96485)
+        u_177 = np.power(u, 1.77)
+        dE_du = k * T * 2.77 * u_177
+        dE = [-dE_du / a,
+              dE_du * (dA_df / A + dB_df * log_theta),
+              -0.00056 + k * u_177 * u + dE_du * B / (T - 273.15),
+              zero, zero]
+
+    # Reaction limited current density through the bath ratio
+    P = 100 - columns['w_CaF2'] - a
+    Q = (P + 1.5 * f) ** 2
+    dlnrx_da = 0.56 / (a + L / 4) - 0.552 * 3.75 * f / Q
+    dlnrx_df = -0.552 * 3.75 * P / Q
+
+    # Anode current density through the effective area
+    length_avg = (columns['length_new'] + columns['length_spent']) / 2 * .1
+    width_avg = (columns['width_new'] + columns['width_spent']) / 2 * .1
+    geometry = _fanning_geometry(length_avg, width_avg, columns['depth_immers'])
+    spacing = [_fanning_spacing(ACD, columns[name]) * geometry for name in ('S_1', 'S_2', 'S_3', 'S_4')]
+    slope = [(0.1656 - 0.0129 * ACD ** 2 + 0.0394 * columns[name]) * geometry for name in ('S_1', 'S_2', 'S_3', 'S_4')]
+    dArea_dACD = (slope[0] + slope[1]) * (width_avg + spacing[2] + spacing[3]) + (
+            length_avg + spacing[0] + spacing[1]) * (slope[2] + slope[3])
+    dlnia_dACD = -dArea_dACD / values['bath_eff_area']
+
+    eta_s = values['surface_overvoltage']
+    KT = 1.142e-5 * np.log(columns['bake_temp'] + 273.15) * T
+    dS = [-KT * dlnrx_da, -KT * dlnrx_df, eta_s / T, KT * dlnia_dACD, KT / current]
+
+    eta_c = values['concentration_overvolt']
+    hT = (R * T) / (2 * F)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        deta_dic = -hT * i_a / (i_c * (i_c - i_a))
+        deta_dia = hT / (i_c - i_a)
+        scale = _concentration_limit_scale(n_anodes, columns['length_new'], columns['width_new'], T)
+        dC = [deta_dic * scale * 0.5 / np.sqrt(a),
+              zero,
+              eta_c / T + deta_dic * (-0.4 + np.sqrt(a)) * scale * 0.018 / (5.5 + 0.018 * (T - 1323)),
+              deta_dia * i_a * dlnia_dACD,
+              deta_dia * i_a / current]
+
+    U = values['bath_voltage_drop']
+    c = HIVES_CONDUCTIVITY
+    dU = [-c['w_Al2O3'] * U, -c['w_AlF3'] * U, c['inverse_T'] / T ** 2 * U,
+          U * dlnia_dACD + i_a / values['bath_conductivity'], U / current]
+
+    dV = [zero, zero, zero, zero, columns['assembly_resistance'] * 1000]
+
+    jacobian = {}
+    for name, rows in zip(VOLTAGE_COMPONENTS, (dE, dS, dC, dU, dV)):
+        jacobian[name] = np.stack([np.broadcast_to(row, shape) for row in rows], axis=-1)
+    jacobian['cell_voltage'] = sum(jacobian[name] for name in VOLTAGE_COMPONENTS)
+    values = {name: _expand(value, shape) for name, value in values.items()}
+    return values, jacobian
@@ -0,0 +1,285 @@
+"""
+Benchmarks for the model functions at scalar and batch scale.
+Scalar cases call the Bath, Anode, Anode_assembly methods and the Component_cell_volt.py functions once per
+point in a Python loop, batch cases call HH_Cell_Batch once on arrays of the given size. Every case reports
+throughput (points per second), per-call latency percentiles and the peak memory allocated during one call.
+Results are saved as JSON and can be compared against a baseline recorded on the same machine. Throughput
+depends on the CPU, so baselines are kept per host under .benchmarks/ (not versioned):
+
+    python HH_Cell_Benchmark.py --save-baseline
+    python HH_Cell_Benchmark.py --baseline --threshold 0.2
+    python HH_Cell_Benchmark.py --output bench.json
+    python HH_Cell_Benchmark.py --baseline bench.json
+
+With --baseline the run fails (exit code 1) when any case loses more than the threshold fraction of its baseline
+throughput.
+Batch sizes stop at 10**6 by default, --large adds 10**7 (the jacobian case alone needs about 10 GB there).
+"""
+import argparse
+import json
+import os
+import platform
+import socket
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+import Component_cell_volt as ccv
+import HH_Cell_Batch as batch
+import HH_Cell_Graph as graph
+from HH_Cell_Model_Classes import Anode, Anode_assembly, Bath, Cell_input
+
+SIZES = (1, 10, 100, 1000, 10 ** 4, 10 ** 5, 10 ** 6)
+LARGE_SIZE = 10 ** 7 # Added by --large, about 1 kB per point for the jacobian
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks')
+SCALAR_MAX = 10 ** 4 # Largest loop run for the scalar cases
+
+
+def random_inputs(n, seed=0):
+    # Operating points spread around the default cell, shape (n,)
+    rng = np.random.default_rng(seed)
+    return {
+        'current': rng.uniform(250, 320, n), 'ACD': rng.uniform(2.5, 5.0, n),
+        'w_Al2O3': rng.uniform(2.0, 4.5, n), 'w_AlF3': rng.uniform(8.0, 12.0, n), 'w_CaF2': rng.uniform(4.0, 7.0, n),
+        'w_MgF2': rng.uniform(0.1, 0.5, n), 'w_KF': rng.uniform(0.0, 0.3, n), 'w_LiF': rng.uniform(0.0, 1.0, n),
+        'bath_temp_K': rng.uniform(1225.0, 1250.0, n),
+    }
+
+
+def _bath_method(name):
+    def setup(points):
+        bath = Bath()
+        rows = list(zip(*(points[column].tolist() for column in batch.BATH_COLUMNS)))
+
+        def run():
+            for row in rows:
+                bath.update_attributes(*row)
+                getattr(bath, name)()
+        return run
+    return setup
+
+
+def _anode_method(name):
+    def setup(points):
+        anode = Anode()
+        bath = Bath()
+        rx_limit = bath.rx_limited_current_density()
+        rows = list(zip(points['current'].tolist(), points['ACD'].tolist(), points['bath_temp_K'].tolist(),
+                        points['w_Al2O3'].tolist()))
+        calls = {
+            'fanning_factor': lambda current, ACD, T, w: anode.fanning_factor(ACD, anode.S_1),
+            'bath_eff_area': lambda current, ACD, T, w: anode.bath_eff_area(ACD),
+            'current_intensity': lambda current, ACD, T, w: anode.current_intensity(current, anode.n_anodes, ACD),
+            'surface_overvoltage': lambda current, ACD, T, w: anode.surface_overvoltage(
+                current, anode.n_anodes, ACD, T, rx_limit),
+            'concentration_limit_current_density': lambda current, ACD, T, w:
+                anode.concentration_limit_current_density(anode.n_anodes, anode.length_new, anode.width_new, T, w),
+            'concentration_overvolt': lambda current, ACD, T, w: anode.concentration_overvolt(
+                current, anode.n_anodes, ACD, anode.length_new, anode.width_new, T, w),
+        }
+        call = calls[name]
+
+        def run():
+            for row in rows:
+                call(*row)
+        return run
+    return setup
+
+
+def _assembly_voltage_drop(points):
+    assembly = Anode_assembly()
+    currents = (points['current'] * 1000).tolist()
+
+    def run():
+        for current in currents:
+            assembly.voltage_drop(current)
+    return run
+
+
+def _component_function(name):
+    def setup(points):
+        rows = list(zip(*(points[column].tolist() for column in batch.BATH_COLUMNS + ('ACD', 'current'))))
+        calls = {
+            'bath_k_ckv_eq': lambda a, f, c, m, k, l, T, ACD, I: ccv.bath_k_ckv_eq(T - 273.15, f, l, a),
+            'bath_k_arkp_eq': lambda a, f, c, m, k, l, T, ACD, I: ccv.bath_k_arkp_eq(T, a, c, 2.2),
+            'bath_k_hives_eq': lambda a, f, c, m, k, l, T, ACD, I: ccv.bath_k_hives_eq(T, f, a, c, m, k, l),
+            'anode_surface': lambda a, f, c, m, k, l, T, ACD, I: ccv.anode_surface(1.45, 0.54, 32),
+            'U_bath': lambda a, f, c, m, k, l, T, ACD, I: ccv.U_bath(0.8, 2.2, ACD, 1.0),
+        }
+        call = calls[name]
+
+        def run():
+            for row in rows:
+                call(*row)
+        return run
+    return setup
+
+
+def _scalar_breakdown(points):
+    # The voltage breakdown the way CellGUI.update_results assembles it, one point at a time
+    bath, anode, cell, assembly = Bath(), Anode(), Cell_input(), Anode_assembly()
+    rows = list(zip(*(points[column].tolist() for column in batch.BATH_COLUMNS + ('ACD', 'current'))))
+
+    def run():
+        for row in rows:
+            bath.update_attributes(*row[:7])
+            cell.ACD, cell.current = row[7], row[8]
+            T = bath.bath_temp_K
+            bath.Equil_potential()
+            anode.surface_overvoltage(cell.current, anode.n_anodes, cell.ACD, T, bath.rx_limited_current_density())
+            anode.concentration_overvolt(cell.current, anode.n_anodes, cell.ACD, anode.length_new, anode.width_new,
+                                         T, bath.w_Al2O3)
+            ccv.U_bath(anode.current_intensity(cell.current, anode.n_anodes, cell.ACD), bath.bath_conductivity(),
+                       cell.ACD, 1.0)
+            assembly.voltage_drop(cell.current * 1000)
+    return run
+
+
+def _batch_function(name):
+    def setup(points):
+        anode = Anode()
+        calls = {
+            'bath_properties': lambda: batch.bath_properties(points),
+            'bath_eff_area': lambda: batch.bath_eff_area(points['ACD'], anode.length_new, anode.length_spent,
+                                                         anode.width_new, anode.width_spent, anode.depth_immers,
+                                                         anode.S_1, anode.S_2, anode.S_3, anode.S_4),
+            'cell_voltage_breakdown': lambda: batch.cell_voltage_breakdown(points),
+            'cell_voltage_jacobian': lambda: batch.cell_voltage_jacobian(points),
+        }
+        return calls[name]
+    return setup
+
+
+CASES = {}
+for _name in ('bath_conductivity', 'bath_resistivity', 'Al2O3_sat', 'Al2O3_rel_sat', 'Equil_potential', 'bath_ratio',
+              'rx_limited_current_density'):
+    CASES[f'scalar.Bath.{_name}'] = _bath_method(_name)
+for _name in ('fanning_factor', 'bath_eff_area', 'current_intensity', 'surface_overvoltage',
+              'concentration_limit_current_density', 'concentration_overvolt'):
+    CASES[f'scalar.Anode.{_name}'] = _anode_method(_name)
+CASES['scalar.Anode_assembly.voltage_drop'] = _assembly_voltage_drop
+for _name in ('bath_k_ckv_eq', 'bath_k_arkp_eq', 'bath_k_hives_eq', 'anode_surface', 'U_bath'):
+    CASES[f'scalar.Component_cell_volt.{_name}'] = _component_function(_name)
+CASES['scalar.cell_voltage_breakdown'] = _scalar_breakdown
+for _name in ('bath_properties', 'bath_eff_area', 'cell_voltage_breakdown', 'cell_voltage_jacobian'):
+    CASES[f'batch.{_name}'] = _batch_function(_name)
+
+
+def measure(run, size, min_time=0.2, min_repeat=5, max_repeat=1000):
+    """
+    Time run() until both min_repeat calls and min_time seconds are reached
+    :return: dict with throughput [points/s] from the median call, latency percentiles [s] and peak_bytes
+    """
+    latencies = []
+    total = 0.0
+    while len(latencies) < max_repeat and (len(latencies) < min_repeat or total < min_time):
+        start = time.perf_counter()
+        run()
+        latency = time.perf_counter() - start
+        latencies.append(latency)
+        total += latency
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {'size': size, 'repeats': len(latencies), 'throughput': size / p50, 'latency_p50': p50,
+            'latency_p90': p90, 'latency_p99': p99, 'peak_bytes': peak}
+
+
+def run_benchmarks(sizes=SIZES, scalar_max=SCALAR_MAX, pattern='', min_time=0.2):
+    # The scalar cases time the model itself, not the derived quantity cache
+    cached = graph.enabled
+    graph.disable()
+    try:
+        return _run_benchmarks(sizes, scalar_max, pattern, min_time)
+    finally:
+        if cached:
+            graph.enable()
+
+
+def _run_benchmarks(sizes, scalar_max, pattern, min_time):
+    results = []
+    for size in sizes:
+        points = random_inputs(size)
+        for name, setup in CASES.items():
+            if pattern not in name or (name.startswith('scalar.') and size > scalar_max):
+                continue
+            result = measure(setup(points), size, min_time=min_time)
+            result['case'] = name
+            results.append(result)
+            print(f"{name:50s} n={size:<9d} {result['throughput']:12.4g} pts/s  p50 {result['latency_p50']:.3g} s  "
+                  f"peak {result['peak_bytes'] / 1e6:.1f} MB", file=sys.stderr)
+    return {
+        'meta': {'date': datetime.now().isoformat(timespec='seconds'), 'python': platform.python_version(),
+                 'numpy': np.__version__, 'machine': platform.machine(), 'platform': platform.platform()},
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=0.2):
+    """
+    Cases whose throughput fell by more than threshold (a fraction) relative to the baseline
+    :return: list of dicts with case, size, baseline and current throughput and the relative change
+    """
+    reference = {(row['case'], row['size']): row['throughput'] for row in baseline['results']}
+    regressions = []
+    for row in current['results']:
+        before = reference.get((row['case'], row['size']))
+        if before is None:
+            continue
+        change = row['throughput'] / before - 1
+        if change < -threshold:
+            regressions.append({'case': row['case'], 'size': row['size'], 'baseline': before,
+                                'current': row['throughput'], 'change': change})
+    return regressions
+
+
+def host_baseline():
+    # Baseline file of this machine
+    return os.path.join(BASELINE_DIR, f'{socket.gethostname()}.json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="batch sizes to run")
+    parser.add_argument('--large', action='store_true', help=f"also run size {LARGE_SIZE}, needs about 10 GB")
+    parser.add_argument('--scalar-max', type=int, default=SCALAR_MAX, help="largest size for scalar cases")
+    parser.add_argument('--filter', default='', help="only run cases whose name contains this text")
+    parser.add_argument('--min-time', type=float, default=0.2, help="minimum timing per case [s]")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', nargs='?', const=host_baseline(),
+                        help="compare against this JSON results file, without a file against this host's baseline")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as this host's baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed fractional throughput loss against the baseline")
+    args = parser.parse_args(argv)
+
+    # Read before the run, --save-baseline may overwrite the file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    sizes = list(args.sizes) + ([LARGE_SIZE] if args.large and LARGE_SIZE not in args.sizes else [])
+    results = run_benchmarks(sizes, args.scalar_max, args.filter, args.min_time)
+    outputs = [args.output] if args.output else []
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        outputs.append(host_baseline())
+    for output in outputs:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=1)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for row in regressions:
+            print(f"REGRESSION {row['case']} n={row['size']}: {row['baseline']:.4g} -> {row['current']:.4g} pts/s "
+                  f"({row['change']:+.1%})", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
 import math
 import pandas as pd
+
+import HH_Cell_Conductivity as conductivity
+from HH_Cell_Model_Classes import hives_conductivity
 class Bath:#Blueprint for bath
     #Attributes
     def __init__(self, w_Al2O3=2.5, w_AlF3=11, w_CaF2=4.5, w_MgF2=0.3, w_KF=0.1, w_LiF=0.5):
@@ -10,20 +13,19 @@ class Bath:#Blueprint for bath
 
 
     def bath_k_ckv_eq(self, T_bath_c):  # bath conductivity Chrenkova et. eal eq. Density, Electrical Conductivity And VIscosity Of Low Melting Baths For Aluminum Electrolysis
-        self.bath_k = -7.332 + 1.742e-2 * T_bath_c - 7.313e-6 * pow(T_bath_c, 2) - 1.866e-4 * pow(self.w_AlF3,
-                                                                                             2) - 2.824e-5 * self.w_AlF3 * T_bath_c + \
-                 4.613e-2 * self.w_LiF + 2.046e-4 * pow(self.w_LiF,
-                                                   2) - 4.695e-5 * self.w_Al2O3 * T_bath_c + 2.462e-4 * self.w_AlF3 * self.w_LiF + 2.003e-3 * self.w_AlF3 * self.w_Al2O3 - \
-                 5.546e-5 * self.w_AlF3 * self.w_LiF * self.w_Al2O3
+        self.bath_k = conductivity.ckv_conductivity(T_bath_c, self.composition['w_AlF3'].item(),
+                                                    self.composition['w_LiF'].item(),
+                                                    self.composition['w_Al2O3'].item())
         return self.bath_k
 
     def bath_k_arkp_eq(self, T_bath_k, w_Al2O3, w_CaF2, CR):
-        bath_k = -1.87 + 3.23e-3 * T_bath_k - 2.99e-2 * self.w_Al2O3 + 4.70e-1 * CR - 4.37e-2 * self.w_CaF2
+        self.bath_k = conductivity.arkp_conductivity(T_bath_k, w_Al2O3, w_CaF2, CR)
         return self.bath_k
 
     def bath_k_hives_eq(self, T_bath_k):  # Hives eq https://doi.org/10.1007/BF02915051
-        self.bath_k = math.exp(
-            1.977 - 0.02 * self.composition['w_Al2O3'].item() - 0.0131 * self.composition['w_AlF3'].item() - 0.006 * self.composition['w_CaF2'].item() - 0.0106 * self.composition['w_MgF2'].item() - 0.0019 * self.composition['w_KF'].item() + 0.0121 * self.composition['w_LiF'].item() - 1204.3 / T_bath_k)
+        self.bath_k = hives_conductivity(
+            *(self.composition[name].item() for name in ('w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF')),
+            T_bath_k)
         return self.bath_k
     def bath_ratio(self):
         self.br = (1.5 * (100 - self.composition['w_CaF2'].item() - self.composition['w_Al2O3'].item() - self.composition[
@@ -0,0 +1,132 @@
+"""
+Registry of bath conductivity correlations.
+Every registered model is a vectorized function of the same inputs, the Bath columns w_Al2O3, w_AlF3, w_CaF2,
+w_MgF2, w_KF, w_LiF [wt%] and bath_temp_K [K], and returns the conductivity in S/cm. Correlations written for
+other inputs (temperature in C, a given cryolite ratio) are adapted to that schema when they are registered.
+'hives' is the correlation the cell voltage model uses (HH_Cell_Batch.bath_conductivity). New correlations are
+added with
+    @register('name')
+    def my_conductivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K): ...
+and compare() evaluates all of them over a dataset in one pass, reporting throughput and the deviation of every
+model from the reference.
+
+    python HH_Cell_Conductivity.py 1000000
+"""
+import sys
+import time
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+
+MODELS = {}
+REFERENCE = 'hives'
+
+
+def register(name):
+    # Add a conductivity model taking the BATH_COLUMNS inputs to the registry
+    def decorator(function):
+        MODELS[name] = function
+        return function
+    return decorator
+
+
+def ckv_conductivity(T_bath_c, w_AlF3, w_LiF, w_Al2O3):
+    """
+    Chrenkova et al. Density, electrical conductivity and viscosity of low melting baths for aluminum electrolysis
+    :param T_bath_c: bath temperature [C]
+    :return: bath conductivity in S/cm
+    """
+    return -7.332 + 1.742e-2 * T_bath_c - 7.313e-6 * T_bath_c ** 2 - 1.866e-4 * w_AlF3 ** 2 - \
+        2.824e-5 * w_AlF3 * T_bath_c + 4.613e-2 * w_LiF + 2.046e-4 * w_LiF ** 2 - 4.695e-5 * w_Al2O3 * T_bath_c + \
+        2.462e-4 * w_AlF3 * w_LiF + 2.003e-3 * w_AlF3 * w_Al2O3 - 5.546e-5 * w_AlF3 * w_LiF * w_Al2O3
+
+
+def arkp_conductivity(T_bath_k, w_Al2O3, w_CaF2, CR):
+    # Linear correlation in temperature [K], Al2O3, CaF2 [wt%] and the cryolite ratio CR, in S/cm
+    return -1.87 + 3.23e-3 * T_bath_k - 2.99e-2 * w_Al2O3 + 4.70e-1 * CR - 4.37e-2 * w_CaF2
+
+
+register('hives')(batch.bath_conductivity)
+
+
+@register('ckv')
+def ckv(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
+    return ckv_conductivity(bath_temp_K - 273.15, w_AlF3, w_LiF, w_Al2O3)
+
+
+@register('arkp')
+def arkp(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
+    # Cryolite ratio from the composition, twice the bath ratio as in Bath.rx_limited_current_density
+    return arkp_conductivity(bath_temp_K, w_Al2O3, w_CaF2, 2 * batch.bath_ratio(w_Al2O3, w_AlF3, w_CaF2))
+
+
+def conductivity(model=REFERENCE, table=None, **columns):
+    """
+    Conductivity from one registered model
+    :param table: column table (dict, DataFrame, structured array), keyword arrays override its columns
+    :return: array of conductivities in S/cm
+    """
+    return MODELS[model](*batch._columns(table, batch.BATH_COLUMNS, columns))
+
+
+def compare(table=None, models=None, reference=REFERENCE, chunk_size=10 ** 6, **columns):
+    """
+    Evaluate every model over a dataset, a chunk at a time, and compare each one with the reference model.
+    :param models: model names, defaults to all registered models
+    :param chunk_size: points per chunk, bounds the memory of large datasets
+    :return: dict with n (points), reference and per model: seconds, throughput [points/s], compared (points where
+             both the model and the reference are finite), mean [S/cm], and relative to the reference:
+             mean_deviation, mean_abs_deviation, rms_deviation, max_abs_deviation [S/cm] and mean_abs_relative
+    """
+    models = list(MODELS) if models is None else list(models)
+    if reference not in models:
+        models.insert(0, reference)
+    inputs = np.broadcast_arrays(*batch._columns(table, batch.BATH_COLUMNS, columns))
+    inputs = [value.ravel() for value in inputs]
+    size = inputs[0].size
+    totals = {name: {'seconds': 0.0, 'n': 0, 'sum': 0.0, 'sum_deviation': 0.0, 'sum_abs': 0.0, 'sum_sq': 0.0,
+                     'max_abs': 0.0, 'sum_relative': 0.0} for name in models}
+    for start in range(0, size, chunk_size):
+        chunk = [value[start:start + chunk_size] for value in inputs]
+        values = {}
+        for name in models:
+            begin = time.perf_counter()
+            values[name] = MODELS[name](*chunk)
+            totals[name]['seconds'] += time.perf_counter() - begin
+        ref = values[reference]
+        for name in models:
+            deviation = values[name] - ref
+            valid = np.isfinite(deviation)
+            deviation = deviation[valid]
+            total = totals[name]
+            total['n'] += deviation.size
+            total['sum'] += values[name][valid].sum()
+            total['sum_deviation'] += deviation.sum()
+            total['sum_abs'] += np.abs(deviation).sum()
+            total['sum_sq'] += (deviation ** 2).sum()
+            total['max_abs'] = max(total['max_abs'], np.abs(deviation).max(initial=0.0))
+            total['sum_relative'] += np.abs(deviation / ref[valid]).sum()
+
+    report = {'n': size, 'reference': reference, 'models': {}}
+    for name, total in totals.items():
+        n = total['n'] or np.nan
+        report['models'][name] = {
+            'seconds': total['seconds'], 'throughput': size / total['seconds'] if total['seconds'] else np.inf,
+            'compared': total['n'],
+            'mean': total['sum'] / n, 'mean_deviation': total['sum_deviation'] / n,
+            'mean_abs_deviation': total['sum_abs'] / n, 'rms_deviation': np.sqrt(total['sum_sq'] / n),
+            'max_abs_deviation': total['max_abs'], 'mean_abs_relative': total['sum_relative'] / n,
+        }
+    return report
+
+
+if __name__ == "__main__":
+    from HH_Cell_Benchmark import random_inputs
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    report = compare(random_inputs(n))
+    print(f"{n} points, deviations from '{report['reference']}'")
+    for name, row in report['models'].items():
+        print(f"{name:8s} {row['throughput']:10.4g} pts/s  mean {row['mean']:.4f} S/cm  "
+              f"mean abs dev {row['mean_abs_deviation']:.4f} ({row['mean_abs_relative']:.1%})  "
+              f"max abs dev {row['max_abs_deviation']:.4f}")
@@ -0,0 +1,139 @@
+"""
+State of a whole potline, or of a million simulated pots, in one NumPy structured array.
+HH_Cell_Classes keeps every scalar of a cell in a one-row DataFrame, which costs kilobytes per cell and
+microseconds per .item(). Fleet stores one FLEET_DTYPE record per pot instead, 174 bytes holding the pot number,
+current, ACD, bath chemistry and temperature, anode geometry and the anode assembly resistance, so 10^6 pots take
+174 MB. Columns are read and written by name, fleet['ACD'] is a view of the ACD of every pot, and the state is a
+column table for every HH_Cell_Batch function:
+
+    fleet = Fleet(10 ** 6)
+    fleet['w_Al2O3'] = measured_alumina
+    results = fleet.cell_voltage_breakdown()
+
+Fields start from the Cell_input(), Bath(), Anode() and Anode_assembly() defaults. save() writes a plain .npy
+file that load() can memory-map, for fleets larger than memory.
+
+A column of a record array is strided, every value sits a whole record away from the next, so the model methods
+evaluate the fleet CHUNK pots at a time, while the records of the chunk are still in cache, rather than
+streaming each column separately from memory.
+"""
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import Bath, Cell_input
+
+CHUNK = 8192 # Pots per model evaluation, 1.4 MB of records
+
+# n_anodes is a count, every other model input is a float64 in the units of HH_Cell_Batch
+FLEET_DTYPE = np.dtype([('pot', np.int32), ('n_anodes', np.int16)] +
+                       [(name, np.float64) for name in batch.BREAKDOWN_COLUMNS if name != 'n_anodes'])
+
+
+def _default_record():
+    cell, bath = Cell_input(), Bath()
+    record = np.zeros((), dtype=FLEET_DTYPE)
+    for name in batch.BATH_COLUMNS:
+        record[name] = getattr(bath, name)
+    for name, value in dict(current=cell.current, ACD=cell.ACD, **batch._anode_defaults()).items():
+        record[name] = value
+    return record
+
+
+class Fleet:
+    def __init__(self, n=0, state=None):
+        """
+        :param n: number of pots, numbered 0 to n - 1 and set to the model defaults
+        :param state: existing FLEET_DTYPE array (or memory map) to wrap instead, used without copying
+        """
+        if state is None:
+            state = np.empty(n, dtype=FLEET_DTYPE)
+            state[...] = _default_record()
+            state['pot'] = np.arange(n)
+        elif state.dtype != FLEET_DTYPE:
+            raise TypeError(f"fleet state must have dtype FLEET_DTYPE, got {state.dtype}")
+        self.state = state
+
+    @classmethod
+    def from_columns(cls, table=None, **columns):
+        """
+        Fleet from a column table (dict, DataFrame, structured array) and/or keyword arrays, which win.
+        Columns broadcast against each other, fields found in neither take the model defaults.
+        """
+        names = [name for name in FLEET_DTYPE.names if
+                 columns.get(name) is not None or (table is not None and name in batch._table_names(table))]
+        values = dict(zip(names, batch._columns(table, names, columns)))
+        unknown = set(columns) - set(FLEET_DTYPE.names)
+        if unknown:
+            raise TypeError(f"unknown columns: {', '.join(sorted(unknown))}")
+        shape = np.broadcast_shapes(*(value.shape for value in values.values()))
+        if len(shape) > 1:
+            raise ValueError(f"fleet columns must be one-dimensional, got shape {shape}")
+        fleet = cls(shape[0] if shape else 1)
+        for name, value in values.items():
+            fleet.state[name] = value
+        return fleet
+
+    @classmethod
+    def load(cls, path, mmap_mode=None):
+        # Fleet saved with save(), mmap_mode='r+' edits the file in place
+        return cls(state=np.load(path, mmap_mode=mmap_mode))
+
+    def save(self, path):
+        np.save(path, self.state)
+
+    def __len__(self):
+        return len(self.state)
+
+    def __getitem__(self, key):
+        # Column by name, or a sub-fleet for an index, slice or boolean mask (a view for slices)
+        if isinstance(key, str):
+            return self.state[key]
+        return Fleet(state=np.atleast_1d(self.state[key]))
+
+    def __setitem__(self, name, value):
+        self.state[name] = value
+
+    def keys(self):
+        return FLEET_DTYPE.names
+
+    @property
+    def nbytes(self):
+        return self.state.nbytes
+
+    def columns(self, names=batch.BREAKDOWN_COLUMNS):
+        # Contiguous float64 copies of the named columns
+        return {name: np.ascontiguousarray(self.state[name], dtype=float) for name in names}
+
+    def _evaluate(self, function, overrides):
+        # Run a HH_Cell_Batch function on the fleet a chunk at a time and assemble the per pot results
+        if any(np.ndim(value) for value in overrides.values()):
+            # Array overrides need not line up with the chunks, evaluate on contiguous copies of the columns
+            return function(self.columns(), **overrides)
+        if len(self) <= CHUNK:
+            return function(self.state, **overrides)
+        results = None
+        for start in range(0, len(self), CHUNK):
+            part = function(self.state[start:start + CHUNK], **overrides)
+            parts = part if isinstance(part, tuple) else (part,)
+            if results is None:
+                results = tuple({name: np.empty((len(self),) + value.shape[1:]) for name, value in result.items()}
+                                for result in parts)
+            for result, chunk in zip(results, parts):
+                for name, value in chunk.items():
+                    result[name][start:start + CHUNK] = value
+        return results if isinstance(part, tuple) else results[0]
+
+    def bath_properties(self, **overrides):
+        # Derived Bath properties of every pot, see HH_Cell_Batch.bath_properties
+        return self._evaluate(batch.bath_properties, overrides)
+
+    def cell_voltage_breakdown(self, **overrides):
+        """
+        Cell voltage breakdown of every pot, see HH_Cell_Batch.cell_voltage_breakdown.
+        :param overrides: inputs replacing the fleet columns, e.g. ACD=4.0 or current of shape (n_times, n_pots)
+        """
+        return self._evaluate(batch.cell_voltage_breakdown, overrides)
+
+    def cell_voltage_jacobian(self, **overrides):
+        # (values, jacobian) of every pot, see HH_Cell_Batch.cell_voltage_jacobian
+        return self._evaluate(batch.cell_voltage_jacobian, overrides)
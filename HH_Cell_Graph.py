@@ -0,0 +1,153 @@
+"""
+Incremental evaluation of the derived model quantities.
+A model class derives from Derived_cache and declares for every derived quantity what it is computed from,
+    @derived('w_AlF3', 'w_LiF', 'Al2O3_solub_A_factor')
+    def Al2O3_sat(self): ...
+where the names are instance attributes or other derived quantities of the class. At class creation the
+declarations are resolved into the attributes every quantity depends on, directly or through other quantities.
+The last value of every quantity is kept per instance, together with those attribute values and the call
+arguments, and is served again as long as none of them has changed, whether they were set by
+update_attributes or by plain assignment. Attribute assignment itself is not intercepted, so setting inputs costs
+nothing extra. Keyword arguments are bound to the signature of the method, so f(1, b=2) and f(1, 2) share an
+entry. Calls with an array argument or array attribute are always evaluated, an array can change in place
+without changing its identity. The counters in `stats` show how many evaluations were avoided.
+
+The caches are off by default: checking the inputs costs a fraction of a microsecond per quantity, which is pure
+overhead for loops that change every input before every call. enable() turns them on for code that calls the
+same quantities repeatedly with unchanged inputs (e.g. a GUI redrawing) and disable() off again. Cached values
+are validated when they are used, so switching is always safe. While tracing is on (HH_Cell_Trace), every value
+served from the cache is counted in trace.cache_hits and recorded with cache_hit=True, since the method body and
+its record() calls do not run.
+"""
+import functools
+import sys
+from operator import attrgetter
+
+import HH_Cell_Trace as trace
+
+enabled = False
+stats = {} # quantity -> [hits, misses, invalidations]
+
+
+def derived(*inputs):
+    # Cache a model method until one of its inputs (attributes or derived quantities of the class) changes
+    def decorator(function):
+        name = function.__name__
+        stat = stats.setdefault(function.__qualname__, [0, 0, 0])
+        state_of = [_no_state] # Attribute getter, resolved by Derived_cache when the class is created
+
+        signature = [] # Bound on the first keyword call, inspect is slow to import
+
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            if not enabled:
+                return function(self, *args, **kwargs)
+            key = args
+            if kwargs:
+                if not signature:
+                    import inspect
+                    signature.append(inspect.signature(function))
+                bound = signature[0].bind(self, *args, **kwargs)
+                key = bound.args[1:] + tuple(sorted(bound.kwargs.items()))
+            state = state_of[0](self)
+            if _has_array(key) or _has_array(state):
+                return function(self, *args, **kwargs)
+            try:
+                cache = self._derived
+            except AttributeError:
+                cache = self._derived = {}
+            entry = cache.get(name)
+            if entry is not None:
+                if entry[0] == state and entry[1] == key:
+                    stat[0] += 1
+                    if trace.enabled:
+                        trace.record_cache_hit(function.__qualname__, entry[2])
+                    return entry[2]
+                if entry[0] != state:
+                    stat[2] += 1
+            stat[1] += 1
+            value = function(self, *args, **kwargs)
+            cache[name] = (state, key, value)
+            return value
+        wrapper.derived_inputs = inputs
+        wrapper.derived_state = state_of
+        return wrapper
+    return decorator
+
+
+class Derived_cache:
+    def __init_subclass__(cls, **kwargs):
+        # Resolve the attributes every derived quantity depends on, directly or through other quantities
+        super().__init_subclass__(**kwargs)
+        inputs = {name: getattr(cls, name).derived_inputs for name in dir(cls) if
+                  hasattr(getattr(cls, name), 'derived_inputs')}
+
+        def upstream(name, seen):
+            for source in inputs.get(name, ()):
+                if source not in seen:
+                    seen.add(source)
+                    upstream(source, seen)
+            return seen
+
+        for name in inputs:
+            attributes = sorted(source for source in upstream(name, set()) if source not in inputs)
+            if name in vars(cls):
+                vars(cls)[name].derived_state[0] = _state_getter(attributes)
+
+    def invalidate(self):
+        # Drop every cached quantity of this instance
+        self.__dict__.pop('_derived', None)
+
+
+def _no_state(instance):
+    return ()
+
+
+def _state_getter(attributes):
+    # Tuple of the attribute values, also for a single attribute
+    if not attributes:
+        return _no_state
+    if len(attributes) == 1:
+        getter = attrgetter(attributes[0])
+        return lambda instance: (getter(instance),)
+    return attrgetter(*attributes)
+
+
+def _has_array(values):
+    # numpy is looked up, not imported, the core stays free of it; without numpy loaded there are no arrays
+    numpy = sys.modules.get('numpy')
+    if numpy is None:
+        return False
+    return _has_ndarray(values, numpy.ndarray)
+
+
+def _has_ndarray(values, ndarray):
+    for value in values:
+        if isinstance(value, ndarray) or (isinstance(value, (tuple, list)) and _has_ndarray(value, ndarray)):
+            return True
+    return False
+
+
+def enable():
+    global enabled
+    enabled = True
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    for stat in stats.values():
+        stat[:] = [0, 0, 0]
+
+
+def summary():
+    """
+    :return: dict of quantity to hits, misses (evaluations), invalidations (evaluations because an upstream
+             attribute changed) and hit_rate, the share of calls served from the cache
+    """
+    return {name: {'hits': hits, 'misses': misses, 'invalidations': invalidations,
+                   'hit_rate': hits / (hits + misses) if hits + misses else float('nan')}
+            for name, (hits, misses, invalidations) in stats.items()}
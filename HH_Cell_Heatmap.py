@@ -0,0 +1,96 @@
+"""
+Operating window of a cell over ACD and alumina concentration.
+operating_window evaluates the batch model on a whole ACD x w_Al2O3 grid at one chemistry, and render turns the
+total cell voltage and the anode effect margin (concentration_limit_current_density minus current_intensity,
+negative where the anode is in anode effect) into PPM images that Tk's PhotoImage reads directly, so the GUI
+needs neither matplotlib nor Pillow.
+"""
+import numpy as np
+
+import HH_Cell_Batch as batch
+
+GRID_SIZE = 200
+ACD_RANGE = (2.0, 6.0) # cm
+ALUMINA_RANGE = (1.5, 6.0) # wt%
+NAN_COLOUR = (128, 128, 128)
+
+
+def _lut(anchors):
+    # 256 entry colour table interpolated between evenly spaced anchor colours
+    anchors = np.asarray(anchors, dtype=float)
+    x = np.linspace(0, 1, len(anchors))
+    t = np.linspace(0, 1, 256)
+    return np.stack([np.interp(t, x, anchors[:, c]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+
+VOLTAGE_LUT = _lut([(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)])
+MARGIN_LUT = _lut([(178, 24, 43), (244, 165, 130), (247, 247, 247), (146, 197, 222), (33, 102, 172)])
+
+
+def operating_window(n_ACD=GRID_SIZE, n_alumina=GRID_SIZE, ACD_range=ACD_RANGE, alumina_range=ALUMINA_RANGE,
+                     **inputs):
+    """
+    Cell voltage and anode effect margin on an ACD x w_Al2O3 grid.
+    :param inputs: the other cell_voltage_breakdown inputs as scalars (current, bath chemistry, temperature, ...)
+    :return: dict with ACD (n_ACD,), w_Al2O3 (n_alumina,) in decreasing order so row 0 is the top of an image,
+             and cell_voltage [V] and anode_effect_margin [A/cm2] of shape (n_alumina, n_ACD)
+    """
+    ACD = np.linspace(*ACD_range, n_ACD)
+    w_Al2O3 = np.linspace(alumina_range[1], alumina_range[0], n_alumina)
+    inputs.update(ACD=ACD[None, :], w_Al2O3=w_Al2O3[:, None])
+    results = batch.cell_voltage_breakdown(**inputs)
+    return {'ACD': ACD, 'w_Al2O3': w_Al2O3, 'cell_voltage': results['cell_voltage'],
+            'anode_effect_margin': results['concentration_limit_current_density'] - results['current_intensity']}
+
+
+def colour(values, lut, low, high):
+    # RGB image (uint8) of values scaled from [low, high] onto the colour table, NaN in NAN_COLOUR
+    with np.errstate(invalid='ignore'):
+        index = np.clip((values - low) * (255 / (high - low or 1.0)), 0, 255)
+    nan = np.isnan(index)
+    rgb = lut[np.where(nan, 0, index).astype(np.intp)]
+    rgb[nan] = NAN_COLOUR
+    return rgb
+
+
+def mark(rgb, row, column, size=4, colour=(0, 0, 0)):
+    # Draw a cross centred on one pixel, used for the current operating point
+    rows, columns = rgb.shape[:2]
+    if 0 <= row < rows and 0 <= column < columns:
+        rgb[row, max(column - size, 0):column + size + 1] = colour
+        rgb[max(row - size, 0):row + size + 1, column] = colour
+    return rgb
+
+
+def ppm(rgb):
+    # Binary PPM (P6) encoding of an RGB image, readable by tk.PhotoImage(data=...)
+    rows, columns = rgb.shape[:2]
+    return b'P6 %d %d 255\n' % (columns, rows) + np.ascontiguousarray(rgb, dtype=np.uint8).tobytes()
+
+
+def render(ACD=None, w_Al2O3=None, **inputs):
+    """
+    Both heatmaps as PPM images with the operating point marked.
+    :param ACD, w_Al2O3: current operating point, marked on the images if inside the grid
+    :param inputs: passed on to operating_window
+    :return: dict with the operating_window results, voltage_image and margin_image (PPM bytes) and the colour
+             scale limits voltage_range and margin_range
+    """
+    window = operating_window(**inputs)
+    voltage = window['cell_voltage']
+    finite = voltage[np.isfinite(voltage)]
+    voltage_range = (finite.min(), finite.max()) if finite.size else (0.0, 1.0)
+    margin = window['anode_effect_margin']
+    finite = np.abs(margin[np.isfinite(margin)])
+    limit = finite.max() if finite.size else 1.0
+    images = {'voltage_image': colour(voltage, VOLTAGE_LUT, *voltage_range),
+              'margin_image': colour(margin, MARGIN_LUT, -limit, limit)}
+    if ACD is not None and w_Al2O3 is not None:
+        column = int(round(np.interp(ACD, window['ACD'], np.arange(window['ACD'].size), left=-1, right=-1)))
+        row = int(round(np.interp(-w_Al2O3, -window['w_Al2O3'], np.arange(window['w_Al2O3'].size), left=-1,
+                                  right=-1)))
+        for image in images.values():
+            mark(image, row, column)
+    window.update({name: ppm(image) for name, image in images.items()})
+    window.update(voltage_range=voltage_range, margin_range=(-limit, limit))
+    return window
@@ -0,0 +1,214 @@
+"""
+Voltage decomposition of historian pot data that does not fit in memory.
+The dense signals (time, pot, line current and any of the ACD setpoint, bath temperature and measured pot
+voltage) and the sparse chemistry samples are read from CSV in chunks. Both must be in time order. Each
+chemistry column is forward-filled per pot onto the signal rows, with the last known values of every pot carried
+from one chunk to the next, and the full cell_voltage_breakdown is evaluated on each chunk. Results are appended
+to a Column_store, a directory of .npy files (one per column) that can be memory-mapped back with read_columns,
+so memory use depends on the chunk size and the number of pots, never on the length of the history.
+
+    python HH_Cell_Historian.py signals.csv chemistry.csv results/ --chunksize 500000
+
+Model inputs found in neither file take the Bath(), Cell_input() and Anode() defaults. Signal rows before the
+first chemistry sample of their pot get NaN for the sampled columns.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import Bath, Cell_input
+
+HEADER_SIZE = 128 # Fixed .npy header length, so the row count can be written once the file is complete
+OUTPUTS = ('bath_conductivity', 'current_intensity', 'concentration_limit_current_density') + \
+    batch.VOLTAGE_COMPONENTS + ('cell_voltage',)
+
+
+def _npy_header(dtype, rows):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(dtype),
+                                                                           rows)
+    return b'\x93NUMPY\x01\x00' + np.uint16(HEADER_SIZE - 10).tobytes() + \
+        header.ljust(HEADER_SIZE - 11).encode('latin1') + b'\n'
+
+
+class Column_store:
+    def __init__(self, directory):
+        # Columnar output, one .npy file per column, appended to chunk by chunk
+        self.directory = directory
+        self.rows = 0
+        self.files = {}
+        self.dtypes = {}
+        self.categories = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, columns):
+        """
+        Append equally long columns, the first call fixes the column names and dtypes.
+        Text columns are stored as int32 codes, the labels are kept in the manifest.
+        """
+        columns = {name: self._encode(name, np.asarray(values)) for name, values in columns.items()}
+        if not self.files:
+            for name, values in columns.items():
+                self.dtypes[name] = values.dtype
+                self.files[name] = open(os.path.join(self.directory, f'{name}.npy'), 'wb')
+                self.files[name].write(_npy_header(values.dtype, 0))
+        if set(columns) != set(self.files):
+            raise ValueError("every chunk must have the same columns")
+        lengths = {values.shape[0] for values in columns.values()}
+        if len(lengths) != 1:
+            raise ValueError("columns of a chunk must have the same length")
+        for name, values in columns.items():
+            self.files[name].write(np.ascontiguousarray(values, dtype=self.dtypes[name]).tobytes())
+        self.rows += lengths.pop()
+
+    def _encode(self, name, values):
+        if values.dtype != object and values.dtype.kind not in 'US':
+            return values
+        values = values.astype(str)
+        labels = self.categories.setdefault(name, {})
+        for label in pd.unique(values):
+            labels.setdefault(label, len(labels))
+        return pd.Index(list(labels)).get_indexer(values).astype(np.int32)
+
+    def close(self):
+        # Write the final row count into every header and the manifest
+        for name, f in self.files.items():
+            f.seek(0)
+            f.write(_npy_header(self.dtypes[name], self.rows))
+            f.close()
+        manifest = {'rows': self.rows, 'columns': list(self.files),
+                    'categories': {name: list(labels) for name, labels in self.categories.items()}}
+        with open(os.path.join(self.directory, 'columns.json'), 'w') as f:
+            json.dump(manifest, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_columns(directory, names=None):
+    # Memory-mapped columns of a Column_store directory, and its manifest
+    with open(os.path.join(directory, 'columns.json')) as f:
+        manifest = json.load(f)
+    names = manifest['columns'] if names is None else names
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in names}, manifest
+
+
+def _read_chunks(paths, chunksize, rename, csv_options):
+    # Chunks of a sequence of CSV files, renamed to model names and with the time column parsed
+    for path in [paths] if isinstance(paths, (str, os.PathLike)) else paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize, **csv_options):
+            chunk = chunk.rename(columns=rename)
+            if chunk['time'].dtype.kind not in 'iufM':
+                chunk['time'] = pd.to_datetime(chunk['time'])
+            yield chunk
+
+
+class _Chemistry_stream:
+    def __init__(self, chunks, empty):
+        # Chemistry samples handed out up to a given time, with the last values of every pot carried over
+        self.chunks = chunks
+        self.columns = list(empty.columns[2:])
+        self.pending = empty
+        self.last = empty
+        self.exhausted = False
+        self.time = None
+
+    def until(self, time):
+        while not self.exhausted and (self.pending.empty or self.pending['time'].iloc[-1] <= time):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                self.exhausted = True
+                break
+            _check_order(chunk['time'], self.time, 'chemistry')
+            self.time = chunk['time'].iloc[-1]
+            self.pending = pd.concat([self.pending, chunk[self.last.columns]], ignore_index=True)
+        split = int(self.pending['time'].searchsorted(time, side='right'))
+        samples = pd.concat([self.last, self.pending.iloc[:split]], ignore_index=True)
+        self.pending = self.pending.iloc[split:]
+        if self.columns:
+            samples[self.columns] = samples.groupby('pot')[self.columns].ffill()
+        self.last = samples.groupby('pot').tail(1)
+        return samples.sort_values('time', kind='stable')
+
+
+def _check_order(time, previous, name):
+    if not time.is_monotonic_increasing or (previous is not None and len(time) and time.iloc[0] < previous):
+        raise ValueError(f"{name} rows must be in time order")
+
+
+def ingest(signals, chemistry, output, chunksize=500_000, rename=None, **csv_options):
+    """
+    Stream historian CSV files through the voltage breakdown into a Column_store.
+    :param signals: CSV path or list of paths in time order, with columns time, pot, current [kA] and optionally
+                    voltage (measured pot voltage [V]) and any cell_voltage_breakdown input such as ACD and
+                    bath_temp_K
+    :param chemistry: CSV path or list of paths in time order, with columns time, pot and sampled breakdown
+                      inputs (w_Al2O3, w_AlF3, ...), empty cells meaning not analysed
+    :param output: directory for the Column_store
+    :param chunksize: signal rows per chunk
+    :param rename: dict of CSV column name to model name, applied to both inputs
+    :param csv_options: passed on to pandas.read_csv
+    :return: the manifest of the written store. Columns are time, pot, the model inputs taken from the files,
+             voltage and voltage_residual (measured minus model) when measured voltages are given, and OUTPUTS
+    """
+    rename = rename or {}
+    signal_chunks = _read_chunks(signals, chunksize, rename, csv_options)
+    chemistry_chunks = _read_chunks(chemistry, chunksize, rename, csv_options)
+    first = next(signal_chunks, None)
+    first_sample = next(chemistry_chunks, None)
+    if first is None:
+        raise ValueError("no signal rows to ingest")
+    signal_inputs = [name for name in first.columns if name in batch.BREAKDOWN_COLUMNS]
+    if first_sample is None:
+        empty = first[['time', 'pot']].iloc[:0]
+    else:
+        empty = first_sample[['time', 'pot'] + [name for name in first_sample.columns if
+                                                 name in batch.BREAKDOWN_COLUMNS and name not in signal_inputs]]
+        empty = empty.iloc[:0].astype({name: float for name in empty.columns[2:]})
+        chemistry_chunks = _prepend(first_sample, chemistry_chunks)
+    chemistry_stream = _Chemistry_stream(chemistry_chunks, empty)
+    chemistry_columns = chemistry_stream.columns
+
+    bath = Bath()
+    defaults = {name: getattr(bath, name) for name in batch.BATH_COLUMNS}
+    defaults['ACD'] = Cell_input().ACD
+    defaults = {name: value for name, value in defaults.items() if name not in signal_inputs + chemistry_columns}
+
+    previous = None
+    with Column_store(output) as store:
+        for chunk in _prepend(first, signal_chunks):
+            _check_order(chunk['time'], previous, 'signal')
+            previous = chunk['time'].iloc[-1]
+            samples = chemistry_stream.until(previous)
+            chunk = pd.merge_asof(chunk, samples, on='time', by='pot', direction='backward')
+            inputs = {name: chunk[name].to_numpy(dtype=float) for name in signal_inputs + chemistry_columns}
+            results = batch.cell_voltage_breakdown(**inputs, **defaults)
+            columns = {'time': chunk['time'].to_numpy(), 'pot': chunk['pot'].to_numpy()}
+            columns.update(inputs)
+            if 'voltage' in chunk:
+                columns['voltage'] = chunk['voltage'].to_numpy(dtype=float)
+                columns['voltage_residual'] = columns['voltage'] - results['cell_voltage']
+            columns.update({name: results[name] for name in OUTPUTS})
+            store.append(columns)
+    return read_columns(output, names=[])[1]
+
+
+def _prepend(item, iterator):
+    yield item
+    yield from iterator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('signals', help="CSV file of dense pot signals")
+    parser.add_argument('chemistry', help="CSV file of bath chemistry samples")
+    parser.add_argument('output', help="output directory")
+    parser.add_argument('--chunksize', type=int, default=500_000, help="signal rows per chunk")
+    args = parser.parse_args()
+    print(f"{ingest(args.signals, args.chemistry, args.output, args.chunksize)['rows']} rows written")
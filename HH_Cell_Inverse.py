@@ -0,0 +1,136 @@
+"""
+Inverse problems on the batch model, solved for many cells at once.
+solve_ACD finds the ACD that gives a target cell voltage with a bracketed Newton iteration that falls back to
+bisection whenever a Newton step leaves the bracket. solve_anode_effect_alumina finds the alumina
+concentration at which the concentration overvoltage diverges (i_c = i_a) or reaches a given limit; there the
+model can be inverted in closed form. Points without a solution are reported in masks instead of raising.
+"""
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import F, R
+
+
+def bracketed_newton(function, lo, hi, xtol=1e-9, ftol=1e-9, max_iter=100):
+    """
+    Vectorized safeguarded Newton iteration on independent scalar problems.
+    :param function: function(x, index) returning (f, df/dx) for the problems selected by the index array.
+                     Non-finite values of f (NaN, inf) mark a region without a solution, such as an anode
+                     effect. When one end of a bracket lies in it, that end is moved towards the other by
+                     bisection until f is finite there and changes sign across the bracket.
+    :param lo, hi: bracket of every problem, 1-D arrays, f(lo) and f(hi) must differ in sign
+    :return: dict of arrays: x, converged, has_solution (valid bracket), iterations, residual
+    """
+    lo = np.array(lo, dtype=float)
+    hi = np.array(hi, dtype=float)
+    n = lo.size
+    index = np.arange(n)
+    f_lo, _ = function(lo, index)
+    f_hi, _ = function(hi, index)
+    iterations = np.zeros(n, dtype=np.int64)
+
+    undefined_lo = ~np.isfinite(f_lo) & np.isfinite(f_hi)
+    search = np.flatnonzero(undefined_lo | (np.isfinite(f_lo) & ~np.isfinite(f_hi)))
+    for _ in range(max_iter):
+        if search.size == 0:
+            break
+        mid = (lo[search] + hi[search]) / 2
+        f_mid, _ = function(mid, search)
+        iterations[search] += 1
+        from_lo = undefined_lo[search]
+        finite = np.isfinite(f_mid)
+        found = finite & (np.sign(f_mid) * np.sign(np.where(from_lo, f_hi[search], f_lo[search])) <= 0)
+        # The undefined end moves to a non-finite or sign changing mid, the finite end to any other mid
+        move_lo = from_lo == (found | ~finite)
+        lo[search] = np.where(move_lo, mid, lo[search])
+        f_lo[search] = np.where(move_lo, f_mid, f_lo[search])
+        hi[search] = np.where(move_lo, hi[search], mid)
+        f_hi[search] = np.where(move_lo, f_hi[search], f_mid)
+        search = search[~(found | (hi[search] - lo[search] <= xtol))]
+
+    sign = np.sign(f_lo)
+    has_solution = np.isfinite(f_lo) & np.isfinite(f_hi) & (sign * np.sign(f_hi) <= 0)
+    x = np.where(f_lo == 0, lo, np.where(f_hi == 0, hi, (lo + hi) / 2))
+    residual = np.where(f_lo == 0, 0.0, np.where(f_hi == 0, 0.0, np.nan))
+    converged = has_solution & (residual == 0)
+
+    active = np.flatnonzero(has_solution & ~converged)
+    for _ in range(max_iter):
+        if active.size == 0:
+            break
+        xa = x[active]
+        f, df = function(xa, active)
+        iterations[active] += 1
+        residual[active] = f
+        on_lo_side = np.where(np.isfinite(f), sign[active] * f > 0, undefined_lo[active])
+        lo[active] = np.where(on_lo_side, xa, lo[active])
+        hi[active] = np.where(on_lo_side, hi[active], xa)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            step = xa - f / df
+        inside = np.isfinite(step) & (step > lo[active]) & (step < hi[active])
+        x[active] = np.where(inside, step, (lo[active] + hi[active]) / 2)
+        done = (np.abs(f) <= ftol) | (hi[active] - lo[active] <= xtol)
+        x[active] = np.where(np.abs(f) <= ftol, xa, x[active])
+        converged[active] = done
+        active = active[~done]
+    return {'x': x, 'converged': converged, 'has_solution': has_solution, 'iterations': iterations,
+            'residual': residual}
+
+
+def solve_ACD(cell_voltage, bracket=(1.5, 8.0), xtol=1e-9, ftol=1e-9, max_iter=100, table=None, **inputs):
+    """
+    ACD giving the target cell voltage for every operating point.
+    :param cell_voltage: target total cell voltage [V]
+    :param bracket: (low, high) ACD search interval [cm], scalars or arrays
+    :param inputs: the remaining cell_voltage_breakdown inputs (current, bath chemistry, temperature, geometry)
+    :return: dict of arrays of the broadcast shape: ACD (NaN without a solution), converged, has_solution,
+             iterations and residual [V]
+    """
+    inputs['ACD'] = 0.0
+    columns, shape = batch._breakdown_inputs(table, inputs)
+    target = np.asarray(cell_voltage, dtype=float)
+    shape = np.broadcast_shapes(shape, target.shape, np.shape(bracket[0]), np.shape(bracket[1]))
+    flat = {name: np.broadcast_to(value, shape).ravel() for name, value in columns.items()}
+    target = np.broadcast_to(target, shape).ravel()
+
+    def function(ACD, index):
+        points = {name: value[index] for name, value in flat.items()}
+        points['ACD'] = ACD
+        values, jacobian = batch.cell_voltage_jacobian(**points)
+        f = values['cell_voltage'] - target[index]
+        return f, jacobian['cell_voltage'][..., 3]
+
+    lo = np.broadcast_to(np.asarray(bracket[0], dtype=float), shape).ravel()
+    hi = np.broadcast_to(np.asarray(bracket[1], dtype=float), shape).ravel()
+    result = bracketed_newton(function, lo, hi, xtol, ftol, max_iter)
+    result['ACD'] = np.where(result['converged'], result.pop('x'), np.nan)
+    return {name: value.reshape(shape) for name, value in result.items()}
+
+
+def solve_anode_effect_alumina(overvolt_limit=None, table=None, **inputs):
+    """
+    Alumina concentration at which the anode reaches its concentration limit for the current load.
+    With overvolt_limit=None this is where i_c = i_a and concentration_overvolt diverges, otherwise where the
+    concentration overvoltage equals overvolt_limit [V]. i_c grows monotonically with w_Al2O3 as
+    i_c = scale * (sqrt(w_Al2O3) - 0.4), so the inverse is exact.
+    :param inputs: cell_voltage_breakdown inputs, w_Al2O3 is not needed
+    :return: dict of arrays: w_Al2O3 [wt%] (NaN without a solution), has_solution (solution at or below
+             Al2O3_sat, the bath cannot hold more) and Al2O3_sat
+    """
+    inputs['w_Al2O3'] = 1.0
+    columns, shape = batch._breakdown_inputs(table, inputs)
+    area = batch.bath_eff_area(*(columns[name] for name in (
+        'ACD', 'length_new', 'length_spent', 'width_new', 'width_spent', 'depth_immers', 'S_1', 'S_2', 'S_3', 'S_4')))
+    i_a = batch.current_intensity(columns['current'], columns['n_anodes'], area)
+    T = columns['bath_temp_K']
+    if overvolt_limit is None:
+        i_c = i_a
+    else:
+        q = np.exp(np.asarray(overvolt_limit, dtype=float) * 2 * F / (R * T))
+        i_c = i_a * q / (q - 1)
+    scale = batch._concentration_limit_scale(columns['n_anodes'], columns['length_new'], columns['width_new'], T)
+    w_Al2O3 = np.broadcast_to((i_c / scale + 0.4) ** 2, shape)
+    sat = np.broadcast_to(batch.Al2O3_sat(columns['w_AlF3'], columns['w_CaF2'], columns['w_MgF2'], columns['w_LiF'],
+                                          T), shape)
+    has_solution = np.isfinite(w_Al2O3) & (scale > 0) & (w_Al2O3 <= sat)
+    return {'w_Al2O3': np.where(has_solution, w_Al2O3, np.nan), 'has_solution': has_solution, 'Al2O3_sat': sat}
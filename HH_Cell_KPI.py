@@ -0,0 +1,169 @@
+"""
+Plant KPIs from the voltage breakdown: metal production, current efficiency, specific energy and DC power.
+kpis evaluates, for every row of a column table (one pot at one time), the theoretical metal production at the
+Faraday rate, the current efficiency from a registered correlation, the metal produced, the DC power U I and the
+specific energy U / (CE x electrochemical equivalent). aggregate sums them over time windows by pot, section or
+line with np.bincount on combined (window, group) codes, so any number of rows, windows and groups is a few
+vectorized passes. Ratios are formed from the sums (e.g. CE of a window is metal over theoretical production),
+never by averaging ratios.
+
+Current efficiency correlations take the bath ratio, bath temperature [K] and ACD [cm] and are added with
+    @register('name')
+    def my_efficiency(bath_ratio, bath_temp_K, ACD): ...
+"""
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import F
+
+M_Al = 26.98 # Molar mass of aluminium g/mol
+KG_PER_KAH = 3600 * M_Al / (3 * F) # Aluminium deposited per kAh at 100 % current efficiency, 0.3356 kg
+KWH_PER_KG_PER_V = 1 / KG_PER_KAH # Specific energy per volt of cell voltage at 100 % current efficiency
+CE_MODELS = {}
+KPIS = ('cell_voltage', 'dc_power', 'theoretical_production', 'current_efficiency', 'metal_production',
+        'specific_energy')
+
+
+def register(name):
+    # Add a current efficiency correlation taking bath_ratio, bath_temp_K and ACD to the registry
+    def decorator(function):
+        CE_MODELS[name] = function
+        return function
+    return decorator
+
+
+@register('linear')
+def linear_efficiency(bath_ratio, bath_temp_K, ACD, CE_0=0.94, bath_ratio_0=1.2, bath_temp_K_0=1233.15, ACD_0=3.45,
+                      per_bath_ratio=-0.1, per_K=-0.002, per_cm=0.01):
+    # Linearization around a reference operating point. The sensitivities are illustrative (CE falls about
+    # 0.2 % per K, rises with excess AlF3 and with ACD), replace them with a fit to your own potline.
+    return CE_0 + per_bath_ratio * (bath_ratio - bath_ratio_0) + per_K * (bath_temp_K - bath_temp_K_0) + \
+        per_cm * (ACD - ACD_0)
+
+
+@register('constant')
+def constant_efficiency(bath_ratio, bath_temp_K, ACD):
+    return np.full(np.broadcast_shapes(np.shape(bath_ratio), np.shape(bath_temp_K), np.shape(ACD)), 0.94)
+
+
+def theoretical_production(current):
+    # Metal production at 100 % current efficiency in kg/h for the cell current in kA
+    return current * KG_PER_KAH
+
+
+def specific_energy(cell_voltage, current_efficiency):
+    # kWh per kg of aluminium
+    return KWH_PER_KG_PER_V * cell_voltage / current_efficiency
+
+
+def current_efficiency(model='linear', table=None, **columns):
+    """
+    Current efficiency from a registered correlation.
+    :param table: column table (dict, DataFrame, structured array), keyword arrays override its columns. It needs
+                  bath_temp_K, ACD and either bath_ratio or w_Al2O3, w_AlF3 and w_CaF2.
+    :return: array of current efficiencies as fractions
+    """
+    if columns.get('bath_ratio') is None and (table is None or 'bath_ratio' not in batch._table_names(table)):
+        columns['bath_ratio'] = batch.bath_ratio(*batch._columns(table, ('w_Al2O3', 'w_AlF3', 'w_CaF2'), columns))
+    return CE_MODELS[model](*batch._columns(table, ('bath_ratio', 'bath_temp_K', 'ACD'), columns))
+
+
+def kpis(table=None, model='linear', **inputs):
+    """
+    KPIs of every operating point.
+    :param table: cell_voltage_breakdown inputs as a column table, keyword arrays override its columns
+    :param model: name of the current efficiency correlation in CE_MODELS
+    :return: dict of arrays: cell_voltage [V], dc_power [kW], theoretical_production and metal_production
+             [kg/h], current_efficiency and specific_energy [kWh/kg]
+    """
+    columns, shape = batch._breakdown_inputs(table, inputs)
+    results = batch._breakdown(**columns)
+    efficiency = current_efficiency(model, **columns)
+    theoretical = theoretical_production(columns['current'])
+    values = {
+        'cell_voltage': results['cell_voltage'],
+        'dc_power': results['cell_voltage'] * columns['current'],
+        'theoretical_production': theoretical,
+        'current_efficiency': efficiency,
+        'metal_production': theoretical * efficiency,
+        'specific_energy': specific_energy(results['cell_voltage'], efficiency),
+    }
+    return {name: batch._expand(value, shape) for name, value in values.items()}
+
+
+def _codes(labels):
+    # Group labels and the group index of every row
+    groups, codes = np.unique(np.asarray(labels), return_inverse=True)
+    return groups, codes.ravel()
+
+
+def aggregate(values, time, hours, pot=None, section=None, by='pot', windows=None):
+    """
+    Sum the KPIs of rows over time windows and groups of pots.
+    :param values: kpis() output, or any dict with cell_voltage, dc_power, theoretical_production and
+                   metal_production arrays, one value per row
+    :param time: time of every row, numbers or datetime64
+    :param hours: duration each row stands for [h], scalar or per row
+    :param pot: pot label of every row, needed for by='pot'
+    :param section: section label of every row, needed for by='section'. time, hours, pot and section broadcast
+                    against the KPI arrays, e.g. time of shape (n_times, 1) and pot of shape (n_pots,) for KPIs of
+                    shape (n_times, n_pots).
+    :param by: 'pot', 'section' or 'line'
+    :param windows: sorted window edges (n_windows + 1 times, rows outside are dropped), or a window length in
+                    the units of time (a timedelta64 for datetime64 times), None for a single window
+    :return: dict with edges, groups, and per window and group, arrays of shape (n_windows, n_groups): rows,
+             hours, charge [kAh], energy [kWh], theoretical_production and metal_production [kg], and from these
+             current_efficiency, specific_energy [kWh/kg], mean dc_power [kW], mean current [kA] and the
+             charge-weighted mean cell_voltage [V]. Rows where the model gives NaN are left out.
+    """
+    shape = np.shape(values['dc_power'])
+    time = np.broadcast_to(time, shape).ravel()
+    n = time.size
+    if by == 'line':
+        groups, group = np.array(['line']), np.zeros(n, dtype=np.intp)
+    elif by in ('pot', 'section'):
+        labels = pot if by == 'pot' else section
+        if labels is None:
+            raise TypeError(f"aggregating by {by} needs the {by} of every row")
+        groups, group = _codes(np.broadcast_to(labels, shape))
+    else:
+        raise ValueError(f"unknown grouping '{by}', use 'pot', 'section' or 'line'")
+
+    if windows is None:
+        edges = np.array([time.min(), time.max()]) if n else np.array([0, 0])
+        window = np.zeros(n, dtype=np.intp)
+    else:
+        if np.ndim(windows) == 0:
+            start = time.min() if n else 0
+            count = int(np.floor((time.max() - start) / windows)) + 1 if n else 1
+            edges = start + windows * np.arange(count + 1)
+        else:
+            edges = np.asarray(windows)
+        window = np.searchsorted(edges, time, side='right') - 1
+    n_windows, n_groups = len(edges) - 1, len(groups)
+    inside = (window >= 0) & (window < n_windows)
+    hours = np.broadcast_to(np.asarray(hours, dtype=float), time.shape)
+    weights = {
+        'hours': hours,
+        'charge': values['theoretical_production'].ravel() / KG_PER_KAH * hours,
+        'energy': values['dc_power'].ravel() * hours,
+        'theoretical_production': values['theoretical_production'].ravel() * hours,
+        'metal_production': values['metal_production'].ravel() * hours,
+    }
+    # Rows where the model has no solution (NaN) are left out of every sum
+    inside &= np.logical_and.reduce([np.isfinite(weight) for weight in weights.values()])
+    codes = window[inside] * n_groups + group[inside]
+    size = n_windows * n_groups
+    sums = {'rows': np.bincount(codes, minlength=size).reshape(n_windows, n_groups)}
+    for name, weight in weights.items():
+        sums[name] = np.bincount(codes, weights=weight[inside], minlength=size).reshape(n_windows, n_groups)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sums['current_efficiency'] = sums['metal_production'] / sums['theoretical_production']
+        sums['specific_energy'] = sums['energy'] / sums['metal_production']
+        sums['dc_power'] = sums['energy'] / sums['hours']
+        sums['current'] = sums['charge'] / sums['hours']
+        sums['cell_voltage'] = sums['energy'] / sums['charge']
+    sums['edges'] = edges
+    sums['groups'] = groups
+    return sums
@@ -1,7 +1,8 @@
-import tkinter as tk
 import math
-from statistics import mean
-import pandas as pd
+from functools import lru_cache
+
+import HH_Cell_Trace as trace
+from HH_Cell_Graph import Derived_cache, derived
 
 """
 Constants
@@ -10,35 +11,78 @@ n_e = 1.6022e-19 #Electron charge
 N_a = 6.022e23 # Avogadro's number of particles in 1 mole
 F = n_e * N_a # Faraday constant
 R = 8.314 #Universal gas constant J/ K mol
+GEOMETRY_CACHE_SIZE = 4096 # Anode geometries kept by the effective area cache
+# Hives bath conductivity, https://doi.org/10.1007/BF02915051
+# ln(k) = constant + sum of coefficient * wt% + inverse_T / T
+# Read by the scalar model here and the vectorized one in HH_Cell_Batch
+HIVES_CONDUCTIVITY = {'constant': 1.977, 'w_Al2O3': -0.02, 'w_AlF3': -0.0131, 'w_CaF2': -0.006, 'w_MgF2': -0.0106,
+                      'w_KF': -0.0019, 'w_LiF': 0.0121, 'inverse_T': -1204.3}
+
+_HIVES_TERMS = tuple(HIVES_CONDUCTIVITY.values()) # Unpacked per call, faster than the dict lookups
+
+def hives_conductivity(w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
+    # Bath conductivity in 1/ohm cm for scalar inputs, wt% and K
+    constant, c_Al2O3, c_AlF3, c_CaF2, c_MgF2, c_KF, c_LiF, c_T = _HIVES_TERMS
+    return math.exp(constant + c_Al2O3 * w_Al2O3 + c_AlF3 * w_AlF3 + c_CaF2 * w_CaF2 + c_MgF2 * w_MgF2 +
+                    c_KF * w_KF + c_LiF * w_LiF + c_T / bath_temp_K)
+
+def _fanning_geometry(length_avg, width_avg, depth_immers):
+    # Anode geometry term of the fanning factor, the same for all four sides of an anode
+    return 0.3844 + 0.06166 * depth_immers + 0.001822 * (length_avg + width_avg) - 0.000178 * depth_immers * (length_avg + width_avg)
+
+def _fanning_spacing(ACD, S_i):
+    # ACD and spacing term of the fanning factor
+    return 0.1656 * ACD - 0.0043 * pow(ACD, 3) + 0.1270 * S_i - 0.0034 * pow(S_i, 2) + 0.0394 * ACD * S_i
+
+@lru_cache(maxsize=GEOMETRY_CACHE_SIZE)
+def _anode_geometry(length_new, length_spent, width_new, width_spent, depth_immers, S_1, S_2, S_3, S_4, ACD):
+    """
+    Average anode dimensions, the four fanning factors and the effective bath area of one anode.
+    Cached with bounded LRU eviction, every current density and overvoltage evaluation goes through it.
+    :return: (length_avg, width_avg, (F1, F2, F3, F4), area)
+    """
+    length_avg = (length_new + length_spent) / 2 * .1
+    width_avg = (width_new + width_spent) / 2 * .1
+    geometry = _fanning_geometry(length_avg, width_avg, depth_immers)
+    factors = tuple(_fanning_spacing(ACD, S_i) * geometry for S_i in (S_1, S_2, S_3, S_4))
+    area = (length_avg + factors[0] + factors[1]) * (width_avg + factors[2] + factors[3])
+    return length_avg, width_avg, factors, area
+
+@lru_cache(maxsize=1)
+def _default_bath():
+    # Shared default composition for methods called without a bath, its derived quantities stay cached
+    return Bath()
 
 class Cell_input:
-    def __init__(self):
+    def __init__(self, current=280, ACD=3.45):
         # Initialize attribute values
-        self.current = tk.IntVar(value=280)
-        self.ACD = tk.DoubleVar(value=3.45)
+        self.current = current # Cell current (kA)
+        self.ACD = ACD # Anode to cathode distance (cm)
 
-class Bath:
-    def __init__(self):
+class Bath(Derived_cache):
+    def __init__(self, w_Al2O3=4.2, w_AlF3=10.3, w_CaF2=7.0, w_MgF2=0.3, w_KF=0.1, w_LiF=0.0,
+                 bath_temp_K=964 + 273.15):
         # Initialize attribute values
-        self.w_Al2O3 = tk.DoubleVar(value=4.2)
-        self.w_AlF3 = tk.DoubleVar(value=10.3)
-        self.w_CaF2 = tk.DoubleVar(value=7.0)
-        self.w_MgF2 = tk.DoubleVar(value=0.3)
-        self.w_KF = tk.DoubleVar(value=0.1)
-        self.w_LiF = tk.DoubleVar(value=0.0)
-        self.bath_temp_K = tk.DoubleVar(value=964 + 273.15)
+        self.w_Al2O3 = w_Al2O3
+        self.w_AlF3 = w_AlF3
+        self.w_CaF2 = w_CaF2
+        self.w_MgF2 = w_MgF2
+        self.w_KF = w_KF
+        self.w_LiF = w_LiF
+        self.bath_temp_K = bath_temp_K
         self.w_Al2O3_ae = 1
 
     def update_attributes(self, w_Al2O3, w_AlF3, w_CaF2, w_MgF2, w_KF, w_LiF, bath_temp_K):
-        # Update the attribute values with the new values passed from the GUI
-        self.w_Al2O3.set(w_Al2O3)
-        self.w_AlF3.set(w_AlF3)
-        self.w_CaF2.set(w_CaF2)
-        self.w_MgF2.set(w_MgF2)
-        self.w_KF.set(w_KF)
-        self.w_LiF.set(w_LiF)
-        self.bath_temp_K.set(bath_temp_K)
+        # Update the attribute values with the new values passed from the caller
+        self.w_Al2O3 = w_Al2O3
+        self.w_AlF3 = w_AlF3
+        self.w_CaF2 = w_CaF2
+        self.w_MgF2 = w_MgF2
+        self.w_KF = w_KF
+        self.w_LiF = w_LiF
+        self.bath_temp_K = bath_temp_K
 
+    @derived('w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF', 'bath_temp_K')
     def bath_conductivity(self):
         """
         Cryolite bath electrical conductivity as function of temperature and chemical composition, assuming only
@@ -46,42 +90,47 @@ class Bath:
         Using electrical conductivity empirical equation from https://doi.org/10.1007/BF02915051
         :return: bath conductivity in 1/ohm
         """
-        # Calculate the bath conductivity using the provided equation
-        bath_conductivity = math.exp(
-            1.977 - 0.02 * self.w_Al2O3.get() - 0.0131 * self.w_AlF3.get() - 0.006 * self.w_CaF2.get() - 0.0106 * self.w_MgF2.get() - 0.0019 * self.w_KF.get() + 0.0121 * self.w_LiF.get() - 1204.3 / self.bath_temp_K.get())
-        return bath_conductivity
+        return hives_conductivity(self.w_Al2O3, self.w_AlF3, self.w_CaF2, self.w_MgF2, self.w_KF, self.w_LiF,
+                                  self.bath_temp_K)
 
+    @derived('bath_conductivity')
     def bath_resistivity(self):
         # Calculate the bath resistivity
         bath_resistivity = 1 / self.bath_conductivity()
         return bath_resistivity
 
+    @derived('w_AlF3', 'w_LiF', 'w_CaF2', 'w_MgF2')
     def Al2O3_solub_A_factor(self):
         # Calculate Al2O3_solub_A_factor using the provided equation
-        Al2O3_solub_A_factor = 11.9 - 0.062 * self.w_AlF3.get() - 0.0031 * (
-                    self.w_AlF3.get() ** 2) - 0.5 * self.w_LiF.get() - 0.2 * self.w_CaF2.get() - 0.3 * self.w_MgF2.get() + (
-                                           42 * self.w_LiF.get() * self.w_AlF3.get()) / (
-                                           2000 + self.w_AlF3.get() * self.w_LiF.get())
+        Al2O3_solub_A_factor = 11.9 - 0.062 * self.w_AlF3 - 0.0031 * (
+                    self.w_AlF3 ** 2) - 0.5 * self.w_LiF - 0.2 * self.w_CaF2 - 0.3 * self.w_MgF2 + (
+                                           42 * self.w_LiF * self.w_AlF3) / (
+                                           2000 + self.w_AlF3 * self.w_LiF)
         return Al2O3_solub_A_factor
 
+    @derived('w_AlF3', 'w_LiF')
     def Al2O3_solub_B_factor(self):
         # Calculate Al2O3_solub_B_factor using the provided equation
-        Al2O3_solub_B_factor = 4.8 - 0.048 * self.w_AlF3.get() + (2.2 * (self.w_LiF.get() ** 1.5)) / (
-                    10 + self.w_LiF.get() + 0.001 * self.w_AlF3.get())
+        Al2O3_solub_B_factor = 4.8 - 0.048 * self.w_AlF3 + (2.2 * (self.w_LiF ** 1.5)) / (
+                    10 + self.w_LiF + 0.001 * self.w_AlF3)
         return Al2O3_solub_B_factor
 
+    @derived('Al2O3_solub_A_factor', 'Al2O3_solub_B_factor', 'bath_temp_K')
     def Al2O3_sat(self):
         # Calculate Al2O3_sat using the provided equation
         Al2O3_solub_A_factor = self.Al2O3_solub_A_factor()
         Al2O3_solub_B_factor = self.Al2O3_solub_B_factor()
-        Al2O3_sat = Al2O3_solub_A_factor * ((self.bath_temp_K.get() - 273.15) / 1000) ** Al2O3_solub_B_factor
+        Al2O3_sat = Al2O3_solub_A_factor * ((self.bath_temp_K - 273.15) / 1000) ** Al2O3_solub_B_factor
         return Al2O3_sat
 
+    @derived('w_Al2O3', 'Al2O3_sat')
     def Al2O3_rel_sat(self):
         # Calculate Al2O3_rel_sat using the provided equation
-        Al2O3_rel_sat = self.w_Al2O3.get() / self.Al2O3_sat()
+        Al2O3_rel_sat = self.w_Al2O3 / self.Al2O3_sat()
         return Al2O3_rel_sat
 
+    @trace.traced
+    @derived('bath_temp_K', 'Al2O3_rel_sat')
     def Equil_potential(self):
         """
         This function calculates the equilibrium potential using equation (5) from  https://doi.org/10.1007/978-3-319-48156-2_21
@@ -89,13 +138,16 @@ class Bath:
         :return: Equilibium potential in volts
         """
         #Calculate Equil_potential using the provided equation
-        bath_temp_K = self.bath_temp_K.get()
+        bath_temp_K = self.bath_temp_K
         Al2O3_rel_sat = self.Al2O3_rel_sat()
         Equil_potential = 1.897 - 0.00056 * bath_temp_K + (8.314 * bath_temp_K) / (12 * 96485) * math.pow(
             math.log(1 / Al2O3_rel_sat), 2.77)
-        print(f"For equil potential calc I used: bath temp: {bath_temp_K}")
+        if trace.enabled:
+            trace.record('Bath.Equil_potential', bath_temp_K=bath_temp_K, Al2O3_rel_sat=Al2O3_rel_sat,
+                         Equil_potential=Equil_potential)
         return Equil_potential
 
+    @derived('w_CaF2', 'w_Al2O3', 'w_AlF3')
     def bath_ratio(self):
         """
         The ratio NaF/AlF3 is called the cryolite ratio and it is 3 in pure cryolite (Na3AlF6)
@@ -109,9 +161,11 @@ class Bath:
         :return:
         """
         # Calculate the bath ratio using the provided equation
-        bath_ratio = (1.5 * (100 - self.w_CaF2.get() - self.w_Al2O3.get() - self.w_AlF3.get())) / (
-                    (100 - self.w_CaF2.get() - self.w_Al2O3.get()) + (1.5 * self.w_AlF3.get()))
+        bath_ratio = (1.5 * (100 - self.w_CaF2 - self.w_Al2O3 - self.w_AlF3)) / (
+                    (100 - self.w_CaF2 - self.w_Al2O3) + (1.5 * self.w_AlF3))
         return bath_ratio
+    @trace.traced
+    @derived('w_Al2O3', 'w_LiF', 'bath_ratio')
     def rx_limited_current_density(self):
         """
         From paper titled 'Haupin, W. Interpreting the components of cell voltage'
@@ -119,37 +173,40 @@ class Bath:
         https://doi.org/10.1007/978-3-319-48156-2_21
         :return:
         """
-        rx_limited_current_density = math.exp(0.56 * math.log(self.w_Al2O3.get() + self.w_LiF.get() / 4) + 0.276 * (self.bath_ratio()*2 - 1.5) - 5.849)
-        print(f"Al2O3: {self.w_Al2O3.get()}, {self.w_LiF.get()}, {self.bath_ratio()*2}")
+        cryolite_ratio = self.bath_ratio()*2
+        rx_limited_current_density = math.exp(0.56 * math.log(self.w_Al2O3 + self.w_LiF / 4) + 0.276 * (cryolite_ratio - 1.5) - 5.849)
+        if trace.enabled:
+            trace.record('Bath.rx_limited_current_density', w_Al2O3=self.w_Al2O3, w_LiF=self.w_LiF,
+                         cryolite_ratio=cryolite_ratio, rx_limited_current_density=rx_limited_current_density)
         return rx_limited_current_density
 
-class Anode:
+class Anode(Derived_cache):
 
-    def __init__(self):
+    def __init__(self, length_new=1850, length_spent=1850, width_new=690, width_spent=690, height=655,
+                 depth_immers=14.9, age=0.0, n_anodes=36, S_1=25, S_2=6, S_3=12, S_4=6, bake_temp=1100):
         # Initialize attribute values
-        self.length_new = tk.DoubleVar(value=1850)
-        self.length_spent = tk.DoubleVar(value=1850)
-        self.width_new = tk.DoubleVar(value=690)
-        self.width_spent = tk.DoubleVar(value=690)
-        self.height = tk.DoubleVar(value=655)
-        self.depth_immers = tk.DoubleVar(value=14.9)
-        self.age = tk.DoubleVar(value=0.0)
-        self.n_anodes = tk.IntVar(value=36)
-        self.S_1 = tk.DoubleVar(value=25) # Distance anode-wall 1 (cm)
-        self.S_2 = tk.DoubleVar(value=6) # Distance between anode short sidewalls 2 (cm)
-        self.S_3 = tk.DoubleVar(value=12) # Distance between anode long sidewalls 3 (cm)
-        self.S_4 = tk.DoubleVar(value=6) # Distance anode-wall 4 (cm)
-        self.bake_temp = tk.DoubleVar(value=1100) # Anode baking temperature [C]
-
-
+        self.length_new = length_new
+        self.length_spent = length_spent
+        self.width_new = width_new
+        self.width_spent = width_spent
+        self.height = height
+        self.depth_immers = depth_immers
+        self.age = age
+        self.n_anodes = n_anodes
+        self.S_1 = S_1 # Distance anode-wall 1 (cm)
+        self.S_2 = S_2 # Distance between anode short sidewalls 2 (cm)
+        self.S_3 = S_3 # Distance between anode long sidewalls 3 (cm)
+        self.S_4 = S_4 # Distance anode-wall 4 (cm)
+        self.bake_temp = bake_temp # Anode baking temperature [C]
 
     def update_attributes(self, length_new, width_new, height, depth_immers, n_anodes):
-        # Update the attribute values with the new values passed from the GUI
-        self.length_new.set(length_new)
-        self.width_new.set(width_new)
-        self.height.set(height)
-        self.depth_immers.set(depth_immers)
-        self.n_anodes.set(n_anodes)
+        # Update the attribute values with the new values passed from the caller
+        self.length_new = length_new
+        self.width_new = width_new
+        self.height = height
+        self.depth_immers = depth_immers
+        self.n_anodes = n_anodes
+    @derived('length_new', 'length_spent', 'width_new', 'width_spent', 'depth_immers')
     def fanning_factor(self, ACD, S_i):
         """
         Parameter names from original equation:
@@ -165,32 +222,57 @@ class Anode:
         :param ACD:
         :return:
         """
-        length_avg = mean([self.length_new.get(), self.length_spent.get()])*.1
-        width_avg = mean([self.width_new.get(), self.width_spent.get()])*.1
-        self.factor = (0.1656 * ACD - 0.0043 * pow(ACD, 3) + 0.1270 * S_i - 0.0034 * pow(S_i, 2) + 0.0394 * ACD * S_i) * (
-            0.3844 + 0.06166 * self.depth_immers.get() + 0.001822 * (length_avg + width_avg) - 0.000178 * self.depth_immers.get() * (length_avg + width_avg)
-        )
-        return self.factor
+        length_avg = (self.length_new + self.length_spent) / 2 * .1
+        width_avg = (self.width_new + self.width_spent) / 2 * .1
+        # Returned only, an attribute set here would keep the value of another ACD while the cache serves hits
+        return _fanning_spacing(ACD, S_i) * _fanning_geometry(length_avg, width_avg, self.depth_immers)
+    @trace.traced
+    @derived('length_new', 'length_spent', 'width_new', 'width_spent', 'depth_immers', 'S_1', 'S_2', 'S_3', 'S_4')
     def bath_eff_area(self, ACD):
-        length_avg = mean([self.length_new.get(), self.length_spent.get()]) * .1
-        width_avg = mean([self.width_new.get(), self.width_spent.get()]) * .1
-        print(f"length: {length_avg}, width: {width_avg}")
-        S1 = self.S_1.get()
-        S2 = self.S_2.get()
-        S3 = self.S_3.get()
-        S4 = self.S_4.get()
-        F1 = self.fanning_factor(ACD, S1)
-        F2 = self.fanning_factor(ACD, S2)
-        F3 = self.fanning_factor(ACD, S3)
-        F4 = self.fanning_factor(ACD, S4)
-        print(f"Fanning factors are: {F1}, {F2}, {F3}, {F4}")
-        self.area = (length_avg + F1 + F2)  * (width_avg + F3 + F4)
-        return self.area
+        """
+        Effective bath area under one anode, served from the geometry cache (see geometry_cache_info).
+        Array inputs are unhashable and bypass the cache.
+        :param ACD: Anode to cathode distance [cm], scalar or array
+        :return: area in cm2
+        """
+        inputs = (self.length_new, self.length_spent, self.width_new, self.width_spent, self.depth_immers,
+                  self.S_1, self.S_2, self.S_3, self.S_4, ACD)
+        try:
+            geometry = _anode_geometry(*inputs)
+        except TypeError:
+            geometry = _anode_geometry.__wrapped__(*inputs)
+        length_avg, width_avg, (F1, F2, F3, F4), area = geometry
+        if trace.enabled:
+            trace.record('Anode.bath_eff_area', ACD=ACD, length_avg=length_avg, width_avg=width_avg,
+                         F1=F1, F2=F2, F3=F3, F4=F4, area=area)
+        return area
+
+    def bath_eff_area_sweep(self, ACD):
+        """
+        Vectorized bath_eff_area over an array of ACD values for this anode geometry
+        :param ACD: array of anode to cathode distances [cm]
+        :return: array of areas in cm2
+        """
+        from HH_Cell_Batch import bath_eff_area
+        return bath_eff_area(ACD, self.length_new, self.length_spent, self.width_new, self.width_spent,
+                             self.depth_immers, self.S_1, self.S_2, self.S_3, self.S_4)
+
+    @staticmethod
+    def geometry_cache_info():
+        # Hits, misses, maxsize and current size of the effective area cache
+        return _anode_geometry.cache_info()
+
+    @staticmethod
+    def clear_geometry_cache():
+        _anode_geometry.cache_clear()
 
+    @derived('bath_eff_area')
     def current_intensity(self, current, n_anodes, ACD):
         bot_anode_surface = self.bath_eff_area(ACD)
         current_intensity = (current*1000) / bot_anode_surface / n_anodes
         return current_intensity
+    @trace.traced
+    @derived('bake_temp', 'current_intensity')
     def surface_overvoltage(self, current, n_anodes, ACD, T_bath_K, rx_limit_current):
         """
         This equation is valid only for current densities higher than 0.01 A/cm2
@@ -204,12 +286,15 @@ class Anode:
         """
         #bath = Bath()
         #rx_limit_current = bath.rx_limited_current_density()
-        #T_bath_K = bath.bath_temp_K.get()
-        surf_overvolt = 1.142e-5 * math.log(self.bake_temp.get()+273.15) * T_bath_K * math.log(self.current_intensity(current, n_anodes, ACD)/rx_limit_current)
+        #T_bath_K = bath.bath_temp_K
+        surf_overvolt = 1.142e-5 * math.log(self.bake_temp+273.15) * T_bath_K * math.log(self.current_intensity(current, n_anodes, ACD)/rx_limit_current)
         #surf_overvolt = 1
-        print(f"surface overvoltage is {surf_overvolt}")
+        if trace.enabled:
+            trace.record('Anode.surface_overvoltage', current=current, n_anodes=n_anodes, ACD=ACD, T_bath_K=T_bath_K,
+                         rx_limit_current=rx_limit_current, surface_overvoltage=surf_overvolt)
         return surf_overvolt
-    def concentration_limit_current_density_Haupin(self, current, n_anodes, ACD):
+    @trace.traced
+    def concentration_limit_current_density_Haupin(self, current, n_anodes, ACD, bath=None):
         """
         Parameter names from original equation:
         Tb: Bath temperature [C]
@@ -226,18 +311,17 @@ class Anode:
         Alternate equation from GRJOTHEIM, Kai; WELCH, Barry J. Aluminium Smelter Technology--a Pure and Applied Approach.
         Aluminium-Verlag, P. O. Box 1207, Konigsallee 30, D 4000 Dusseldorf 1, FRG, 1988., 1988.
         Chapter 5, Equation 13.
+        :param bath: Bath of the cell, the default Bath() composition if not given
         :return:
         """
-        bath = Bath()
+        bath = _default_bath() if bath is None else bath
         i = self.current_intensity(current, n_anodes, ACD)
         A_e_O_r = bath.w_Al2O3_ae
-        print(f"Tne alumina concentration at anode effect is {A_e_O_r}")
-        T_b_K = bath.bath_temp_K.get()
-        T_b_C = (bath.bath_temp_K.get() - 273.15)
-        T = bath.bath_temp_K.get()
+        T_b_K = bath.bath_temp_K
+        T_b_C = (bath.bath_temp_K - 273.15)
+        T = bath.bath_temp_K
         R_b = bath.bath_ratio()*2
-        A_n = self.length_new.get()*.1 * self.width_new.get()*.1
-        print(f"the cross sectional area of a single anode is {A_n}")
+        A_n = self.length_new*.1 * self.width_new*.1
         C_a = 1.443 - 1.985 * R_b + 1.131 * pow(R_b, 2)
         C_b = 0.4122 - 0.2037 * R_b
         D_sn = i / (((0.00464 * T_b_C - 3.4544) * ((C_a * A_e_O_r) + C_b * pow(A_e_O_r, 2))) * pow(A_n, -0.1))
@@ -245,11 +329,15 @@ class Anode:
         #'Haupin, W. Interpreting the components of cell voltage'
         #Eq.19
         #https: // doi.org / 10.1007 / 978 - 3 - 319 - 48156 - 2_21
-        #i_c = (0.00464 * T_b_C - 3.454) * (C_a * bath.w_Al2O3.get() + C_b * pow(bath.w_Al2O3.get(), 2))*pow(A_n, -0.1)*D_sn
-        i_c = (5.5+0.018*(T_b_K - 1323)) * pow((A_n * n_anodes), -0.1)*(-0.4+pow(bath.w_Al2O3.get(), 0.5))
+        #i_c = (0.00464 * T_b_C - 3.454) * (C_a * bath.w_Al2O3 + C_b * pow(bath.w_Al2O3, 2))*pow(A_n, -0.1)*D_sn
+        i_c = (5.5+0.018*(T_b_K - 1323)) * pow((A_n * n_anodes), -0.1)*(-0.4+pow(bath.w_Al2O3, 0.5))
         #conc_overvolt = (T / 23210) * math.log(i_c/(i_c - i))
-        print(f"The concentration limited current density is {i_c} A/cm2")
+        if trace.enabled:
+            trace.record('Anode.concentration_limit_current_density_Haupin', w_Al2O3_ae=A_e_O_r, A_n=A_n, D_sn=D_sn,
+                         i_c=i_c)
         return i_c
+    @trace.traced
+    @derived()
     def concentration_limit_current_density(self, n_anodes, length, width, T_b_K, w_Al2O3):
         """
         Alternate equation from GRJOTHEIM, Kai; WELCH, Barry J. Aluminium Smelter Technology--a Pure and Applied Approach.
@@ -260,22 +348,26 @@ class Anode:
         A_n = length*.1*width*.1
         i_c = (5.5+0.018*(T_b_K - 1323)) * pow((A_n * n_anodes), -0.1)*(-0.4+pow(w_Al2O3, 0.5))
 
-        print(f"The concentration limited current density is {i_c} A/cm2")
+        if trace.enabled:
+            trace.record('Anode.concentration_limit_current_density', n_anodes=n_anodes, A_n=A_n, T_b_K=T_b_K,
+                         w_Al2O3=w_Al2O3, i_c=i_c)
         return i_c
+    @trace.traced
+    @derived('current_intensity', 'concentration_limit_current_density')
     def concentration_overvolt(self, current, n_anodes, ACD, length, width, T_b_K, w_Al2O3):
         #bath = Bath()
         i_a = self.current_intensity(current, n_anodes, ACD)
         i_c = self.concentration_limit_current_density(n_anodes, length, width, T_b_K, w_Al2O3)
-        #T_b_K = bath.bath_temp_K.get()
+        #T_b_K = bath.bath_temp_K
         conc_overvolt = ((R * T_b_K) / (2 * F)) * math.log(i_c/(i_c-i_a))
-        print(f"The concentration overvolt is {conc_overvolt} A/cm2")
+        if trace.enabled:
+            trace.record('Anode.concentration_overvolt', i_a=i_a, i_c=i_c, T_b_K=T_b_K, concentration_overvolt=conc_overvolt)
         return conc_overvolt
 
 class Anode_assembly:
     def __init__(self):
-        self.resistance = pd.DataFrame(
-            {'riser': [8.1978e-8], 'flexibles': [8.1978e-8], 'anode bridge': [0], 'clamp': [4.28571e-8],
-             'anode rod': [3.95556e-8], 'yoke': [1.01087e-7], 'thimble': [0], 'anode block': [5.36087e-7]})#resistance values in ohm
+        self.resistance = {'riser': 8.1978e-8, 'flexibles': 8.1978e-8, 'anode bridge': 0, 'clamp': 4.28571e-8,
+                           'anode rod': 3.95556e-8, 'yoke': 1.01087e-7, 'thimble': 0, 'anode block': 5.36087e-7}#resistance values in ohm
     def voltage_drop(self, cell_current):
-        v_drop = self.resistance.mul(cell_current)
+        v_drop = {component: resistance * cell_current for component, resistance in self.resistance.items()}
         return v_drop
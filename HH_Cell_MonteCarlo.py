@@ -0,0 +1,191 @@
+"""
+Monte Carlo propagation of bath analysis and temperature errors through the cell voltage model.
+Samples are drawn and evaluated in fixed-size chunks, each chunk with its own seed spawned from one master
+seed, so a run is reproducible whatever the number of worker processes. Each chunk is reduced to streaming
+statistics (count, mean, variance, extremes and a fixed-bin histogram for quantiles) before it leaves the
+worker, so memory does not grow with the number of samples.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import Bath, Cell_input
+
+# Illustrative one-sigma errors of a bath analysis [wt%] and a thermocouple reading [K],
+# replace them with the figures of your own laboratory and instruments
+MEASUREMENT_ERROR = {'w_Al2O3': 0.15, 'w_AlF3': 0.5, 'w_CaF2': 0.2, 'w_MgF2': 0.05, 'w_KF': 0.05, 'w_LiF': 0.05,
+                     'bath_temp_K': 3.0}
+OUTPUTS = ('Equil_potential', 'bath_resistivity', 'cell_voltage')
+
+
+class Streaming_stats:
+    def __init__(self, low, high, bins=4096):
+        # Histogram covers [low, high), values outside are only counted
+        self.low = low
+        self.high = high
+        self.count = 0
+        self.nan_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # Sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        self.histogram = np.zeros(bins, dtype=np.int64)
+        self.below = 0
+        self.above = 0
+
+    def update(self, values):
+        # Add a chunk of samples, NaN samples (outside the model's domain) are counted separately
+        values = np.asarray(values, dtype=float).ravel()
+        valid = ~np.isnan(values)
+        self.nan_count += int(values.size - valid.sum())
+        values = values[valid]
+        if values.size == 0:
+            return
+        chunk = Streaming_stats(self.low, self.high, self.histogram.size)
+        chunk.count = values.size
+        chunk.mean = values.mean()
+        chunk.m2 = ((values - chunk.mean) ** 2).sum()
+        chunk.min = values.min()
+        chunk.max = values.max()
+        chunk.histogram, _ = np.histogram(values, bins=self.histogram.size, range=(self.low, self.high))
+        chunk.below = int((values < self.low).sum())
+        chunk.above = int((values >= self.high).sum())
+        self.merge(chunk)
+
+    def merge(self, other):
+        # Combine with statistics of another set of samples (Chan et al. parallel variance update)
+        if other.histogram.size != self.histogram.size or (other.low, other.high) != (self.low, self.high):
+            raise ValueError("can only merge statistics with the same histogram bins")
+        count = self.count + other.count
+        self.nan_count += other.nan_count
+        if other.count:
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / count
+            self.m2 += other.m2 + delta ** 2 * self.count * other.count / count
+            self.count = count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.histogram += other.histogram
+            self.below += other.below
+            self.above += other.above
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self):
+        return np.sqrt(self.variance)
+
+    def quantile(self, q):
+        """
+        Quantile estimated from the histogram by linear interpolation within a bin, so its resolution is one bin
+        width. Quantiles falling outside the histogram range are clamped to the observed min or max.
+        """
+        q = np.asarray(q, dtype=float)
+        edges = np.linspace(self.low, self.high, self.histogram.size + 1)
+        cumulative = self.below + np.concatenate(([0], np.cumsum(self.histogram)))
+        target = q * self.count
+        result = np.interp(target, cumulative, edges)
+        result = np.where(target < self.below, self.min, result)
+        return np.where(target > cumulative[-1], self.max, result)
+
+    def summary(self, quantiles=(0.01, 0.05, 0.5, 0.95, 0.99)):
+        return {'count': self.count, 'nan_count': self.nan_count, 'mean': self.mean, 'std': self.std,
+                'min': self.min, 'max': self.max,
+                'quantiles': dict(zip(quantiles, self.quantile(quantiles).tolist()))}
+
+
+def default_inputs():
+    # Nominal Bath() and Cell_input() values with MEASUREMENT_ERROR as normal errors
+    bath = Bath()
+    cell = Cell_input()
+    inputs = {name: ('normal', getattr(bath, name), MEASUREMENT_ERROR[name]) for name in batch.BATH_COLUMNS}
+    inputs.update(current=cell.current, ACD=cell.ACD)
+    return inputs
+
+
+def sample_inputs(inputs, n, rng):
+    """
+    Draw n samples of the model inputs.
+    :param inputs: dict of input name to a constant, ('normal', mean, sd), ('uniform', low, high) or
+                   ('triangular', low, mode, high). Sampled compositions are clipped at 0 wt%.
+    """
+    samples = {}
+    for name, spec in inputs.items():
+        if not isinstance(spec, tuple):
+            samples[name] = spec
+            continue
+        kind, *parameters = spec
+        if kind == 'normal':
+            values = rng.normal(*parameters, size=n)
+        elif kind == 'uniform':
+            values = rng.uniform(*parameters, size=n)
+        elif kind == 'triangular':
+            values = rng.triangular(*parameters, size=n)
+        else:
+            raise ValueError(f"unknown distribution '{kind}' for {name}")
+        samples[name] = np.maximum(values, 0) if name.startswith('w_') else values
+    return samples
+
+
+def evaluate_samples(inputs, n, seed):
+    # Model outputs for n samples drawn with the given seed
+    rng = np.random.default_rng(seed)
+    results = batch.cell_voltage_breakdown(**sample_inputs(inputs, n, rng))
+    results['bath_resistivity'] = 1 / results['bath_conductivity']
+    return {name: results[name] for name in OUTPUTS}
+
+
+def _run_chunk(inputs, n, seed, ranges, bins):
+    outputs = evaluate_samples(inputs, n, seed)
+    stats = {}
+    for name, (low, high) in ranges.items():
+        stats[name] = Streaming_stats(low, high, bins)
+        stats[name].update(outputs[name])
+    return stats
+
+
+def monte_carlo(inputs=None, n_samples=10 ** 6, chunk_size=250_000, workers=None, seed=0, bins=4096,
+                ranges=None):
+    """
+    Propagate input uncertainty to Equil_potential, bath_resistivity and the total cell voltage.
+    :param inputs: distribution spec per input, see sample_inputs, defaults to default_inputs()
+    :param n_samples: total number of samples, evaluated in chunks of chunk_size
+    :param workers: number of worker processes, 1 evaluates in this process, None uses all cores
+    :param seed: master seed, chunk i always uses the i-th spawned seed
+    :param bins: histogram bins per output, sets the quantile resolution
+    :param ranges: dict of output name to (low, high) histogram range, by default taken from a pilot chunk
+    :return: dict of output name to Streaming_stats
+    """
+    inputs = default_inputs() if inputs is None else inputs
+    n_chunks = -(-n_samples // chunk_size)
+    sizes = [chunk_size] * (n_chunks - 1) + [n_samples - chunk_size * (n_chunks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    if ranges is None:
+        pilot = evaluate_samples(inputs, min(chunk_size, 100_000), np.random.SeedSequence(seed, spawn_key=(2 ** 31,)))
+        ranges = {}
+        for name, values in pilot.items():
+            low, high = np.nanquantile(values, [0.0001, 0.9999])
+            span = high - low or abs(high) or 1.0
+            ranges[name] = (low - span, high + span)
+
+    totals = {name: Streaming_stats(low, high, bins) for name, (low, high) in ranges.items()}
+    arguments = ([inputs] * n_chunks, sizes, seeds, [ranges] * n_chunks, [bins] * n_chunks)
+    executor = None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+    try:
+        chunks = map(_run_chunk, *arguments) if executor is None else executor.map(_run_chunk, *arguments)
+        for stats in chunks:
+            for name in totals:
+                totals[name].merge(stats[name])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return totals
+
+
+if __name__ == "__main__":
+    for name, stats in monte_carlo().items():
+        print(name, stats.summary())
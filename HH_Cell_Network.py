@@ -0,0 +1,135 @@
+"""
+Per-anode resistance network of the anode assembly.
+Each pot is modelled as a ladder: the anode beam is a chain of nodes, one per anode stem, joined by beam
+segment resistances. Every node feeds its own anode branch (clamp, rod, yoke, thimble, block, then the bath
+under that anode) down to the metal pad, which is the voltage reference. The riser and flexibles carry the
+whole cell current into the beam at the feed points. Nodal analysis gives one symmetric positive definite
+tridiagonal system per pot, which is factorised once and reused for every new set of currents.
+"""
+import numpy as np
+
+from HH_Cell_Model_Classes import Anode_assembly
+
+STEM_COMPONENTS = ('clamp', 'anode rod', 'yoke', 'thimble', 'anode block')
+SERIES_COMPONENTS = ('riser', 'flexibles')
+
+
+def bath_branch_resistance(ACD, bath_conductivity, bath_eff_area, thk_bubble=1.0):
+    # Resistance of the bath column under one anode in ohm, same geometry as the bath IR drop
+    return (ACD - thk_bubble) / (bath_conductivity * bath_eff_area)
+
+
+class Anode_network:
+    def __init__(self, stem_resistance, bath_resistance, bridge_segment=0.0, feed=None, series_resistance=None):
+        """
+        :param stem_resistance: resistance of each anode stem and block [ohm], shape (n_pots, n_anodes)
+        :param bath_resistance: resistance of the bath under each anode [ohm], broadcast to the same shape
+        :param bridge_segment: beam resistance between neighbouring stems [ohm], shape (n_pots,) or
+                               (n_pots, n_anodes - 1). Zero treats the beam of that pot as an ideal busbar.
+        :param feed: fraction of the cell current entering the beam at each node, rows sum to 1.
+                     Defaults to two risers feeding half the current each at the ends of the beam.
+        :param series_resistance: riser plus flexibles per pot [ohm], defaults to the Anode_assembly values
+        """
+        stem_resistance = np.atleast_2d(np.asarray(stem_resistance, dtype=float))
+        self.shape = stem_resistance.shape
+        n_pots, n_anodes = self.shape
+        self.stem_resistance = stem_resistance
+        self.bath_resistance = np.broadcast_to(np.asarray(bath_resistance, dtype=float), self.shape)
+
+        segment = np.asarray(bridge_segment, dtype=float)
+        if segment.ndim == 1:
+            segment = segment[:, None]
+        self.bridge_segment = np.broadcast_to(segment, (n_pots, n_anodes - 1))
+        ideal = self.bridge_segment == 0
+        self.ideal = ideal.all(axis=1) if n_anodes > 1 else np.ones(n_pots, dtype=bool)
+        if (ideal.any(axis=1) & ~self.ideal).any():
+            raise ValueError("bridge_segment must be zero for all or none of the segments of a pot")
+
+        if feed is None:
+            feed = np.zeros(n_anodes)
+            feed[[0, -1]] += 0.5
+        self.feed = np.broadcast_to(np.asarray(feed, dtype=float), self.shape)
+        if series_resistance is None:
+            resistance = Anode_assembly().resistance
+            series_resistance = sum(resistance[name] for name in SERIES_COMPONENTS)
+        self.series_resistance = np.broadcast_to(np.asarray(series_resistance, dtype=float), (n_pots,))
+        self.factorize()
+
+    @classmethod
+    def from_assembly(cls, n_pots, bath_resistance, n_anodes=None, assembly=None, **kwargs):
+        """
+        Build the network from the lumped Anode_assembly resistances, which describe the whole cell:
+        each of the n_anodes stems carries n_anodes times the lumped stem resistance.
+        """
+        assembly = assembly or Anode_assembly()
+        bath_resistance = np.asarray(bath_resistance, dtype=float)
+        if n_anodes is None:
+            n_anodes = bath_resistance.shape[-1]
+        stem = n_anodes * sum(assembly.resistance[name] for name in STEM_COMPONENTS)
+        kwargs.setdefault('series_resistance', sum(assembly.resistance[name] for name in SERIES_COMPONENTS))
+        return cls(np.full((n_pots, n_anodes), stem), bath_resistance, **kwargs)
+
+    def update_resistance(self, stem_resistance=None, bath_resistance=None):
+        # Change branch resistances (e.g. a new ACD or bath chemistry) and refactorise
+        if stem_resistance is not None:
+            self.stem_resistance = np.broadcast_to(np.asarray(stem_resistance, dtype=float), self.shape)
+        if bath_resistance is not None:
+            self.bath_resistance = np.broadcast_to(np.asarray(bath_resistance, dtype=float), self.shape)
+        self.factorize()
+
+    def factorize(self):
+        # LU factors of the tridiagonal nodal conductance matrix of every pot (Thomas algorithm)
+        n_anodes = self.shape[1]
+        self.branch_conductance = 1 / (self.stem_resistance + self.bath_resistance)
+        with np.errstate(divide='ignore'):
+            beam = np.where(self.ideal[:, None], 0.0, 1 / np.where(self.ideal[:, None], 1.0, self.bridge_segment))
+        diagonal = self.branch_conductance.copy()
+        diagonal[:, 1:] += beam
+        diagonal[:, :-1] += beam
+        self._off = -beam
+        self._pivot = np.empty(self.shape)
+        self._upper = np.empty((self.shape[0], n_anodes - 1))
+        self._pivot[:, 0] = diagonal[:, 0]
+        for j in range(1, n_anodes):
+            self._upper[:, j - 1] = self._off[:, j - 1] / self._pivot[:, j - 1]
+            self._pivot[:, j] = diagonal[:, j] - self._off[:, j - 1] * self._upper[:, j - 1]
+        self._total_conductance = self.branch_conductance.sum(axis=1)
+
+    def _substitute(self, rhs):
+        # Forward and back substitution with the stored factors, rhs shape (..., n_pots, n_anodes)
+        n_anodes = self.shape[1]
+        x = np.empty_like(rhs)
+        x[..., 0] = rhs[..., 0] / self._pivot[:, 0]
+        for j in range(1, n_anodes):
+            x[..., j] = (rhs[..., j] - self._off[:, j - 1] * x[..., j - 1]) / self._pivot[:, j]
+        for j in range(n_anodes - 2, -1, -1):
+            x[..., j] -= self._upper[:, j] * x[..., j + 1]
+        return x
+
+    def solve(self, current, emf=None):
+        """
+        Current split between the anodes for one or many cell currents.
+        :param current: cell current [kA], shape (n_pots,) or (n_times, n_pots)
+        :param emf: back EMF of each anode branch [V] (equilibrium potential plus overvoltages), broadcast to
+                    (..., n_pots, n_anodes); treated as fixed over the solve
+        :return: dict of arrays: anode_current [A], beam_voltage (node voltage above the metal pad),
+                 stem_drop, bath_drop (per anode, V) and series_drop (riser plus flexibles, V)
+        """
+        current = np.asarray(current, dtype=float) * 1000
+        rhs = current[..., None] * self.feed
+        if emf is not None:
+            emf = np.asarray(emf, dtype=float)
+            rhs = rhs + emf * self.branch_conductance
+        voltage = self._substitute(rhs)
+        if self.ideal.any():
+            busbar = rhs.sum(axis=-1) / self._total_conductance
+            voltage = np.where(self.ideal[:, None], busbar[..., None], voltage)
+        driving = voltage if emf is None else voltage - emf
+        anode_current = driving * self.branch_conductance
+        return {
+            'anode_current': anode_current,
+            'beam_voltage': voltage,
+            'stem_drop': anode_current * self.stem_resistance,
+            'bath_drop': anode_current * self.bath_resistance,
+            'series_drop': current * self.series_resistance,
+        }
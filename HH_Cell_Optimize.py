@@ -0,0 +1,239 @@
+"""
+Operating points of minimum specific energy consumption, traded against the anode effect margin.
+For every pot of a Fleet, optimize searches ACD, w_AlF3, w_Al2O3 and bath_temp_K within BOUNDS for the lowest
+kWh/kg Al, subject to
+    anode effect margin, concentration_limit_current_density - current_intensity >= a margin level [A/cm2]
+    Al2O3_rel_sat = w_Al2O3 / Al2O3_sat <= max_rel_sat
+with the other inputs of the pot held at their fleet values. Solving this for a range of margin levels (the
+epsilon-constraint method) gives the Pareto front of energy against margin. Levels below the margin the
+unconstrained optimum already has do not bind, so by default the levels of every pot run from that margin to
+the largest margin reachable within the bounds, found by the same search with the margin as objective.
+
+Each problem is solved from several starting points, the pot's own operating point and random points in the
+bounds, by a pattern search: every iteration tries steps along each decision variable and each pair of them and
+moves to the best trial, halving the step when none improves. Feasible points rank by energy, infeasible ones
+after every feasible point by their constraint violation. All problems, pots x margin levels x starts, advance
+together as one batch evaluation of the voltage model, and chunks of pots are spread over a process pool.
+
+Specific energy is 3 F / M_Al * U / CE, about 2.98 U / CE kWh/kg for the cell voltage U [V] and the current
+efficiency CE (see HH_Cell_KPI). CE is a constant, a correlation of HH_Cell_KPI.CE_MODELS or a function of the
+operating point; with a constant CE the optimum is the lowest cell voltage.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+import HH_Cell_KPI as kpi
+
+DECISIONS = ('ACD', 'w_AlF3', 'w_Al2O3', 'bath_temp_K')
+BOUNDS = {'ACD': (2.5, 5.5), 'w_AlF3': (8.0, 13.0), 'w_Al2O3': (1.5, 6.0), 'bath_temp_K': (1220.0, 1255.0)}
+MARGIN_LEVELS = 7 # Margin levels per pot when they are derived from the pot
+INFEASIBLE = 1e6 # Rank offset of infeasible points, above any specific energy
+
+
+def _directions(n):
+    # Unit steps along every variable and every pair of variables, in both directions
+    directions = [np.eye(n)[i] * sign for i in range(n) for sign in (1, -1)]
+    for i, j in itertools.combinations(range(n), 2):
+        for si, sj in itertools.product((1, -1), repeat=2):
+            step = np.zeros(n)
+            step[i], step[j] = si, sj
+            directions.append(step)
+    return np.array(directions)
+
+
+def evaluate(columns, current_efficiency=0.94):
+    """
+    Objective and constraints of operating points.
+    :param columns: dict of cell_voltage_breakdown inputs (the fixed pot inputs and the decision variables)
+    :param current_efficiency: constant, name of a HH_Cell_KPI.CE_MODELS correlation, or function of the
+                               columns dict returning an array
+    :return: dict with specific_energy [kWh/kg], cell_voltage, current_efficiency, anode_effect_margin [A/cm2]
+             and Al2O3_rel_sat
+    """
+    results = batch.cell_voltage_breakdown(**columns)
+    if isinstance(current_efficiency, str):
+        efficiency = kpi.current_efficiency(current_efficiency, **columns)
+    elif callable(current_efficiency):
+        efficiency = current_efficiency(columns)
+    else:
+        efficiency = current_efficiency
+    efficiency = np.broadcast_to(np.asarray(efficiency, dtype=float), results['cell_voltage'].shape)
+    rel_sat = columns['w_Al2O3'] / batch.Al2O3_sat(columns['w_AlF3'], columns['w_CaF2'], columns['w_MgF2'],
+                                                   columns['w_LiF'], columns['bath_temp_K'])
+    return {'specific_energy': kpi.specific_energy(results['cell_voltage'], efficiency),
+            'cell_voltage': results['cell_voltage'], 'current_efficiency': efficiency,
+            'anode_effect_margin': results['concentration_limit_current_density'] - results['current_intensity'],
+            'Al2O3_rel_sat': rel_sat}
+
+
+def _rank(values, margin, max_rel_sat, maximize_margin=False):
+    # Feasible points rank by energy (or by negative margin), infeasible ones above INFEASIBLE by their
+    # violation, NaN last
+    violation = np.maximum(margin - values['anode_effect_margin'], 0) + \
+        np.maximum(values['Al2O3_rel_sat'] - max_rel_sat, 0)
+    objective = -values['anode_effect_margin'] if maximize_margin else values['specific_energy']
+    rank = np.where(violation > 0, INFEASIBLE + violation, objective)
+    return np.where(np.isnan(rank), np.inf, rank)
+
+
+def _optimize_chunk(fixed, starts, margins, bounds, current_efficiency, max_rel_sat, step, tol, max_iter,
+                    maximize_margin=False):
+    """
+    Pattern search for the pots of one chunk.
+    :param fixed: dict of breakdown inputs, arrays of shape (n_pots,)
+    :param starts: starting points in the unit box, shape (n_pots, n_starts, n_decisions)
+    :param margins: margin levels, shape (n_pots, n_margins)
+    :param maximize_margin: maximize the anode effect margin instead of minimizing the specific energy
+    :return: dict of results of shape (n_pots, n_margins) plus evaluations
+    """
+    n_pots, n_starts, n = starts.shape
+    n_margins = margins.shape[1]
+    low, high = (np.array([bounds[name][k] for name in DECISIONS]) for k in (0, 1))
+    directions = _directions(n)
+    # One problem per pot, margin level and start
+    pot = np.repeat(np.arange(n_pots), n_margins * n_starts)
+    margin = np.repeat(margins.ravel(), n_starts)
+    x = np.repeat(starts[:, None], n_margins, axis=1).reshape(-1, n)
+    steps = np.full(len(x), step)
+    evaluations = 0
+
+    def rank(points, problems):
+        # points (len(problems), k, n) in the unit box
+        k = points.shape[1]
+        columns = {name: np.repeat(values[pot[problems]], k) for name, values in fixed.items()}
+        decisions = low + points.reshape(-1, n) * (high - low)
+        columns.update({name: decisions[:, i] for i, name in enumerate(DECISIONS)})
+        values = evaluate(columns, current_efficiency)
+        return _rank(values, np.repeat(margin[problems], k), max_rel_sat, maximize_margin).reshape(-1, k), values
+
+    best, _ = rank(x[:, None], np.arange(len(x)))
+    best = best[:, 0]
+    evaluations += len(x)
+    active = np.arange(len(x))
+    for _ in range(max_iter):
+        active = active[steps[active] >= tol]
+        if active.size == 0:
+            break
+        trials = np.clip(x[active, None] + steps[active, None, None] * directions, 0, 1)
+        ranks, _ = rank(trials, active)
+        evaluations += ranks.size
+        choice = ranks.argmin(axis=1)
+        candidate = ranks[np.arange(active.size), choice]
+        improved = candidate < best[active]
+        moved = active[improved]
+        x[moved] = trials[np.flatnonzero(improved), choice[improved]]
+        best[moved] = candidate[improved]
+        steps[active[~improved]] /= 2
+
+    # Best start of every pot and margin level
+    best = best.reshape(n_pots, n_margins, n_starts)
+    winner = best.argmin(axis=2)
+    x = x.reshape(n_pots, n_margins, n_starts, n)
+    x = np.take_along_axis(x, winner[..., None, None], axis=2)[:, :, 0]
+    _, values = rank(x.reshape(-1, 1, n), np.arange(0, n_pots * n_margins * n_starts, n_starts))
+    results = {name: (low[i] + x[..., i] * (high[i] - low[i])) for i, name in enumerate(DECISIONS)}
+    results.update({name: value.reshape(n_pots, n_margins) for name, value in values.items()})
+    results['feasible'] = np.take_along_axis(best, winner[..., None], axis=2)[..., 0] < INFEASIBLE
+    results['evaluations'] = evaluations
+    return results
+
+
+def pareto_mask(energy, margin, feasible):
+    # Feasible points of each pot not dominated by another with at least the margin and no more energy, of
+    # several equal points only the first
+    n_pots, n_margins = energy.shape
+    energy = np.where(feasible, energy, np.inf)
+    mask = feasible.copy()
+    for k in range(n_margins):
+        dominated = ((margin[:, k, None] < margin) & (energy <= energy[:, k, None])) | \
+            ((margin[:, k, None] <= margin) & (energy < energy[:, k, None])) | \
+            ((margin[:, k, None] == margin) & (energy == energy[:, k, None]) & (np.arange(n_margins) < k))
+        mask[:, k] &= ~dominated.any(axis=1)
+    return mask
+
+
+def optimize(fleet, margins=None, bounds=None, current_efficiency='linear', max_rel_sat=0.8, n_starts=8,
+             step=0.25, tol=1e-4, max_iter=200, workers=None, pots_per_task=64, seed=0):
+    """
+    Pareto front of specific energy against anode effect margin for every pot of a fleet.
+    :param fleet: Fleet, the inputs other than DECISIONS are held at its values
+    :param margins: anode effect margin levels [A/cm2], one constrained optimization per level, a sequence for
+                    all pots or an array of shape (n_pots, n_margins). None derives MARGIN_LEVELS levels per pot,
+                    from the margin of its unconstrained optimum to the largest margin within the bounds.
+    :param bounds: dict of decision name to (low, high), missing names take BOUNDS
+    :param current_efficiency: constant, name of a HH_Cell_KPI.CE_MODELS correlation, or module level function
+                               of a dict of breakdown input arrays returning an array (it is sent to the worker
+                               processes)
+    :param max_rel_sat: upper limit of w_Al2O3 / Al2O3_sat
+    :param n_starts: starting points per problem, the first is the pot's own operating point
+    :param step: initial pattern step as a fraction of the bounds
+    :param tol: final step as a fraction of the bounds
+    :param workers: number of worker processes, 1 evaluates in this process, None uses all cores
+    :param pots_per_task: pots optimized together in one task
+    :param seed: seed of the random starts, chunk i always uses the i-th spawned seed
+    :return: dict of arrays of shape (n_pots, n_margins): the optimal DECISIONS, specific_energy, cell_voltage,
+             current_efficiency, anode_effect_margin, Al2O3_rel_sat, feasible, pareto (on the front of its pot)
+             and margins (the levels), plus the total number of model evaluations
+    """
+    bounds = {**BOUNDS, **(bounds or {})}
+    fixed = fleet.columns()
+    n_pots = len(fleet)
+    if n_pots == 0:
+        raise ValueError("the fleet has no pots")
+    low, high = (np.array([bounds[name][k] for name in DECISIONS]) for k in (0, 1))
+    chunks = [slice(start, min(start + pots_per_task, n_pots)) for start in range(0, n_pots, pots_per_task)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+    tasks = []
+    for chunk, chunk_seed in zip(chunks, seeds):
+        size = chunk.stop - chunk.start
+        starts = np.random.default_rng(chunk_seed).random((size, n_starts, len(DECISIONS)))
+        own = np.stack([fixed[name][chunk] for name in DECISIONS], axis=1)
+        starts[:, 0] = np.clip((own - low) / (high - low), 0, 1)
+        tasks.append(({name: values[chunk] for name, values in fixed.items()}, starts))
+
+    executor = None if workers == 1 else ProcessPoolExecutor(max_workers=workers)
+
+    def solve(levels, maximize_margin=False):
+        # One optimization per pot and level, levels of shape (n_pots, n_margins)
+        arguments = ([task[0] for task in tasks], [task[1] for task in tasks], [levels[chunk] for chunk in chunks]) + \
+            tuple([value] * len(tasks) for value in (bounds, current_efficiency, max_rel_sat, step, tol, max_iter,
+                                                     maximize_margin))
+        parts = list(map(_optimize_chunk, *arguments) if executor is None else
+                     executor.map(_optimize_chunk, *arguments))
+        results = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]
+                   if name != 'evaluations'}
+        results['evaluations'] = sum(part['evaluations'] for part in parts)
+        return results
+
+    try:
+        evaluations = 0
+        if margins is None:
+            unconstrained = np.full((n_pots, 1), -np.inf)
+            lowest, highest = solve(unconstrained), solve(unconstrained, maximize_margin=True)
+            evaluations = lowest['evaluations'] + highest['evaluations']
+            levels = lowest['anode_effect_margin'] + np.linspace(0, 1, MARGIN_LEVELS) * \
+                np.maximum(highest['anode_effect_margin'] - lowest['anode_effect_margin'], 0)
+        else:
+            levels = np.broadcast_to(np.asarray(margins, dtype=float), (n_pots, np.shape(margins)[-1]))
+        results = solve(np.array(levels, dtype=float))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    results['evaluations'] += evaluations
+    results['margins'] = np.array(levels, dtype=float)
+    results['pareto'] = pareto_mask(results['specific_energy'], results['anode_effect_margin'],
+                                    results['feasible'])
+    return results
+
+
+if __name__ == "__main__":
+    from HH_Cell_Fleet import Fleet
+    front = optimize(Fleet(1))
+    print("margin A/cm2  kWh/kg  " + "  ".join(DECISIONS))
+    for k in np.flatnonzero(front['pareto'][0]):
+        print(f"{front['anode_effect_margin'][0, k]:12.3f}  {front['specific_energy'][0, k]:6.3f}  " +
+              "  ".join(f"{front[name][0, k]:.2f}" for name in DECISIONS))
@@ -0,0 +1,229 @@
+"""
+Potline simulation on all cores.
+simulate_potline shards the pots of a Fleet across a process pool. The fleet records, the time series of
+inputs and the result arrays all live in shared memory (Shared_arrays, one multiprocessing.shared_memory block
+holding several named NumPy arrays): every worker attaches to the blocks once when it starts, reads the inputs
+of its pots and writes the voltage breakdown and derived bath and anode quantities of those pots straight into
+the result arrays. A task is only a pot range, and nothing but the number of pots done is pickled back.
+
+    with simulate_potline(fleet, {'current': current_history}) as results:
+        mean_voltage = results['cell_voltage'].mean(axis=0)
+
+The results are views of shared memory that is unlinked when they are closed, arrays taken from them stay
+valid as long as they are referenced. The scaling benchmark measures the speedup for 1 up to all cores:
+
+    python HH_Cell_Parallel.py --pots 400 --days 365
+"""
+import argparse
+import ctypes
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Fleet import FLEET_DTYPE, Fleet
+
+BATH_OUTPUTS = ('bath_resistivity', 'Al2O3_sat', 'Al2O3_rel_sat', 'bath_ratio')
+OUTPUTS = ('bath_conductivity', 'rx_limited_current_density', 'bath_eff_area', 'current_intensity',
+           'concentration_limit_current_density') + batch.VOLTAGE_COMPONENTS + ('cell_voltage',) + BATH_OUTPUTS
+ALIGNMENT = 64 # Arrays start on cache line boundaries, so workers writing neighbouring arrays never share a line
+
+_shared = {} # Arrays of the simulation in progress, set in every worker by _attach
+_detached = [] # Closed blocks whose arrays are still referenced, unmapped once they are released
+
+
+class Shared_arrays:
+    def __init__(self, specs, name=None):
+        """
+        Named NumPy arrays in one shared memory block.
+        :param specs: dict of array name to (shape, dtype)
+        :param name: name of an existing block to attach to, None creates a new block owned by this object
+        """
+        self.specs = dict(specs)
+        offsets, size = {}, 0
+        for key, (shape, dtype) in self.specs.items():
+            offsets[key] = size
+            size += -(-int(np.prod(shape)) * np.dtype(dtype).itemsize // ALIGNMENT) * ALIGNMENT
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 1))
+        self.name = self.shm.name
+        # The arrays view the block through a ctypes buffer that holds an export of shm.buf, so the memory cannot
+        # be unmapped under an array that outlives close()
+        block = (ctypes.c_byte * self.shm.size).from_buffer(self.shm.buf)
+        self.arrays = {key: np.frombuffer(block, dtype, int(np.prod(shape)), offsets[key]).reshape(shape)
+                       for key, (shape, dtype) in self.specs.items()}
+
+    @property
+    def spec(self):
+        # Picklable description another process attaches with Shared_arrays(*spec)
+        return self.specs, self.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def keys(self):
+        return self.arrays.keys()
+
+    def close(self):
+        # Detach, and free the block if this object created it. Arrays still referenced elsewhere stay valid,
+        # the memory is unmapped once the last of them is gone.
+        if getattr(self, 'shm', None) is None:
+            return
+        self.arrays = {}
+        if self.owner:
+            self.shm.unlink()
+        _detached.append(self.shm)
+        self.shm = None
+        for shm in list(_detached):
+            try:
+                shm.close()
+                _detached.remove(shm)
+            except BufferError:
+                pass
+
+    __del__ = close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach(inputs, results):
+    # Pool initializer, map the shared inputs and results into this worker once
+    _shared['inputs'] = Shared_arrays(*inputs)
+    _shared['results'] = Shared_arrays(*results)
+
+
+def _outputs(fleet, overrides, names):
+    # Breakdown and derived bath quantities of the pots of a fleet, for the given output names
+    results = fleet.cell_voltage_breakdown(**overrides)
+    if any(name in BATH_OUTPUTS for name in names):
+        columns = {name: overrides.get(name, fleet[name]) for name in batch.BATH_COLUMNS}
+        shape = results['cell_voltage'].shape
+        sat = batch.Al2O3_sat(*(columns[name] for name in ('w_AlF3', 'w_CaF2', 'w_MgF2', 'w_LiF', 'bath_temp_K')))
+        results.update(bath_resistivity=1 / results['bath_conductivity'],
+                       Al2O3_sat=np.broadcast_to(sat, shape),
+                       Al2O3_rel_sat=np.broadcast_to(columns['w_Al2O3'] / sat, shape),
+                       bath_ratio=np.broadcast_to(batch.bath_ratio(columns['w_Al2O3'], columns['w_AlF3'],
+                                                                   columns['w_CaF2']), shape))
+    return results
+
+
+def _run_shard(start, stop, block):
+    # Simulate pots start:stop, block time steps at a time, writing into the shared results
+    inputs, results = _shared['inputs'], _shared['results']
+    fleet = Fleet(state=inputs['fleet'][start:stop])
+    series = [name for name in inputs.keys() if name != 'fleet']
+    names = list(results.keys())
+    if not series:
+        values = _outputs(fleet, {}, names)
+        for name in names:
+            results[name][start:stop] = values[name]
+        return stop - start
+    n_times = inputs[series[0]].shape[0]
+    for t0 in range(0, n_times, block):
+        overrides = {name: inputs[name][t0:t0 + block, start:stop] for name in series}
+        values = _outputs(fleet, overrides, names)
+        for name in names:
+            results[name][t0:t0 + block, start:stop] = values[name]
+    return stop - start
+
+
+def simulate_potline(fleet, series=None, outputs=OUTPUTS, workers=None, shard_size=None, block=24 * 7):
+    """
+    Voltage breakdown of every pot of a fleet over a time series of operating points.
+    :param fleet: Fleet with the state of every pot
+    :param series: dict of fleet column name to values of shape (n_times, n_pots) (e.g. current, ACD, w_Al2O3,
+                   bath_temp_K), overriding the fleet columns at every time step. Without series the fleet is
+                   evaluated once and the results have shape (n_pots,).
+    :param outputs: names of the result arrays, from OUTPUTS
+    :param workers: number of worker processes, 1 evaluates in this process, None uses all cores
+    :param shard_size: pots per task, by default four tasks per worker
+    :param block: time steps evaluated together, bounds the working memory of a worker
+    :return: Shared_arrays of results, each of shape (n_times, n_pots), close it to release the memory
+    """
+    series = {} if series is None else series
+    unknown = set(outputs) - set(OUTPUTS)
+    if unknown:
+        raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+    n_pots = len(fleet)
+    workers = os.cpu_count() if workers is None else workers
+    shape = np.broadcast_shapes(*(np.shape(values) for values in series.values()), (n_pots,))
+    if len(shape) > 2 or shape[-1] != n_pots:
+        raise ValueError(f"series must have shape (n_times, n_pots), got {shape}")
+    shard_size = shard_size or max(-(-n_pots // (4 * workers)), 1)
+
+    inputs = Shared_arrays({'fleet': (n_pots, FLEET_DTYPE),
+                            **{name: (shape, np.float64) for name in series}})
+    results = Shared_arrays({name: (shape, np.float64) for name in outputs})
+    try:
+        inputs['fleet'][...] = fleet.state
+        for name, values in series.items():
+            inputs[name][...] = values
+        shards = [(start, min(start + shard_size, n_pots), block) for start in range(0, n_pots, shard_size)]
+        if workers == 1:
+            _shared.update(inputs=inputs, results=results)
+            try:
+                for shard in shards:
+                    _run_shard(*shard)
+            finally:
+                _shared.clear()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                     initargs=(inputs.spec, results.spec)) as executor:
+                done = sum(executor.map(_run_shard, *zip(*shards)))
+            if done != n_pots:
+                raise RuntimeError(f"workers simulated {done} of {n_pots} pots")
+    except BaseException:
+        results.close()
+        raise
+    finally:
+        inputs.close()
+    return results
+
+
+def scaling_benchmark(n_pots=400, n_times=24 * 365, workers=None, seed=0):
+    """
+    Time simulate_potline for 1, 2, 4, ... workers up to all cores on a random fleet with hourly current and
+    ACD histories.
+    :return: list of dicts with workers, seconds, speedup and efficiency (speedup per worker)
+    """
+    from HH_Cell_Benchmark import random_inputs
+    if workers is None:
+        cores = os.cpu_count()
+        workers = sorted({2 ** k for k in range(cores.bit_length()) if 2 ** k <= cores} | {cores})
+    rng = np.random.default_rng(seed)
+    points = random_inputs(n_pots, seed)
+    fleet = Fleet.from_columns({name: points[name] for name in batch.BATH_COLUMNS})
+    series = {'current': points['current'] + rng.normal(0, 2, (n_times, n_pots)).cumsum(axis=0) * 0.05,
+              'ACD': points['ACD'] + rng.normal(0, 0.05, (n_times, n_pots))}
+    report = []
+    for n in workers:
+        start = time.perf_counter()
+        simulate_potline(fleet, series, workers=n).close()
+        seconds = time.perf_counter() - start
+        speedup = report[0]['seconds'] / seconds if report else 1.0
+        report.append({'workers': n, 'seconds': seconds, 'speedup': speedup, 'efficiency': speedup / n})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmark of the parallel potline simulation")
+    parser.add_argument('--pots', type=int, default=400)
+    parser.add_argument('--days', type=float, default=365, help="simulated days of hourly operating points")
+    parser.add_argument('--workers', type=int, nargs='*', help="worker counts, default 1, 2, 4, ... all cores")
+    args = parser.parse_args(argv)
+    n_times = int(args.days * 24)
+    print(f"{args.pots} pots x {n_times} hours on {os.cpu_count()} cores")
+    for row in scaling_benchmark(args.pots, n_times, args.workers):
+        print(f"{row['workers']:3d} workers {row['seconds']:8.2f} s  speedup {row['speedup']:5.2f}  "
+              f"efficiency {row['efficiency']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Headless runner of cell voltage scenarios, for large parameter studies on a server without a display.
+A scenario file (JSON) gives the base operating point and the axes varied around it:
+
+    {
+     "cell": {"current": 300, "ACD": 3.2},
+     "bath": {"w_AlF3": 11.0, "bath_temp_K": 1233.15},
+     "anode": {"n_anodes": 40},
+     "grid": {"ACD": {"start": 2.5, "stop": 5.0, "num": 26}, "current": [280, 300, 320]},
+     "sweep": {"w_Al2O3": [2.0, 2.5, 3.0, 3.5], "bath_temp_K": [1228, 1231, 1234, 1237]},
+     "random": {"samples": 1000, "w_AlF3": {"normal": [11.0, 0.5]}, "w_CaF2": {"uniform": [4.0, 6.0]}},
+     "seed": 0,
+     "chunk_size": 100000,
+     "outputs": ["cell_voltage", "bath_voltage_drop"]
+    }
+
+cell, bath and anode take any cell_voltage_breakdown input (BREAKDOWN_COLUMNS), the others default to the model
+defaults of a Fleet pot. Every grid input takes each of its values (a list, or start, stop and num or step), and
+the grid is the product of them. The sweep inputs move together, the k-th point of the sweep takes the k-th value
+of each. Every point of grid x sweep is repeated for the random samples, each drawing the random inputs from its
+distribution (uniform [low, high], normal [mean, sd] or triangular [left, mode, right]) with
+HH_Cell_MonteCarlo.sample_inputs, which clips random compositions (w_*) at 0 wt%. All sections are
+optional, the scenario above has 26 x 3 x 4 x 1000 = 312000 points.
+
+Points are numbered in row-major order over (grid inputs, sweep, samples) and only ever built one chunk of
+chunk_size points at a time, from the point numbers, so a scenario of any size runs in bounded memory. Chunks
+are evaluated on a process pool, a few at a time per worker, and appended in order to a Column_store directory
+(HH_Cell_Historian) with one .npy column per varied input and output. The random draws of chunk i come from the
+i-th seed spawned from the scenario seed, so results do not depend on the number of workers. The scenario, with
+its seed and chunk size, is copied to scenario.json in the output directory. An interrupted run keeps the chunks
+already written, the columns stay readable with read_columns.
+
+    python HH_Cell_Runner.py scenario.json results/ --workers 16
+"""
+import argparse
+import collections
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_MonteCarlo import sample_inputs
+from HH_Cell_Fleet import _default_record
+from HH_Cell_Historian import Column_store
+
+OUTPUTS = ('bath_conductivity', 'rx_limited_current_density', 'bath_eff_area', 'current_intensity',
+           'concentration_limit_current_density') + batch.VOLTAGE_COMPONENTS + ('cell_voltage',)
+SECTIONS = ('cell', 'bath', 'anode')
+DISTRIBUTIONS = {'uniform': 2, 'normal': 2, 'triangular': 3} # Parameters of each distribution
+CHUNK_SIZE = 100_000
+
+
+def _grid_values(name, spec):
+    # Values of a grid input from a list, or a dict with start, stop and num (inclusive) or step (exclusive)
+    if isinstance(spec, dict):
+        if 'num' in spec:
+            return np.linspace(spec['start'], spec['stop'], int(spec['num']))
+        if 'step' in spec:
+            return np.arange(spec['start'], spec['stop'], spec['step'])
+        raise ValueError(f"grid input '{name}' needs a list of values, or start, stop and num or step")
+    return np.atleast_1d(np.asarray(spec, dtype=float))
+
+
+class Scenario:
+    def __init__(self, spec):
+        """
+        :param spec: scenario as parsed from the scenario file, see the module documentation
+        """
+        unknown = set(spec) - set(SECTIONS) - {'grid', 'sweep', 'random', 'seed', 'chunk_size', 'outputs'}
+        if unknown:
+            raise ValueError(f"unknown scenario sections: {', '.join(sorted(unknown))}")
+        self.spec = spec
+        default = _default_record()
+        self.base = {name: default[name].item() for name in batch.BREAKDOWN_COLUMNS}
+        for section in SECTIONS:
+            self._check(spec.get(section, {}), section)
+            self.base.update(spec.get(section, {}))
+
+        self.grid = {name: _grid_values(name, values) for name, values in spec.get('grid', {}).items()}
+        self.sweep = {name: np.atleast_1d(np.asarray(values, dtype=float))
+                      for name, values in spec.get('sweep', {}).items()}
+        random = dict(spec.get('random', {}))
+        self.samples = int(random.pop('samples', 1))
+        self.random = random
+        for section, inputs in (('grid', self.grid), ('sweep', self.sweep), ('random', self.random)):
+            self._check(inputs, section)
+        varied = list(self.grid) + list(self.sweep) + list(self.random)
+        repeated = {name for name in varied if varied.count(name) > 1}
+        if repeated:
+            raise ValueError(f"inputs varied on more than one axis: {', '.join(sorted(repeated))}")
+        self.varied = tuple(varied)
+
+        lengths = {len(values) for values in self.sweep.values()}
+        if len(lengths) > 1:
+            raise ValueError("every sweep input needs the same number of values")
+        for name, distribution in self.random.items():
+            if not (isinstance(distribution, dict) and len(distribution) == 1 and
+                    next(iter(distribution)) in DISTRIBUTIONS):
+                raise ValueError(f"random input '{name}' needs one of {', '.join(DISTRIBUTIONS)}")
+            kind, parameters = next(iter(distribution.items()))
+            if len(parameters) != DISTRIBUTIONS[kind]:
+                raise ValueError(f"{kind} distribution of '{name}' takes {DISTRIBUTIONS[kind]} parameters")
+
+        # Axes of the point numbering: one per grid input, the sweep, the samples
+        self.shape = tuple(len(values) for values in self.grid.values()) + (lengths.pop() if lengths else 1,
+                                                                             self.samples)
+        self.size = math.prod(self.shape)
+        self.seed = int(spec.get('seed', 0))
+        self.chunk_size = int(spec.get('chunk_size', CHUNK_SIZE))
+        self.outputs = tuple(spec.get('outputs', OUTPUTS))
+        unknown = set(self.outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+
+    @staticmethod
+    def _check(inputs, section):
+        unknown = set(inputs) - set(batch.BREAKDOWN_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown inputs in {section}: {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @property
+    def n_chunks(self):
+        return -(-self.size // self.chunk_size)
+
+    def expand(self, chunk):
+        """
+        Varied inputs of the points of one chunk.
+        :param chunk: chunk number, 0 to n_chunks - 1
+        :return: dict of input name to array of the chunk's points, for every varied input
+        """
+        start = chunk * self.chunk_size
+        points = np.arange(start, min(start + self.chunk_size, self.size))
+        index = np.unravel_index(points, self.shape)
+        columns = {name: values[index[i]] for i, (name, values) in enumerate(self.grid.items())}
+        columns.update({name: values[index[-2]] for name, values in self.sweep.items()})
+        rng = np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(chunk,)))
+        # The Monte Carlo sampler, so both clip compositions the same way
+        columns.update(sample_inputs({name: (kind, *parameters) for name, distribution in self.random.items()
+                                      for kind, parameters in distribution.items()}, points.size, rng))
+        return columns
+
+    def evaluate(self, chunk):
+        # Varied inputs and outputs of the points of one chunk
+        columns = self.expand(chunk)
+        inputs = {name: value for name, value in self.base.items() if name not in columns}
+        results = batch.cell_voltage_breakdown(**inputs, **columns)
+        size = next(iter(columns.values())).size if columns else min(self.chunk_size, self.size)
+        columns.update({name: np.broadcast_to(results[name], (size,)) for name in self.outputs})
+        return columns
+
+
+def _evaluate_chunk(scenario, chunk):
+    return scenario.evaluate(chunk)
+
+
+class Progress:
+    def __init__(self, total, stream=None, interval=None):
+        """
+        Points done, rate and time left on one line that is rewritten in a terminal, or as a line every interval
+        seconds when the stream is a log file.
+        :param total: number of points of the run
+        :param stream: defaults to sys.stderr
+        :param interval: seconds between updates, 0.5 in a terminal and 60 otherwise
+        """
+        self.total = total
+        self.stream = sys.stderr if stream is None else stream
+        self.terminal = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.interval = (0.5 if self.terminal else 60.0) if interval is None else interval
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last = -math.inf
+
+    def update(self, points):
+        self.done += points
+        now = time.perf_counter()
+        if now - self.last >= self.interval or self.done == self.total:
+            self.last = now
+            self._write(now - self.start)
+
+    def _write(self, elapsed):
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        left = (self.total - self.done) / rate if rate > 0 else math.inf
+        line = f"{self.done}/{self.total} points ({self.done / max(self.total, 1):.1%}) {rate:,.0f} points/s " \
+               f"elapsed {_duration(elapsed)} left {_duration(left)}"
+        if self.terminal:
+            self.stream.write('\r' + line + ('\n' if self.done == self.total else ''))
+        else:
+            self.stream.write(line + '\n')
+        self.stream.flush()
+
+
+def _duration(seconds):
+    if not math.isfinite(seconds):
+        return '--:--:--'
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def run(scenario, output, workers=None, progress=None, in_flight=2):
+    """
+    Evaluate every point of a scenario and append the results to a Column_store directory.
+    :param scenario: Scenario, or the path of a scenario file
+    :param output: output directory, created if missing
+    :param workers: number of worker processes, 1 evaluates in this process, None uses all cores
+    :param progress: Progress to report to, None for no report
+    :param in_flight: chunks queued per worker, bounds the memory held by results not yet written
+    :return: number of points written
+    """
+    scenario = Scenario.load(scenario) if isinstance(scenario, str) else scenario
+    os.makedirs(output, exist_ok=True)
+    with open(os.path.join(output, 'scenario.json'), 'w') as f:
+        json.dump({**scenario.spec, 'seed': scenario.seed, 'chunk_size': scenario.chunk_size}, f, indent=1)
+    workers = os.cpu_count() if workers is None else workers
+    with Column_store(output) as store:
+        def write(columns):
+            store.append(columns)
+            if progress is not None:
+                progress.update(len(next(iter(columns.values()))))
+
+        if workers == 1:
+            for chunk in range(scenario.n_chunks):
+                write(scenario.evaluate(chunk))
+            return store.rows
+        # Chunks are submitted as earlier ones finish and written in order, at most in_flight per worker wait
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = collections.deque()
+            try:
+                for chunk in range(scenario.n_chunks):
+                    if len(pending) >= in_flight * workers:
+                        write(pending.popleft().result())
+                    pending.append(executor.submit(_evaluate_chunk, scenario, chunk))
+                while pending:
+                    write(pending.popleft().result())
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        return store.rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a cell voltage scenario file into a column store")
+    parser.add_argument('scenario', help="scenario file (JSON)")
+    parser.add_argument('output', help="output directory")
+    parser.add_argument('--workers', type=int, help="worker processes, default all cores")
+    parser.add_argument('--chunk-size', type=int, help="points per chunk, overrides the scenario file")
+    parser.add_argument('--seed', type=int, help="seed of the random inputs, overrides the scenario file")
+    parser.add_argument('--overwrite', action='store_true', help="replace the results in the output directory")
+    parser.add_argument('--dry-run', action='store_true', help="describe the scenario without evaluating it")
+    parser.add_argument('--quiet', action='store_true', help="no progress report")
+    args = parser.parse_args(argv)
+    with open(args.scenario) as f:
+        spec = json.load(f)
+    if args.chunk_size is not None:
+        spec['chunk_size'] = args.chunk_size
+    if args.seed is not None:
+        spec['seed'] = args.seed
+    try:
+        scenario = Scenario(spec)
+    except ValueError as e:
+        parser.error(str(e))
+    axes = [f"{name} ({len(values)})" for name, values in scenario.grid.items()]
+    if scenario.sweep:
+        axes.append(f"sweep of {', '.join(scenario.sweep)} ({scenario.shape[-2]})")
+    if scenario.random:
+        axes.append(f"random {', '.join(scenario.random)} ({scenario.samples} samples)")
+    print(f"{scenario.size} points, {scenario.n_chunks} chunks of {scenario.chunk_size}, axes: "
+          f"{' x '.join(axes) or 'none'}", file=sys.stderr)
+    if args.dry_run:
+        return
+    if os.path.exists(os.path.join(args.output, 'columns.json')) and not args.overwrite:
+        parser.error(f"{args.output} already holds results, use --overwrite to replace them")
+    progress = None if args.quiet else Progress(scenario.size)
+    start = time.perf_counter()
+    rows = run(scenario, args.output, args.workers, progress)
+    print(f"{rows} points written to {args.output} in {_duration(time.perf_counter() - start)}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
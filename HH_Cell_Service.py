@@ -0,0 +1,423 @@
+"""
+HTTP/JSON service of the cell voltage breakdown, for HMI and advisory systems that need the model over the network.
+The service is an asyncio HTTP/1.1 server on the standard library with persistent (keep-alive) connections:
+
+    POST /point    one operating point, {"current": 300, "ACD": 3.2, "w_Al2O3": 2.8}, answered with scalars
+    POST /batch    many points as columns, {"current": [...], "ACD": [...], "bath_temp_K": 1235}, or as a list
+                   of point objects, answered with one list per output (null where the model has no solution)
+    GET /health    {"status": "ok"}
+    GET /metrics   request latency histograms and counters in the Prometheus text format
+
+Inputs are cell_voltage_breakdown inputs (BREAKDOWN_COLUMNS), any left out take the model defaults of a Fleet pot
+(Cell_input, Bath, Anode, Anode_assembly). An optional "outputs" list picks outputs from OUTPUTS, all by default,
+answered with DIGITS significant digits.
+Decoding the request, the model and encoding the answer run in a process pool, the event loop only reads and
+writes the connections, so a large batch never holds up the other clients. A request is evaluated by one worker,
+split very large jobs into several requests to spread them over the cores.
+
+The load generator drives a running service from many keep-alive connections and reports throughput and latency
+percentiles; bench starts a service on a free localhost port and loads it in one command:
+
+    python HH_Cell_Service.py serve --port 8080
+    python HH_Cell_Service.py load --port 8080 --connections 16 --requests 2000 --batch 1000
+    python HH_Cell_Service.py bench --workers 4
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Fleet import _default_record
+
+OUTPUTS = ('bath_conductivity', 'rx_limited_current_density', 'bath_eff_area', 'current_intensity',
+           'concentration_limit_current_density') + batch.VOLTAGE_COMPONENTS + ('cell_voltage',)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # s
+REASONS = {100: 'Continue', 200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           408: 'Request Timeout', 411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error',
+           501: 'Not Implemented'}
+DIGITS = 9 # Significant digits of the outputs, far beyond the accuracy of the model correlations
+FORMAT = f'%.{DIGITS}g'
+ENDPOINTS = {'/point': 'POST', '/batch': 'POST', '/health': 'GET', '/metrics': 'GET'}
+
+
+class Latency_histogram:
+    def __init__(self, buckets=BUCKETS):
+        # Cumulative counts of latencies up to each bucket bound [s], the last count is the total
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def quantile(self, q):
+        # Estimate interpolated within the bucket, the largest bound when it falls beyond the last bucket
+        cumulative = np.cumsum(self.counts)
+        if cumulative[-1] == 0:
+            return float('nan')
+        rank = q * cumulative[-1]
+        k = int(np.searchsorted(cumulative, rank))
+        if k == len(self.buckets):
+            return self.buckets[-1]
+        low = self.buckets[k - 1] if k else 0.0
+        below = cumulative[k - 1] if k else 0
+        return low + (self.buckets[k] - low) * (rank - below) / self.counts[k]
+
+    def prometheus(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+        return lines
+
+
+def _json_values(values):
+    # JSON text of an output, formatted with DIGITS significant digits, which halves the time spent encoding.
+    # JSON has no NaN, points outside the model's domain become null.
+    values = np.asarray(values, dtype=float)
+    listed = values.ravel().tolist()
+    if np.isfinite(values).all():
+        text = [FORMAT % value for value in listed]
+    else:
+        text = [FORMAT % value if np.isfinite(value) else 'null' for value in listed]
+    return text[0] if values.ndim == 0 else '[' + ','.join(text) + ']'
+
+
+def evaluate(endpoint, body):
+    """
+    Answer of a /point or /batch request, run in the worker processes.
+    :param endpoint: '/point' or '/batch'
+    :param body: request body, JSON
+    :return: (HTTP status, JSON response body, number of points evaluated)
+    """
+    try:
+        request = json.loads(body)
+        default = _default_record()
+        points = None # Number of points of a list body, which sets the result shape
+        if endpoint == '/batch' and isinstance(request, list):
+            # Points as objects, an input one of them leaves out takes its default
+            if not all(isinstance(point, dict) for point in request):
+                raise ValueError("every point of a /batch list must be a JSON object")
+            names = {name for point in request for name in point}
+            points = len(request)
+            outputs = OUTPUTS
+            request = {name: [point.get(name, default[name].item() if name in batch.BREAKDOWN_COLUMNS else None)
+                              for point in request] for name in names}
+        elif isinstance(request, dict):
+            request = dict(request)
+            outputs = request.pop('outputs', OUTPUTS)
+        else:
+            raise ValueError("the request must be a JSON object" + (" or list" if endpoint == '/batch' else ""))
+        unknown = set(outputs) - set(OUTPUTS)
+        if unknown:
+            raise ValueError(f"unknown outputs: {', '.join(sorted(unknown))}")
+        unknown = set(request) - set(batch.BREAKDOWN_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown inputs: {', '.join(sorted(unknown))}")
+        inputs = {name: np.asarray(request[name], dtype=float) if name in request else default[name].item()
+                  for name in batch.BREAKDOWN_COLUMNS}
+        if endpoint == '/point' and any(np.ndim(value) for value in inputs.values()):
+            raise ValueError("/point takes scalar inputs, send arrays to /batch")
+        shape = np.broadcast_shapes(*(np.shape(value) for value in inputs.values()),
+                                    () if points is None else (points,))
+        if len(shape) > 1:
+            raise ValueError("batch inputs must be scalars or flat lists")
+    except (ValueError, TypeError) as e:
+        return 400, json.dumps({'error': str(e)}).encode(), 0
+    with np.errstate(all='ignore'):
+        results = batch.cell_voltage_breakdown(**inputs)
+    answer = ','.join(f'"{name}":{_json_values(np.broadcast_to(results[name], shape))}' for name in outputs)
+    return 200, ('{' + answer + '}').encode(), int(np.prod(shape))
+
+
+class Service:
+    def __init__(self, host='127.0.0.1', port=8080, workers=None, max_body=64 * 2 ** 20, idle_timeout=60.0):
+        """
+        :param host: interface to listen on, '0.0.0.0' for all
+        :param port: TCP port, 0 picks a free one (see self.port once started)
+        :param workers: number of worker processes evaluating the model, None uses all cores
+        :param max_body: largest request body accepted [bytes]
+        :param idle_timeout: a keep-alive connection idle this long is closed [s]
+        """
+        self.host = host
+        self.port = port
+        self.workers = os.cpu_count() if workers is None else workers
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.executor = None
+        self.server = None
+        self.latency = {endpoint: Latency_histogram() for endpoint in ENDPOINTS}
+        self.responses = {} # (endpoint, status) to count
+        self.points = 0
+        self.in_flight = 0
+        self.connections = {} # Open connection task to its writer, closed on shutdown
+
+    async def start(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        # Start every worker now, not on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, evaluate, '/point', b'{}')
+                               for _ in range(self.workers)))
+        self.server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        # Idle keep-alive connections would otherwise be cancelled mid-read when the loop stops
+        for writer in list(self.connections.values()):
+            writer.close()
+        if self.connections:
+            await asyncio.gather(*self.connections, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _connection(self, reader, writer):
+        # Serve the requests of one connection in turn until the client closes it or asks to
+        task = asyncio.current_task()
+        self.connections[task] = writer
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not line.strip():
+                    break
+                try:
+                    method, target, version = line.decode('latin1').split()
+                except ValueError:
+                    await self._send(writer, 400, {'error': "malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+                start = time.perf_counter()
+                path = target.split('?')[0]
+
+                length = headers.get('content-length', '0')
+                if 'transfer-encoding' in headers:
+                    status, payload, keep_alive = 501, {'error': "chunked requests are not supported"}, False
+                elif method == 'POST' and 'content-length' not in headers:
+                    status, payload, keep_alive = 411, {'error': "Content-Length required"}, False
+                elif not length.isdigit():
+                    status, payload, keep_alive = 400, {'error': "malformed Content-Length"}, False
+                elif int(length) > self.max_body:
+                    status, payload, keep_alive = 413, {'error': f"body above {self.max_body} bytes"}, False
+                else:
+                    if headers.get('expect', '').lower() == '100-continue':
+                        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+                    body = await reader.readexactly(int(length))
+                    status, payload = await self._respond(method, path, body)
+                await self._send(writer, status, payload, keep_alive)
+                endpoint = path if path in ENDPOINTS else 'other'
+                if endpoint in self.latency:
+                    self.latency[endpoint].observe(time.perf_counter() - start)
+                self.responses[endpoint, status] = self.responses.get((endpoint, status), 0) + 1
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Client gone, or a request line or header beyond the stream limit
+            pass
+        finally:
+            del self.connections[task]
+            writer.close()
+
+    async def _respond(self, method, path, body):
+        # Status and body (bytes, str or JSON-able) of a request
+        if path not in ENDPOINTS:
+            return 404, {'error': f"no endpoint {path}"}
+        if method != ENDPOINTS[path]:
+            return 405, {'error': f"{path} takes {ENDPOINTS[path]}"}
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/metrics':
+            return 200, self.metrics()
+        self.in_flight += 1
+        try:
+            status, payload, points = await asyncio.get_running_loop().run_in_executor(
+                self.executor, evaluate, path, body)
+        except Exception as e:
+            return 500, {'error': f"{type(e).__name__}: {e}"}
+        finally:
+            self.in_flight -= 1
+        self.points += points
+        return status, payload
+
+    @staticmethod
+    async def _send(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), 'text/plain; version=0.0.4'
+        else:
+            body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+            content_type = 'application/json'
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                     f"\r\n".encode('latin1') + body)
+        await writer.drain()
+
+    def metrics(self):
+        # Prometheus text exposition of the latency histograms and counters
+        lines = ['# HELP hh_cell_request_duration_seconds Time from a complete request to its response',
+                 '# TYPE hh_cell_request_duration_seconds histogram']
+        for endpoint, histogram in self.latency.items():
+            lines += histogram.prometheus('hh_cell_request_duration_seconds', f'endpoint="{endpoint}"')
+        lines += ['# TYPE hh_cell_responses_total counter']
+        lines += [f'hh_cell_responses_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                  for (endpoint, status), count in sorted(self.responses.items())]
+        lines += ['# TYPE hh_cell_points_total counter', f'hh_cell_points_total {self.points}',
+                  '# TYPE hh_cell_requests_in_flight gauge', f'hh_cell_requests_in_flight {self.in_flight}',
+                  '# TYPE hh_cell_connections gauge', f'hh_cell_connections {len(self.connections)}',
+                  '# TYPE hh_cell_workers gauge', f'hh_cell_workers {self.workers}']
+        return '\n'.join(lines) + '\n'
+
+
+async def request(reader, writer, method, path, body=b''):
+    """
+    One request on an open keep-alive connection.
+    :return: (status, response body bytes)
+    """
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def load_test(host='127.0.0.1', port=8080, connections=8, requests=1000, batch_size=1000, seed=0):
+    """
+    Send requests from several keep-alive connections at once, each sending its next request as soon as the
+    previous one is answered.
+    :param connections: concurrent connections
+    :param requests: requests in total
+    :param batch_size: points per /batch request, 1 sends /point requests
+    :return: dict with requests, errors, points, seconds, requests_per_s, points_per_s and the latency
+             percentiles p50, p90, p99 and max [s]
+    """
+    from HH_Cell_Benchmark import random_inputs
+    points = random_inputs(batch_size, seed)
+    if batch_size == 1:
+        path, body = '/point', json.dumps({name: values[0] for name, values in points.items()}).encode()
+    else:
+        path, body = '/batch', json.dumps({name: values.tolist() for name, values in points.items()}).encode()
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def client():
+        nonlocal remaining, errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                status, _ = await request(reader, writer, 'POST', path, body)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    seconds = time.perf_counter() - start
+    p50, p90, p99, p100 = np.percentile(latencies, [50, 90, 99, 100])
+    return {'requests': len(latencies), 'errors': errors, 'points': len(latencies) * batch_size,
+            'seconds': seconds, 'requests_per_s': len(latencies) / seconds,
+            'points_per_s': len(latencies) * batch_size / seconds, 'p50': p50, 'p90': p90, 'p99': p99, 'max': p100}
+
+
+def _print_load(report):
+    print(f"{report['requests']} requests ({report['errors']} errors) in {report['seconds']:.2f} s: "
+          f"{report['requests_per_s']:,.0f} requests/s, {report['points_per_s']:,.0f} points/s")
+    print("latency ms  " + "  ".join(f"{name} {report[name] * 1000:.2f}" for name in ('p50', 'p90', 'p99', 'max')))
+
+
+async def _serve(args):
+    async with Service(args.host, args.port, args.workers) as service:
+        print(f"serving on http://{service.host}:{service.port} with {service.workers} workers")
+        await service.serve_forever()
+
+
+async def _bench(args):
+    async with Service('127.0.0.1', 0, args.workers) as service:
+        for batch_size in args.batch:
+            _print_load(await load_test('127.0.0.1', service.port, args.connections, args.requests, batch_size))
+        for endpoint in ('/point', '/batch'):
+            histogram = service.latency[endpoint]
+            if histogram.count:
+                print(f"server {endpoint}: {histogram.count} requests, latency ms p50 "
+                      f"{histogram.quantile(0.5) * 1000:.2f} p99 {histogram.quantile(0.99) * 1000:.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP/JSON service of the cell voltage breakdown")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve = commands.add_parser('serve', help="run the service")
+    serve.add_argument('--host', default='127.0.0.1', help="interface to listen on, 0.0.0.0 for all")
+    serve.add_argument('--port', type=int, default=8080)
+    serve.add_argument('--workers', type=int, help="worker processes, default all cores")
+    load = commands.add_parser('load', help="load a running service")
+    load.add_argument('--host', default='127.0.0.1')
+    load.add_argument('--port', type=int, default=8080)
+    bench = commands.add_parser('bench', help="start a service on localhost and load it")
+    bench.add_argument('--workers', type=int, help="worker processes, default all cores")
+    for command in (load, bench):
+        command.add_argument('--connections', type=int, default=8)
+        command.add_argument('--requests', type=int, default=1000)
+        command.add_argument('--batch', type=int, nargs='+', default=[1, 1000],
+                             help="points per request, 1 uses /point")
+    args = parser.parse_args(argv)
+    try:
+        if args.command == 'serve':
+            asyncio.run(_serve(args))
+        elif args.command == 'load':
+            for batch_size in args.batch:
+                _print_load(asyncio.run(load_test(args.host, args.port, args.connections, args.requests,
+                                                  batch_size)))
+        else:
+            asyncio.run(_bench(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Opt-in instrumentation for the model hot paths.
+Model functions are registered with @traced and report their intermediate values with
+    if trace.enabled:
+        trace.record('Bath.Equil_potential', bath_temp_K=bath_temp_K, ...)
+While tracing is off (the default) @traced leaves the function untouched and the guard is a single
+attribute check, so the model runs at full speed. enable() swaps timing wrappers onto every registered
+function, disable() puts the originals back.
+"""
+import csv
+import functools
+import json
+import sys
+import time
+
+enabled = False
+max_records = None # Keep at most this many value records, None for no limit
+calls = {} # component -> [call count, cumulative seconds], inclusive of nested traced calls
+records = [] # one dict per record() call: component plus the recorded values
+dropped = 0 # records discarded once max_records was reached
+cache_hits = {} # component -> calls served from the derived quantity cache (HH_Cell_Graph)
+
+_traced = []
+_originals = {}
+
+
+def traced(function):
+    # Register a model function for call counting and timing, returns it unchanged
+    _traced.append(function)
+    return function
+
+
+def record(component, **values):
+    global dropped
+    if max_records is not None and len(records) >= max_records:
+        dropped += 1
+        return
+    values['component'] = component
+    records.append(values)
+
+
+def record_cache_hit(component, value):
+    # A call answered from the derived quantity cache, its body and record() calls did not run
+    cache_hits[component] = cache_hits.get(component, 0) + 1
+    record(component, cache_hit=True, value=value)
+
+
+def _owner(function):
+    # Module or class holding the function, found through its qualified name
+    owner = sys.modules[function.__module__]
+    for name in function.__qualname__.split('.')[:-1]:
+        owner = getattr(owner, name)
+    return owner
+
+
+def _timed(function):
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stat = calls.setdefault(name, [0, 0.0])
+            stat[0] += 1
+            stat[1] += time.perf_counter() - start
+    return wrapper
+
+
+def enable(limit=None):
+    """
+    Start tracing: time every registered function and collect the values passed to record()
+    :param limit: maximum number of value records to keep, further records are counted in `dropped`
+    """
+    global enabled, max_records
+    max_records = limit
+    if not enabled:
+        for function in _traced:
+            owner = _owner(function)
+            _originals[function] = owner
+            setattr(owner, function.__name__, _timed(function))
+    enabled = True
+
+
+def disable():
+    # Stop tracing and restore the unwrapped functions, collected data is kept until reset()
+    global enabled
+    for function, owner in _originals.items():
+        setattr(owner, function.__name__, function)
+    _originals.clear()
+    enabled = False
+
+
+def reset():
+    global dropped
+    calls.clear()
+    cache_hits.clear()
+    records.clear()
+    dropped = 0
+
+
+def summary():
+    """
+    Per-component call statistics
+    :return: list of dicts with component, calls, cache_hits (calls served from the derived quantity cache),
+             total_s and mean_s, slowest component first
+    """
+    rows = [{'component': name, 'calls': count, 'cache_hits': cache_hits.get(name, 0), 'total_s': total,
+             'mean_s': total / count} for name, (count, total) in calls.items()]
+    return sorted(rows, key=lambda row: row['total_s'], reverse=True)
+
+
+def export_json(path):
+    # Write the call summary and the value records as one JSON document
+    with open(path, 'w') as f:
+        json.dump({'summary': summary(), 'records': records, 'dropped': dropped}, f, indent=1, default=float)
+
+
+def export_csv(path):
+    # Write the value records as a table, one column per recorded value name
+    fields = ['component']
+    for row in records:
+        for name in row:
+            if name not in fields:
+                fields.append(name)
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(records)
@@ -0,0 +1,139 @@
+"""
+Transient alumina balance of a line of cells.
+Alumina is consumed by electrolysis at the Faraday rate, 2 Al2O3 + 3 C = 4 Al + 3 CO2 uses 6 electrons per
+Al2O3, and added by point feeder shots at a fixed interval. Between evaluations the balance only depends on
+the cell current, so the concentration is integrated exactly with cumulative sums over blocks of time steps
+instead of stepping a Python loop, and the electrochemistry is re-evaluated at every step on the whole block.
+A starved cell cannot go below zero alumina: the balance is held at 0 (the running minimum of the unbounded
+sum is subtracted) and such steps are counted as depleted. The voltage terms are undefined there, the time
+averages skip undefined values so one depleted cell does not spoil the statistics of the others.
+"""
+import numpy as np
+
+import HH_Cell_Batch as batch
+from HH_Cell_Model_Classes import F, Bath, Cell_input
+
+M_Al2O3 = 101.96 # Molar mass of alumina g/mol
+
+
+def alumina_consumption(current, current_efficiency=0.94):
+    # Alumina consumed by electrolysis in kg/s for the cell current in kA
+    return current_efficiency * current * 1000 / (6 * F) * M_Al2O3 / 1000
+
+
+def simulate_alumina(duration, w_Al2O3, current, dt=1.0, record_every=60, current_efficiency=0.94,
+                     bath_mass=8000.0, feed_mass=9.0, feed_ratio=1.0, feed_interval=None, feed_phase=0.0,
+                     block=3600, **cell):
+    """
+    Simulate the alumina concentration of n cells and the voltage terms that depend on it.
+    :param duration: simulated time [s]
+    :param w_Al2O3: initial alumina concentration of each cell [wt%], shape (n_cells,)
+    :param current: cell current [kA], shape (n_cells,) or (n_steps, n_cells) for a current history
+    :param dt: time step [s]
+    :param record_every: keep every record_every-th step in the returned trajectories
+    :param current_efficiency: fraction of the current producing metal
+    :param bath_mass: mass of bath in each cell [kg]
+    :param feed_mass: alumina added per feeding event (all feeders together) [kg]
+    :param feed_ratio: feeding rate relative to the nominal consumption, >1 overfeeds
+    :param feed_interval: time between feeding events [s], defaults to the interval that balances the
+                          consumption at the initial current divided by feed_ratio
+    :param feed_phase: time offset of each cell's feeding schedule [s]
+    :param block: number of steps integrated and evaluated together, bounds the working memory
+    :param cell: remaining inputs of HH_Cell_Batch.cell_voltage_breakdown (ACD, bath chemistry,
+                 bath_temp_K, anode geometry), scalars or shape (n_cells,), defaulting to the values of
+                 Cell_input(), Bath() and Anode()
+    :return: dict with time and the recorded trajectories (n_records, n_cells) of w_Al2O3, Al2O3_rel_sat,
+             Equil_potential, rx_limited_current_density and concentration_overvolt, plus per cell the time
+             averages of the voltage terms over the steps where they are defined (NaN if none), the number of
+             steps in anode effect (i_c <= i_a) and the time of the first one (NaN if none), and the number of
+             steps with the alumina depleted (w_Al2O3 held at 0)
+    """
+    n_steps = int(round(duration / dt))
+    w_start = np.asarray(w_Al2O3, dtype=float)
+    n_cells = w_start.shape[0]
+    current = np.asarray(current, dtype=float)
+    history = current.ndim == 2
+
+    inputs = batch._anode_defaults()
+    bath = Bath()
+    inputs.update({name: getattr(bath, name) for name in batch.BATH_COLUMNS})
+    inputs['ACD'] = Cell_input().ACD
+    inputs.update({name: value for name, value in cell.items() if value is not None})
+    w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K, n_anodes, length_new, width_new, ACD = (
+        np.broadcast_to(np.asarray(inputs[name], dtype=float), (n_cells,)) for name in
+        ('w_AlF3', 'w_CaF2', 'w_MgF2', 'w_LiF', 'bath_temp_K', 'n_anodes', 'length_new', 'width_new', 'ACD'))
+    sat = batch.Al2O3_sat(w_AlF3, w_CaF2, w_MgF2, w_LiF, bath_temp_K)
+    area = batch.bath_eff_area(ACD, *(np.asarray(inputs[name], dtype=float) for name in (
+        'length_new', 'length_spent', 'width_new', 'width_spent', 'depth_immers', 'S_1', 'S_2', 'S_3', 'S_4')))
+    limit_scale = batch._concentration_limit_scale(n_anodes, length_new, width_new, bath_temp_K)
+
+    if feed_interval is None:
+        initial_current = current[0] if history else current
+        feed_interval = feed_mass / alumina_consumption(initial_current, current_efficiency) / feed_ratio
+    feed_interval = np.broadcast_to(np.asarray(feed_interval, dtype=float), (n_cells,))
+    feed_phase = np.broadcast_to(np.asarray(feed_phase, dtype=float), (n_cells,))
+    fed_before = np.floor(feed_phase / feed_interval)
+
+    record_steps = np.arange(0, n_steps, record_every)
+    names = ('w_Al2O3', 'Al2O3_rel_sat', 'Equil_potential', 'rx_limited_current_density', 'concentration_overvolt')
+    records = {name: np.empty((len(record_steps), n_cells)) for name in names}
+    totals = {name: np.zeros(n_cells) for name in names[2:]}
+    defined = {name: np.zeros(n_cells, dtype=np.int64) for name in names[2:]}
+    depleted_steps = np.zeros(n_cells, dtype=np.int64)
+    lowest = np.zeros(n_cells) # Running minimum of the unbounded balance, at most 0
+    anode_effect_steps = np.zeros(n_cells, dtype=np.int64)
+    first_anode_effect = np.full(n_cells, np.nan)
+    consumed = np.zeros(n_cells)
+
+    for start in range(0, n_steps, block):
+        stop = min(start + block, n_steps)
+        steps = np.arange(start, stop)
+        time = (steps + 1) * dt
+        block_current = current[start:stop] if history else np.broadcast_to(current, (stop - start, n_cells))
+        consumed_block = consumed + np.cumsum(alumina_consumption(block_current, current_efficiency) * dt, axis=0)
+        consumed = consumed_block[-1]
+        fed = feed_mass * (np.floor((time[:, None] + feed_phase) / feed_interval) - fed_before)
+        balance = w_start + 100 * (fed - consumed_block) / bath_mass
+        # Held at zero while starved: subtract the deepest deficit so far
+        block_lowest = np.minimum(np.minimum.accumulate(balance, axis=0), lowest)
+        lowest = block_lowest[-1]
+        w = balance - block_lowest
+        depleted = w <= 0
+        depleted_steps += depleted.sum(axis=0)
+
+        rel_sat = w / sat
+        i_a = batch.current_intensity(block_current, n_anodes, area)
+        i_c = limit_scale * (-0.4 + np.sqrt(w))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = {
+                'w_Al2O3': w,
+                'Al2O3_rel_sat': rel_sat,
+                'Equil_potential': batch.Equil_potential(bath_temp_K, rel_sat),
+                'rx_limited_current_density': batch.rx_limited_current_density(
+                    w, w_LiF, batch.bath_ratio(w, w_AlF3, w_CaF2)),
+                'concentration_overvolt': batch.concentration_overvolt(i_a, i_c, bath_temp_K),
+            }
+        for name in totals:
+            finite = np.isfinite(values[name])
+            totals[name] += np.where(finite, values[name], 0).sum(axis=0)
+            defined[name] += finite.sum(axis=0)
+
+        anode_effect = ~(i_c > i_a)
+        anode_effect_steps += anode_effect.sum(axis=0)
+        first = np.where(anode_effect.any(axis=0), time[anode_effect.argmax(axis=0)], np.nan)
+        first_anode_effect = np.where(np.isnan(first_anode_effect), first, first_anode_effect)
+
+        selected = (record_steps >= start) & (record_steps < stop)
+        for name in names:
+            records[name][selected] = values[name][record_steps[selected] - start]
+
+    results = {'time': (record_steps + 1) * dt}
+    results.update(records)
+    with np.errstate(invalid='ignore'):
+        results.update({f'mean_{name}': np.where(defined[name] > 0, total / np.maximum(defined[name], 1), np.nan)
+                        for name, total in totals.items()})
+    results['anode_effect_steps'] = anode_effect_steps
+    results['first_anode_effect'] = first_anode_effect
+    results['depleted_steps'] = depleted_steps
+    results['feed_interval'] = feed_interval
+    return results
@@ -0,0 +1,116 @@
+"""
+Background evaluation for the Tk front end.
+Background_worker runs a compute function on a worker thread and hands the results back to the Tk main thread
+through a queue polled with root.after, so the event loop never waits for the model. Only the latest request
+matters: a submit replaces any request that has not started yet and cancels the one in progress. Cancellation
+is cooperative, the compute function receives a Cancel_token and calls token.check() between steps.
+The compute function must work on plain values only, Tk variables and widgets may only be touched on the
+main thread.
+"""
+import queue
+import threading
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Cancel_token:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        # Raise Cancelled inside the compute function once the request has been superseded or cancelled
+        if self.cancelled:
+            raise Cancelled
+
+
+class Background_worker:
+    def __init__(self, root, compute, on_result, on_error=None, poll_ms=10):
+        """
+        :param root: Tk root (anything with after()), the callbacks run on its thread
+        :param compute: compute(request, token) -> result, runs on the worker thread
+        :param on_result: on_result(request, result), called for the latest request only
+        :param on_error: on_error(request, exception), defaults to printing the error
+        :param poll_ms: interval at which the result queue is polled
+        """
+        self.root = root
+        self.compute = compute
+        self.on_result = on_result
+        self.on_error = on_error or (lambda request, e: print(f"Error in background calculation: {e}"))
+        self.poll_ms = poll_ms
+        self.results = queue.Queue()
+        self.condition = threading.Condition()
+        self.pending = None # (generation, request) not started yet
+        self.token = None # Token of the request in progress
+        self.generation = 0
+        self.closed = False
+        self.thread = threading.Thread(target=self._run, name='Background_worker', daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    @property
+    def busy(self):
+        return self.pending is not None or self.token is not None
+
+    def submit(self, request):
+        # Queue a request, superseding whatever has not been delivered yet
+        with self.condition:
+            self.generation += 1
+            self.pending = (self.generation, request)
+            if self.token is not None:
+                self.token.cancel()
+            self.condition.notify()
+
+    def cancel(self):
+        # Drop the queued request and stop the one in progress, no callback is made for either
+        with self.condition:
+            self.generation += 1
+            self.pending = None
+            if self.token is not None:
+                self.token.cancel()
+
+    def close(self):
+        self.cancel()
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                generation, request = self.pending
+                self.pending = None
+                self.token = token = Cancel_token()
+            try:
+                self.results.put((generation, request, self.compute(request, token), None))
+            except Cancelled:
+                pass
+            except Exception as e:
+                self.results.put((generation, request, None, e))
+            finally:
+                with self.condition:
+                    self.token = None
+
+    def _poll(self):
+        # Deliver finished results on the Tk thread, skipping any that a newer request has superseded
+        while True:
+            try:
+                generation, request, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if generation != self.generation:
+                continue
+            if error is None:
+                self.on_result(request, result)
+            else:
+                self.on_error(request, error)
+        if not self.closed:
+            self.root.after(self.poll_ms, self._poll)
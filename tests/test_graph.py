@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+import HH_Cell_Benchmark as benchmark
+import HH_Cell_Graph as graph
+import HH_Cell_Trace as trace
+from HH_Cell_Model_Classes import Anode, Bath
+
+
+@pytest.fixture
+def cached():
+    graph.enable()
+    graph.reset()
+    yield
+    graph.disable()
+
+
+def test_disabled_by_default():
+    assert not graph.enabled
+
+
+def test_keyword_arguments(cached):
+    anode = Anode()
+    expected = anode.current_intensity(300, 20, 4.0)
+    assert anode.current_intensity(current=300, n_anodes=20, ACD=4.0) == expected
+    assert anode.current_intensity(300, n_anodes=20, ACD=4.0) == expected
+    assert graph.summary()['Anode.current_intensity']['hits'] == 2
+
+
+def test_array_changed_in_place(cached):
+    anode = Anode()
+    rx = Bath().rx_limited_current_density()
+    T = np.array([1230.0, 1240.0])
+    before = anode.surface_overvoltage(300, 20, 4.0, T, rx)
+    T[:] = 1400.0
+    after = anode.surface_overvoltage(300, 20, 4.0, T, rx)
+    assert not np.allclose(before, after)
+    np.testing.assert_allclose(after, Anode().surface_overvoltage(300, 20, 4.0, np.full(2, 1400.0), rx))
+
+
+def test_attribute_change_invalidates(cached):
+    bath = Bath()
+    first = bath.bath_ratio()
+    bath.w_AlF3 = 12.0
+    assert bath.bath_ratio() != first
+
+
+def test_trace_counts_cache_hits(cached):
+    anode = Anode()
+    rx = Bath().rx_limited_current_density()
+    trace.reset()
+    trace.enable()
+    try:
+        anode.surface_overvoltage(300, 20, 4.0, 1240.0, rx)
+        anode.surface_overvoltage(300, 20, 4.0, 1240.0, rx)
+    finally:
+        trace.disable()
+    row = next(row for row in trace.summary() if row['component'] == 'Anode.surface_overvoltage')
+    assert row['calls'] == 2 and row['cache_hits'] == 1
+    assert trace.records[-1]['cache_hit'] is True
+    trace.reset()
+
+
+def test_benchmark_times_the_model(cached):
+    benchmark.run_benchmarks(sizes=(1,), pattern='scalar.Anode.bath_eff_area', min_time=0.0)
+    assert graph.summary()['Anode.bath_eff_area']['hits'] == 0
+    assert graph.enabled
+
+
+def test_gui_calculator_reuses_derived_values(cached):
+    gui = pytest.importorskip('HH_CellGUI')
+    from HH_Cell_Worker import Cancel_token
+    calculator = gui.Calculator()
+    names = {'bath': ('w_Al2O3', 'w_AlF3', 'w_CaF2', 'w_MgF2', 'w_KF', 'w_LiF', 'bath_temp_K'),
+             'anode': ('length_new', 'length_spent', 'width_new', 'width_spent', 'height', 'depth_immers', 'age',
+                       'n_anodes', 'S_1', 'S_2', 'S_3', 'S_4', 'bake_temp'),
+             'cell': ('current', 'ACD')}
+    defaults = {'bath': Bath(), 'anode': Anode(), 'cell': gui.Cell_input()}
+    inputs = {group: {name: getattr(defaults[group], name) for name in group_names}
+              for group, group_names in names.items()}
+    calculator(inputs, Cancel_token())
+    graph.reset()
+    calculator(inputs, Cancel_token())
+    summary = graph.summary()
+    assert summary['Bath.bath_resistivity']['hits'] == 1
+    assert sum(row['misses'] for row in summary.values()) == 0
+
+    inputs['cell']['ACD'] = 5.0
+    results = calculator(inputs, Cancel_token())
+    assert results['bath_eff_area'] == Anode().bath_eff_area(5.0)
+    assert graph.summary()['Bath.bath_resistivity']['misses'] == 0
@@ -0,0 +1,37 @@
+import numpy as np
+
+import HH_Cell_Batch as batch
+import HH_Cell_Fleet as fleet
+import HH_Cell_Inverse as inverse
+
+
+def _columns(**values):
+    columns = fleet.Fleet(1).columns()
+    for name, value in values.items():
+        columns[name][:] = value
+    return columns
+
+
+def test_solve_ACD_round_trip():
+    columns = _columns()
+    result = inverse.solve_ACD(3.0, table=columns)
+    assert result['converged'].all()
+    columns['ACD'][:] = result['ACD']
+    assert np.allclose(batch.cell_voltage_breakdown(table=columns)['cell_voltage'], 3.0)
+
+
+def test_solve_ACD_bracket_starting_in_anode_effect():
+    # At low alumina the low end of the bracket is in anode effect (NaN voltage)
+    columns = _columns(w_Al2O3=0.8)
+    wide = inverse.solve_ACD(3.6, bracket=(1.5, 8.0), table=columns)
+    narrow = inverse.solve_ACD(3.6, bracket=(5.6, 8.0), table=columns)
+    assert wide['has_solution'].all() and wide['converged'].all()
+    assert np.allclose(wide['ACD'], narrow['ACD'])
+    assert np.allclose(wide['ACD'], 6.441, atol=1e-3)
+
+
+def test_bracketed_newton_undefined_high_end():
+    function = lambda x, index: (np.where(x < 2, x - 1, np.nan), np.ones_like(x))
+    result = inverse.bracketed_newton(function, [0.0], [5.0])
+    assert result['converged'].all()
+    assert np.allclose(result['x'], 1.0)
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from HH_Cell_Model_Classes import Anode, Bath
+
+
+def test_bath_eff_area_accepts_arrays():
+    anode = Anode()
+    ACD = np.array([3.0, 4.0])
+    areas = anode.bath_eff_area(ACD)
+    assert np.allclose(areas, [Anode().bath_eff_area(3.0), Anode().bath_eff_area(4.0)])
+    assert np.allclose(areas, anode.bath_eff_area_sweep(ACD))
+
+
+def test_core_import_stays_light():
+    # user-002: the model core imports without numpy, pandas, tkinter or the vectorized model
+    code = "import sys, HH_Cell_Model_Classes; print(sorted({'numpy', 'pandas', 'tkinter', 'HH_Cell_Batch', 'HH_Cell_Conductivity'} & set(sys.modules)))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout
+    assert output.strip() == '[]'
+
+
+def test_scalar_and_batch_conductivity_agree():
+    import HH_Cell_Batch as batch
+    bath = Bath()
+    value = bath.bath_conductivity()
+    assert type(value) is float
+    assert np.isclose(value, batch.bath_conductivity(bath.w_Al2O3, bath.w_AlF3, bath.w_CaF2, bath.w_MgF2, bath.w_KF,
+                                                     bath.w_LiF, bath.bath_temp_K), rtol=1e-14)
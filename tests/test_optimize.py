@@ -0,0 +1,22 @@
+import numpy as np
+
+import HH_Cell_Optimize as optimize
+from HH_Cell_Fleet import Fleet
+
+
+def test_front_trades_energy_against_margin():
+    front = optimize.optimize(Fleet(2), workers=1)
+    assert front['margins'].shape == (2, optimize.MARGIN_LEVELS)
+    for pot in range(2):
+        on_front = front['pareto'][pot]
+        assert on_front.sum() > 1
+        margin = front['anode_effect_margin'][pot, on_front]
+        energy = front['specific_energy'][pot, on_front]
+        order = np.argsort(margin)
+        assert np.all(np.diff(energy[order]) > 0)
+
+
+def test_explicit_margins_shared_by_pots():
+    front = optimize.optimize(Fleet(2), margins=(0.0, 1.6), workers=1, n_starts=2)
+    assert np.array_equal(front['margins'], [[0.0, 1.6], [0.0, 1.6]])
+    assert np.all(front['anode_effect_margin'][front['feasible']] >= front['margins'][front['feasible']] - 1e-9)
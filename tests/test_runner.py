@@ -0,0 +1,15 @@
+import numpy as np
+
+import HH_Cell_Runner as runner
+from HH_Cell_MonteCarlo import sample_inputs
+
+
+def test_random_compositions_clipped_like_monte_carlo():
+    scenario = runner.Scenario({'seed': 3, 'random': {'samples': 1200, 'w_CaF2': {'normal': [1.0, 1.0]},
+                                                      'bath_temp_K': {'normal': [1233.0, 5.0]}}})
+    columns = scenario.expand(0)
+    assert columns['w_CaF2'].min() == 0
+    rng = np.random.default_rng(np.random.SeedSequence(3, spawn_key=(0,)))
+    expected = sample_inputs({'w_CaF2': ('normal', 1.0, 1.0), 'bath_temp_K': ('normal', 1233.0, 5.0)}, 1200, rng)
+    for name in expected:
+        assert np.array_equal(columns[name], expected[name])
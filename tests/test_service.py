@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+import HH_Cell_Service as service
+
+
+def test_batch_rejects_points_that_are_not_objects():
+    status, body, points = service.evaluate('/batch', b'[{"ACD": 3}, "x"]')
+    assert status == 400 and points == 0
+    assert 'JSON object' in json.loads(body)['error']
+
+
+def test_batch_list_of_points():
+    status, body, points = service.evaluate('/batch', b'[{"ACD": 3}, {"ACD": 4}]')
+    assert status == 200 and points == 2
+    assert len(json.loads(body)['cell_voltage']) == 2
+
+
+def test_batch_list_sets_the_shape():
+    status, body, points = service.evaluate('/batch', b'[]')
+    assert status == 200 and points == 0
+    assert all(values == [] for values in json.loads(body).values())
+    status, body, points = service.evaluate('/batch', b'[{}, {}]')
+    assert points == 2
+    assert all(len(values) == 2 for values in json.loads(body).values())
+
+
+def test_close_shuts_idle_keep_alive_connections():
+    async def run():
+        server = await service.Service(port=0, workers=1).start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+        status, _ = await service.request(reader, writer, 'GET', '/health')
+        assert status == 200 and len(server.connections) == 1
+        await server.close()
+        assert not server.connections
+        assert await reader.read() == b''
+        writer.close()
+
+    asyncio.run(run())
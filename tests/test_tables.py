@@ -0,0 +1,24 @@
+import numpy as np
+
+import HH_Cell_Batch as batch
+import HH_Cell_Tables as tables
+
+
+def test_lookup_within_error_bound(tmp_path):
+    metadata = tables.build_tables(tmp_path, samples=10 ** 4)
+    looked_up = tables.Bath_tables(tmp_path)
+    rng = np.random.default_rng(1)
+    sample = {name: rng.uniform(*tables.DEFAULT_RANGES[name], 10 ** 5) for name in tables.AXES}
+    exact = batch.bath_properties(w_MgF2=metadata['w_MgF2'], w_KF=metadata['w_KF'], **sample)
+    results = looked_up.bath_properties(**sample)
+    for name in tables.PROPERTIES:
+        error = np.abs(results[name] - exact[name])
+        assert np.nanmax(error) <= looked_up.error_bound(name)
+        assert metadata['properties'][name]['max_error'] <= looked_up.error_bound(name)
+
+
+def test_outside_box_is_nan(tmp_path):
+    tables.build_tables(tmp_path, samples=10)
+    looked_up = tables.Bath_tables(tmp_path)
+    values = looked_up.lookup('bath_conductivity', np.array([1000.0, 1250.0]), 3.0, 10.0, 5.0, 1.0)
+    assert np.isnan(values[0]) and np.isfinite(values[1])
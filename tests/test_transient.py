@@ -0,0 +1,26 @@
+import numpy as np
+
+import HH_Cell_Transient as transient
+
+
+def test_starved_cell_holds_at_zero_and_keeps_statistics():
+    # The second cell is never fed and runs out of alumina
+    both = transient.simulate_alumina(6 * 3600, np.array([3.0, 3.0]), 300.0, feed_interval=np.array([80.0, 1e9]))
+    alone = transient.simulate_alumina(6 * 3600, np.array([3.0]), 300.0, feed_interval=np.array([80.0]))
+    assert both['w_Al2O3'].min() >= 0
+    assert both['depleted_steps'][0] == 0 and both['depleted_steps'][1] > 0
+    for name in ('mean_Equil_potential', 'mean_rx_limited_current_density', 'mean_concentration_overvolt'):
+        assert np.isfinite(both[name]).all()
+        assert np.allclose(both[name][0], alone[name][0])
+
+
+def test_depleted_cell_recovers_from_zero():
+    # Consumption starves the cell for the first 3 h, with the current off the feeding refills it from zero
+    current = np.concatenate([np.full(3 * 3600, 300.0), np.zeros(3600)])[:, None]
+    results = transient.simulate_alumina(4 * 3600, np.array([1.0]), current, feed_interval=np.array([600.0]),
+                                         record_every=1)
+    assert results['depleted_steps'][0] > 0
+    w = results['w_Al2O3'][:, 0]
+    # Just before the shot at 3 h the cell is empty, afterwards it gains exactly the six shots of the last hour
+    assert w[3 * 3600 - 2] == 0
+    assert np.isclose(w[-1], w[3 * 3600 - 1] + 6 * 100 * 9.0 / 8000.0)